@@ -11,10 +11,15 @@ warnings.filterwarnings("ignore")
 
 try:
     import lzma
-    import Levenshtein
 except:
     pass
+try:
+    import Levenshtein
+    _has_levenshtein = True
+except:
+    _has_levenshtein = False
 import numpy as np
+from multiprocessing import Pool
 from difflib import SequenceMatcher
 from sklearn.metrics.pairwise import cosine_similarity
 import config
@@ -35,6 +40,43 @@ def _edit_dist(str1, str2):
     return d
 
 
+# memo of normalized edit distances between short strings (e.g. n-grams), keyed by (str1, str2);
+# the pair is sorted only for Levenshtein, the SequenceMatcher fallback is not symmetric
+_edit_dist_cache = {}
+_EDIT_DIST_CACHE_SIZE = 5000000
+
+
+def _edit_dist_batch(strs1, strs2):
+    """
+        Input: two aligned lists of strings
+        Output: _edit_dist of each pair, memoized across calls in _edit_dist_cache
+        Pairs not in the memo are computed by Levenshtein if installed, by _edit_dist otherwise.
+    """
+    keys = [(s2, s1) if _has_levenshtein and s1 > s2 else (s1, s2) for s1, s2 in zip(strs1, strs2)]
+    missing = list(set([key for key in keys if key not in _edit_dist_cache]))
+    if missing:
+        if len(_edit_dist_cache) + len(missing) > _EDIT_DIST_CACHE_SIZE:
+            _edit_dist_cache.clear()
+        if _has_levenshtein:
+            dists = [(Levenshtein.distance(s1, s2) / float(max(len(s1), len(s2)))) if (s1 or s2) else 0.
+                     for s1, s2 in missing]
+        else:
+            dists = [_edit_dist(s1, s2) for s1, s2 in missing]
+        _edit_dist_cache.update(zip(missing, dists))
+    return np.array([_edit_dist_cache[key] for key in keys], dtype=float)
+
+
+def _edit_dist_matrix(strs1, strs2):
+    """
+        Input: two lists of strings
+        Output: the (len(strs1), len(strs2)) matrix of _edit_dist, each distinct pair computed once
+    """
+    u1, inv1 = np.unique(np.array(strs1, dtype=object), return_inverse=True) if strs1 else ([], [])
+    u2, inv2 = np.unique(np.array(strs2, dtype=object), return_inverse=True) if strs2 else ([], [])
+    dists = _edit_dist_batch([s1 for s1 in u1 for s2 in u2], [s2 for s1 in u1 for s2 in u2])
+    return dists.reshape(len(u1), len(u2))[np.ix_(np.asarray(inv1, dtype=int), np.asarray(inv2, dtype=int))]
+
+
 def _is_str_match(str1, str2, threshold=1.0):
     assert threshold >= 0.0 and threshold <= 1.0, "Wrong threshold."
     if float(threshold) == 1.0:
@@ -61,14 +103,32 @@ def _compression_dist(x, y, l_x=None, l_y=None):
     x_b = x.encode('utf-8')
     y_b = y.encode('utf-8')
     if l_x is None:
-        l_x = len(lzma.compress(x_b))
-        l_y = len(lzma.compress(y_b))
+        l_x = _compressed_len(x)
+        l_y = _compressed_len(y)
     l_xy = len(lzma.compress(x_b+y_b))
     l_yx = len(lzma.compress(y_b+x_b))
     dist = np_utils._try_divide(min(l_xy,l_yx)-min(l_x,l_y), max(l_x,l_y))
     return dist
 
 
+def _compressed_len(x):
+    return len(lzma.compress(x.encode('utf-8')))
+
+
+def _compressed_lens(texts, n_jobs=1, func=_compressed_len):
+    """
+        Input: list of texts, number of processes, picklable function of a text
+        Output: func of each text (_compressed_len by default), computed by a process pool when n_jobs > 1
+    """
+    if 1 >= n_jobs:
+        return [func(x) for x in texts]
+    pool = Pool(n_jobs)
+    lens = pool.map(func, texts, chunksize=1000)
+    pool.close()
+    pool.join()
+    return lens
+
+
 def _cosine_sim(vec1, vec2):
     try:
         s = cosine_similarity(vec1.reshape(1, -1), vec2.reshape(1, -1))[0][0]
@@ -109,3 +169,42 @@ def _dice_dist(A, B):
     if not isinstance(B, set):
         B = set(B)
     return np_utils._try_divide(2.*float(len(A.intersection(B))), (len(A) + len(B)))
+
+
+def _sorted_intersect_sizes(sets1, sets2):
+    """
+        Input: two aligned lists of sorted unique int64 arrays
+        Output: (sizes of sets1, sizes of sets2, sizes of the pairwise intersections)
+        All pairs are handled at once: entries are sorted by (pair, value) and
+        every adjacent equal entry within a pair is an intersection element.
+    """
+    n = len(sets1)
+    len1 = np.array([len(a) for a in sets1], dtype=np.int64)
+    len2 = np.array([len(b) for b in sets2], dtype=np.int64)
+    pairs = np.concatenate([np.repeat(np.arange(n), len1), np.repeat(np.arange(n), len2)])
+    vals = np.concatenate([np.zeros(0, dtype=np.int64)] + list(sets1) + list(sets2))
+    order = np.lexsort((vals, pairs))
+    pairs = pairs[order]
+    vals = vals[order]
+    is_dup = (pairs[1:] == pairs[:-1]) & (vals[1:] == vals[:-1])
+    return len1, len2, np.bincount(pairs[1:][is_dup], minlength=n)
+
+
+def _jaccard_coefs(sets1, sets2):
+    """
+        Input: two aligned lists of sorted unique int64 arrays
+        Output: _jaccard_coef of each pair
+    """
+    len1, len2, inter = _sorted_intersect_sizes(sets1, sets2)
+    union = len1 + len2 - inter
+    return np.where(union > 0, inter / np.maximum(union, 1).astype(float), 0.)
+
+
+def _dice_dists(sets1, sets2):
+    """
+        Input: two aligned lists of sorted unique int64 arrays
+        Output: _dice_dist of each pair
+    """
+    len1, len2, inter = _sorted_intersect_sizes(sets1, sets2)
+    total = len1 + len2
+    return np.where(total > 0, 2. * inter / np.maximum(total, 1), 0.)
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: utils for binary word embedding store
+
+A text embedding file (GloVe/word2vec format, one "word v1 v2 ..." per line)
+is converted once into:
+    <fp>.vocab : header "n_words dim dtype", then one word per line
+    <fp>.bin   : contiguous row-major matrix of shape (n_words, dim)
+The matrix is loaded with np.memmap, so several processes share one copy in page cache.
+
+"""
+
+from os.path import isfile
+from multiprocessing import Pool
+
+try:
+    import pyemd
+except:
+    pyemd = None
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.optimize import linprog
+import config
+
+
+def _vocab_fp(fp):
+    return '%s.vocab' % fp
+
+
+def _matrix_fp(fp):
+    return '%s.bin' % fp
+
+
+def _has_store(fp):
+    return isfile(_vocab_fp(fp)) and isfile(_matrix_fp(fp))
+
+
+def _convert(fp, dtype='float32'):
+    """
+        Input: path of a text embedding file
+        Output: (n_words, dim) of the binary store written next to it
+        Lines whose vector size differs from the first vector (e.g. word2vec header) are skipped.
+    """
+    dim = None
+    words = []
+    fin = open(fp, 'r')
+    fout = open(_matrix_fp(fp), 'wb')
+    for line in fin:
+        subs = line.strip().split(None, 1)
+        if 2 > len(subs):
+            continue
+        vec = np.array(subs[1].split(), dtype=dtype)
+        if dim is None and len(vec) > 1:
+            dim = len(vec)
+        if len(vec) != dim:
+            continue
+        vec.tofile(fout)
+        words.append(subs[0])
+    fin.close()
+    fout.close()
+
+    fout = open(_vocab_fp(fp), 'w')
+    fout.write('%d %d %s\n' % (len(words), dim, dtype))
+    for word in words:
+        fout.write('%s\n' % word)
+    fout.close()
+    return len(words), dim
+
+
+def _load(fp):
+    """
+        Input: path of a text embedding file already converted by _convert
+        Output: (word2row, matrix), matrix is a read-only np.memmap
+        For duplicated words the last row wins, as in a dict built from the text file.
+    """
+    fin = open(_vocab_fp(fp), 'r')
+    n_words, dim, dtype = fin.readline().split()
+    word2row = dict((line.rstrip('\n'), index) for index, line in enumerate(fin))
+    fin.close()
+    matrix = np.memmap(_matrix_fp(fp), dtype=dtype, mode='r', shape=(int(n_words), int(dim)))
+    return word2row, matrix
+
+
+class WordVectors(object):
+    """
+    Read-only dict-like view (word -> vector) over the binary store
+    """
+
+    def __init__(self, fp):
+        self.word2row, self.matrix = _load(fp)
+
+    def __contains__(self, word):
+        return word in self.word2row
+
+    def __getitem__(self, word):
+        return np.asarray(self.matrix[self.word2row[word]])
+
+    def __len__(self):
+        return len(self.word2row)
+
+    def get(self, word, default=None):
+        row = self.word2row.get(word)
+        return default if row is None else np.asarray(self.matrix[row])
+
+
+def _from_dict(we_dict):
+    """
+        Input: a dict (word -> vector) or a WordVectors
+        Output: (word2row, matrix)
+    """
+    if isinstance(we_dict, WordVectors):
+        return we_dict.word2row, we_dict.matrix
+    # vectors of other sizes (e.g. word2vec header) are skipped
+    dim = max([len(we_dict[word]) for word in we_dict] + [0])
+    word2row = {}
+    vecs = []
+    for word in we_dict:
+        if len(we_dict[word]) == dim:
+            word2row[word] = len(vecs)
+            vecs.append(we_dict[word])
+    return word2row, np.array(vecs).reshape(len(vecs), dim)
+
+
+def _sentence_vectors(counts, matrix, weights=None, block_size=100000):
+    """
+        Input: csr doc-term matrix whose columns are rows of the embedding matrix,
+               optional weights over those rows (e.g. IDF)
+        Output: dense (n_docs, dim) matrix of weighted sums of word vectors, computed in row blocks
+        Only rows of words used by the documents are read from the embedding matrix, and
+        the output keeps the precision of the embedding matrix (at least float32).
+    """
+    dtype = np.result_type(matrix.dtype, np.float32)
+    used = np.unique(counts.indices)
+    sub_matrix = np.asarray(matrix[used], dtype=np.float64)
+    if weights is not None:
+        sub_matrix *= np.asarray(weights, dtype=np.float64)[used][:, np.newaxis]
+    counts = csr_matrix((counts.data, np.searchsorted(used, counts.indices), counts.indptr),
+                        shape=(counts.shape[0], len(used)))
+    vecs = np.zeros((counts.shape[0], matrix.shape[1]), dtype=dtype)
+    for begin in range(0, counts.shape[0], block_size):
+        end = min(begin + block_size, counts.shape[0])
+        vecs[begin:end] = counts[begin:end].dot(sub_matrix)
+    return vecs
+
+
+def _pair_cosine_sim(vecs, ind1, ind2, block_size=100000):
+    """
+        Input: sentence vectors and the row of Q1/Q2 of each pair in them
+        Output: cosine similarity of each pair, 0 when the product of norms is not greater than 1e-6
+    """
+    norms = np.zeros(vecs.shape[0])
+    for begin in range(0, vecs.shape[0], block_size):
+        block = vecs[begin:begin + block_size].astype(np.float64)
+        norms[begin:begin + block_size] = np.sqrt((block * block).sum(axis=1))
+    sims = np.zeros(len(ind1))
+    for begin in range(0, len(ind1), block_size):
+        i1 = ind1[begin:begin + block_size]
+        i2 = ind2[begin:begin + block_size]
+        dots = (vecs[i1].astype(np.float64) * vecs[i2].astype(np.float64)).sum(axis=1)
+        factors = norms[i1] * norms[i2]
+        valid = factors > 1e-6
+        sims[begin:begin + block_size][valid] = dots[valid] / factors[valid]
+    return sims
+
+
+def _nbow(rows):
+    """
+        Input: embedding rows of the words of a document
+        Output: (sorted unique rows, normalized bag-of-words weights)
+    """
+    rows = np.sort(np.asarray(rows, dtype=np.int64))
+    is_first = np.concatenate([[True], rows[1:] != rows[:-1]])
+    counts = np.diff(np.concatenate([np.where(is_first)[0], [len(rows)]]))
+    return rows[is_first], counts / float(len(rows))
+
+
+def _transport_cost(d1, d2, dists):
+    """
+        Input: two histograms with equal total mass and the (len(d1), len(d2)) ground distance matrix
+        Output: the minimal transport cost, solved by pyemd if installed, by linear programming otherwise
+    """
+    n1 = len(d1)
+    n2 = len(d2)
+    if pyemd is not None:
+        dm = np.zeros((n1 + n2, n1 + n2))
+        dm[:n1, n1:] = dists
+        dm[n1:, :n1] = dists.T
+        return pyemd.emd(np.concatenate([d1, np.zeros(n2)]), np.concatenate([np.zeros(n1), d2]), dm)
+    # flow f[i][j] flattened row-major, the last (redundant) column constraint is dropped
+    a_eq = np.zeros((n1 + n2 - 1, n1 * n2))
+    for i in range(n1):
+        a_eq[i, i * n2:(i + 1) * n2] = 1.
+    for j in range(n2 - 1):
+        a_eq[n1 + j, j::n2] = 1.
+    res = linprog(dists.ravel(), A_eq=a_eq, b_eq=np.concatenate([d1, d2[:-1]]), bounds=(0, None))
+    return res.fun
+
+
+def _wmd(rows1, rows2, matrix, cutoff=None):
+    """
+        Input: embedding rows of the words of two documents and the embedding matrix
+        Output: Word Mover's Distance with normalized bag-of-words weights and euclidean ground distance,
+                config.MISSING_VALUE_NUMERIC if either document has no words
+        Cheap lower bounds are tried first: word centroid distance (WCD) and relaxed WMD (RWMD).
+        When cutoff is given, the first lower bound reaching it is returned instead of the exact value.
+        The exact transport problem is only solved when the relaxed flow is not feasible.
+    """
+    if 0 == len(rows1) or 0 == len(rows2):
+        return config.MISSING_VALUE_NUMERIC
+    u1, d1 = _nbow(rows1)
+    u2, d2 = _nbow(rows2)
+    vecs1 = np.asarray(matrix[u1], dtype=np.float64)
+    vecs2 = np.asarray(matrix[u2], dtype=np.float64)
+
+    # word centroid distance
+    wcd = np.linalg.norm(d1.dot(vecs1) - d2.dot(vecs2))
+    if cutoff is not None and wcd >= cutoff:
+        return wcd
+
+    # mass of common words stays in place (WMD only depends on d1 - d2 for a metric ground distance)
+    pos = np.minimum(np.searchsorted(u2, u1), len(u2) - 1)
+    is_common = (u2[pos] == u1)
+    shared = np.minimum(d1[is_common], d2[pos[is_common]])
+    d1[is_common] -= shared
+    d2[pos[is_common]] -= shared
+    keep1 = d1 > 1e-12
+    keep2 = d2 > 1e-12
+    if (not keep1.any()) or (not keep2.any()):
+        return 0.
+    d1, vecs1 = d1[keep1], vecs1[keep1]
+    d2, vecs2 = d2[keep2], vecs2[keep2]
+    d2 *= d1.sum() / d2.sum()
+
+    dists = np.sqrt(((vecs1[:, np.newaxis, :] - vecs2[np.newaxis, :, :]) ** 2).sum(axis=2))
+
+    # one word left on a side: all mass moves from/to it
+    if 1 == len(d1):
+        return d2.dot(dists[0])
+    if 1 == len(d2):
+        return d1.dot(dists[:, 0])
+
+    # relaxed WMD: every word moves all its mass to the nearest word on the other side
+    nearest2 = dists.argmin(axis=1)
+    nearest1 = dists.argmin(axis=0)
+    rwmd1 = d1.dot(dists[np.arange(len(d1)), nearest2])
+    rwmd2 = d2.dot(dists[nearest1, np.arange(len(d2))])
+    if cutoff is not None and max(rwmd1, rwmd2) >= cutoff:
+        return max(rwmd1, rwmd2)
+    # relaxed flow satisfies the other side's constraints, so it is optimal
+    if np.allclose(np.bincount(nearest2, weights=d1, minlength=len(d2)), d2):
+        return rwmd1
+    if np.allclose(np.bincount(nearest1, weights=d2, minlength=len(d1)), d1):
+        return rwmd2
+
+    return _transport_cost(d1, d2, dists)
+
+
+_wmd_matrix = None
+
+
+def _init_wmd_worker(fp):
+    global _wmd_matrix
+    _wmd_matrix = _load(fp)[1]
+
+
+def _wmd_chunk(args):
+    pairs, cutoff = args
+    return [_wmd(rows1, rows2, _wmd_matrix, cutoff) for rows1, rows2 in pairs]
+
+
+def _parallel_wmd(fp, pairs, n_jobs, cutoff=None, chunk_size=10000):
+    """
+        Input: path of the binary store, a list of (rows1, rows2) of documents to compare
+        Output: WMD of each pair, computed by a process pool sharing the memory-mapped matrix
+    """
+    chunks = [(pairs[begin:begin + chunk_size], cutoff) for begin in range(0, len(pairs), chunk_size)]
+    pool = Pool(n_jobs, _init_wmd_worker, (fp,))
+    dists = pool.map(_wmd_chunk, chunks)
+    pool.close()
+    pool.join()
+    return np.array([d for chunk in dists for d in chunk])
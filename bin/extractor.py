@@ -8,27 +8,38 @@ import pandas as pd
 from collections import Counter
 import numpy as np
 import math
+import string
 import nltk
 import difflib
 from sklearn.feature_extraction.text import TfidfVectorizer
-from utils import LogUtil
+from utils import LogUtil, DataUtil
 import json
 import sys, getopt
 from numpy import linalg
 from preprocessor import Preprocessor
 from nltk.stem import PorterStemmer
 from nltk.stem import SnowballStemmer
-import networkx as nx
 import csv
+import glob
+import itertools
 from scipy import sparse
 import ngram_utils
 import dist_utils
 import np_utils
+import sparse_utils
+import segment_utils
+import tree_utils
+import question_table
+import graph_utils
+import minhash_utils
+import embedding_utils
 from postprocessor import PostProcessor
 import config
 from model import Model
 import random
 import jieba
+import hashlib
+from os.path import isfile, getsize, getmtime
 
 class WordMatchShare(object):
     """
@@ -406,6 +417,158 @@ class MyTFIDFWordMatchShare(object):
         MyTFIDFWordMatchShare.run(train_data, test_data, train_qid2q, feature_path)
 
 
+class SparseWordMatchShare(object):
+    """
+    基于稀疏文档-词矩阵批量抽取<Q1,Q2>特征：
+    word_match_share, my_word_match_share, tfidf_word_match_share, my_tfidf_word_match_share
+    """
+
+    stops = set(stopwords.words("english"))
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def init_count_matrix(train_df, test_df):
+        """
+        构建train.csv和test.csv中Q1、Q2的词频矩阵，共享同一词典
+        :param train_df: train.csv
+        :param test_df: test.csv
+        :return: 词典, {rawset_name: (Q1词频矩阵, Q2词频矩阵)}
+        """
+        vocab = {}
+        questions = {}
+        for rawset_name, df in [('train', train_df), ('test', test_df)]:
+            docs, ind1, ind2 = sparse_utils._unique_docs(df['question1'].tolist(), df['question2'].tolist())
+            questions[rawset_name] = (sparse_utils._count_matrix(docs, vocab), ind1, ind2)
+            LogUtil.log('INFO', 'init count matrix (%s) done, len(docs)=%d, len(vocab)=%d' % (
+                rawset_name, len(docs), len(vocab)))
+        counts = {}
+        for rawset_name in questions:
+            m, ind1, ind2 = questions[rawset_name]
+            m = sparse_utils._resize_col(m, len(vocab))
+            counts[rawset_name] = (m[ind1], m[ind2])
+        return vocab, counts
+
+    @staticmethod
+    def init_stop_mask(vocab):
+        """
+        停用词掩码，停用词对应列为0
+        """
+        mask = np.ones(len(vocab))
+        for w in vocab:
+            if w in SparseWordMatchShare.stops:
+                mask[vocab[w]] = 0.
+        return mask
+
+    @staticmethod
+    def init_tfidf_weights(train_counts):
+        """
+        与TFIDFWordMatchShare.get_weights一致，根据train.csv中词语出现次数计算权重
+        :param train_counts: train.csv的(Q1词频矩阵, Q2词频矩阵)
+        :return: 权重向量
+        """
+        counts = np.asarray(train_counts[0].sum(axis=0)).ravel() + np.asarray(train_counts[1].sum(axis=0)).ravel()
+        weights = np.zeros(len(counts))
+        weights[counts >= 2] = 1. / (counts[counts >= 2] + 10000)
+        return weights
+
+    @staticmethod
+    def init_idf(train_qid2question, vocab):
+        """
+        与MyTFIDFWordMatchShare.init_idf一致，根据train.csv中去重question计算IDF
+        :param train_qid2question: train.csv去重question集合
+        :param vocab: 词典
+        :return: IDF向量，不在文档集合中的词IDF为0
+        """
+        docs = sparse_utils._binarize(
+            sparse_utils._count_matrix(train_qid2question['question'].tolist(), vocab, grow=False))
+        df = np.asarray(docs.sum(axis=0)).ravel()
+        idf = np.zeros(len(vocab))
+        idf[df > 0] = np.log(len(train_qid2question) / (df[df > 0] + 1.)) / math.log(2.)
+        LogUtil.log("INFO", "IDF calculation done, len(idf)=%d" % (df > 0).sum())
+        return idf
+
+    @staticmethod
+    def extract(q1_counts, q2_counts, stop_mask, tfidf_weights, idf):
+        """
+        批量抽取<Q1,Q2>特征
+        :return: {feature_name: 特征向量}
+        """
+        q1_bins = sparse_utils._binarize(q1_counts)
+        q2_bins = sparse_utils._binarize(q2_counts)
+        # 去除停用词
+        q1_counts_ns = sparse_utils._mask_col(q1_counts, stop_mask)
+        q2_counts_ns = sparse_utils._mask_col(q2_counts, stop_mask)
+        q1_bins_ns = sparse_utils._binarize(q1_counts_ns)
+        q2_bins_ns = sparse_utils._binarize(q2_counts_ns)
+        q1_len_ns = sparse_utils._row_sum(q1_bins_ns)
+        q2_len_ns = sparse_utils._row_sum(q2_bins_ns)
+        empty_ns = (q1_len_ns == 0) | (q2_len_ns == 0)
+
+        features = {}
+
+        # word_match_share
+        shared = 2. * sparse_utils._row_dot(q1_bins_ns, q2_bins_ns)
+        features['word_match_share'] = sparse_utils._try_divide(shared, q1_len_ns + q2_len_ns)
+        features['word_match_share'][empty_ns] = 0.
+
+        # my_word_match_share
+        shared = sparse_utils._row_dot(q1_counts_ns, q2_bins_ns) + sparse_utils._row_dot(q2_counts_ns, q1_bins_ns)
+        total = sparse_utils._row_sum(q1_counts_ns) + sparse_utils._row_sum(q2_counts_ns)
+        features['my_word_match_share'] = sparse_utils._try_divide(shared, total)
+        features['my_word_match_share'][1e-6 > total] = 0.
+
+        # tfidf_word_match_share
+        shared = 2. * sparse_utils._row_dot(q1_bins_ns, q2_bins_ns, tfidf_weights)
+        total = sparse_utils._row_sum(q1_bins_ns, tfidf_weights) + sparse_utils._row_sum(q2_bins_ns, tfidf_weights)
+        features['tfidf_word_match_share'] = sparse_utils._try_divide(shared, total)
+        features['tfidf_word_match_share'][empty_ns | (1e-6 > total)] = 0.
+
+        # my_tfidf_word_match_share
+        shared = sparse_utils._row_dot(q1_counts, q2_bins, idf) + sparse_utils._row_dot(q2_counts, q1_bins, idf)
+        total = sparse_utils._row_sum(q1_counts, idf) + sparse_utils._row_sum(q2_counts, idf)
+        features['my_tfidf_word_match_share'] = sparse_utils._try_divide(shared, total)
+        features['my_tfidf_word_match_share'][1e-6 > total] = 0.
+
+        return features
+
+    @staticmethod
+    def extract_word_match_share(cf, argv):
+        # 加载数据文件
+        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+        train_qid2q = pd.read_csv('%s/train_qid2question.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
+
+        # 特征存储路径
+        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
+
+        # 初始化
+        vocab, counts = SparseWordMatchShare.init_count_matrix(train_data, test_data)
+        stop_mask = SparseWordMatchShare.init_stop_mask(vocab)
+        tfidf_weights = SparseWordMatchShare.init_tfidf_weights(counts['train'])
+        idf = SparseWordMatchShare.init_idf(train_qid2q, vocab)
+
+        # 抽取特征
+        for rawset_name in ['train', 'test']:
+            features = SparseWordMatchShare.extract(counts[rawset_name][0], counts[rawset_name][1],
+                                                    stop_mask, tfidf_weights, idf)
+            LogUtil.log('INFO', 'extract %s features (word_match_share family) done' % rawset_name)
+            for feature_name in features:
+                Feature.save_dataframe(features[feature_name].reshape(-1, 1),
+                                       '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+                LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
+
+    @staticmethod
+    def run(cf, argv):
+        cmd = argv[0]
+
+        if 'extract_word_match_share' == cmd:
+            SparseWordMatchShare.extract_word_match_share(cf, argv[1:])
+        else:
+            LogUtil.log('WARNING', 'NO CMD')
+
+
 class PowerfulWord(object):
     """
     寻找最有影响力的词
@@ -477,6 +640,106 @@ class PowerfulWord(object):
             map(lambda x: x[0], filter(lambda x: x[1][2] >= aside_corate_rate, sorted_words_power)))
         LogUtil.log('INFO', 'Double side power words: %s' % str(PowerfulWord.dside_word_power))
 
+    @staticmethod
+    def cal_word_power_counts(train_data, subsets_indexs, tokenizer=sparse_utils._lower_split):
+        """
+        统计各子集中词语出现的语句对数量：
+            [0. 出现语句对数量，1. 单侧语句对数量，2. 单侧负例语句对数量，3. 双侧语句对数量，4. 双侧正例语句对数量]
+        按照各行所属子集的情况将数据划分为若干互不相交的分区，每个分区只统计一次，子集统计量由分区统计量累加得到
+        （5折交叉验证中即为全部分区减去留出的分区）
+        :param train_data: 训练数据
+        :param subsets_indexs: 子集索引列表，索引不小于len(train_data)时视为交换Q1、Q2后的同一行（统计量相同）
+        :param tokenizer: 分词函数
+        :return: 词表, 各子集的统计量矩阵列表（5 x len(词表)）
+        """
+        n_row = len(train_data)
+        # 分区：属于相同子集（及相同重复次数）的行属于同一分区
+        membership = np.zeros((n_row, len(subsets_indexs)), dtype=np.int64)
+        for subset_id, indexs in enumerate(subsets_indexs):
+            membership[:, subset_id] = np.bincount(np.asarray(indexs, dtype=np.int64) % n_row, minlength=n_row)
+        base = membership.max() + 1
+        keys = membership.dot(base ** np.arange(len(subsets_indexs), dtype=np.int64))
+        keys, partition = np.unique(keys, return_inverse=True)
+        first_row = np.zeros(len(keys), dtype=np.int64)
+        first_row[partition[::-1]] = np.arange(n_row)[::-1]
+        partition_weights = membership[first_row].T
+        LogUtil.log('INFO', 'len(subsets)=%d, len(partitions)=%d' % (len(subsets_indexs), len(keys)))
+
+        # Q1、Q2中词语出现情况
+        vocab = {}
+        docs, ind1, ind2 = sparse_utils._unique_docs(train_data['question1'].tolist(), train_data['question2'].tolist())
+        presence = sparse_utils._binarize(sparse_utils._count_matrix(docs, vocab, tokenizer))
+        q1_presence = presence[ind1]
+        q2_presence = presence[ind2]
+        dside = q1_presence.multiply(q2_presence).tocsr()
+        aside = (q1_presence + q2_presence - dside).tocsr()
+        oside = (aside - dside).tocsr()
+        words = [None] * len(vocab)
+        for word in vocab:
+            words[vocab[word]] = word
+        LogUtil.log('INFO', 'init presence matrix done, len(vocab)=%d' % len(vocab))
+
+        # 分区统计量
+        labels = np.asarray(train_data['is_duplicate'], dtype=int)
+        rows = np.arange(n_row)
+        indicator = sparse.csr_matrix((np.ones(n_row), (partition, rows)), shape=(len(keys), n_row))
+        neg_indicator = sparse.csr_matrix(((labels == 0).astype(float), (partition, rows)), shape=(len(keys), n_row))
+        pos_indicator = sparse.csr_matrix(((labels == 1).astype(float), (partition, rows)), shape=(len(keys), n_row))
+        partition_counts = np.array([indicator.dot(aside).toarray(),
+                                     indicator.dot(oside).toarray(),
+                                     neg_indicator.dot(oside).toarray(),
+                                     indicator.dot(dside).toarray(),
+                                     pos_indicator.dot(dside).toarray()])
+
+        # 子集统计量
+        subsets_counts = [np.tensordot(partition_weights[subset_id], partition_counts, axes=([0], [1]))
+                          for subset_id in range(len(subsets_indexs))]
+        return words, subsets_counts
+
+    @staticmethod
+    def cal_word_power_by_counts(words, counts, num_pairs):
+        """
+        根据统计量计算词语的影响力，格式同cal_word_power
+        :param words: 词表
+        :param counts: 统计量矩阵，见cal_word_power_counts
+        :param num_pairs: 子集中语句对数量
+        :return: 按出现语句对数量降序排列的影响力词表
+        """
+        n_pair, n_oside, n_oside_neg, n_dside, n_dside_pos = counts
+        valid = np.where(n_pair > 0)[0]
+        valid = valid[np.argsort(-n_pair[valid], kind='mergesort')]
+        n_pair, n_oside, n_oside_neg, n_dside, n_dside_pos = counts[:, valid]
+
+        stats = np.zeros((len(valid), 7))
+        # 出现语句对数量及比例
+        stats[:, 0] = n_pair
+        stats[:, 1] = n_pair / num_pairs
+        # 正确语句对比例
+        stats[:, 2] = (n_oside_neg + n_dside_pos) / n_pair
+        # 单侧语句对比例及正确比例
+        stats[:, 3] = n_oside / n_pair
+        stats[:, 4] = np.where(n_oside > 1e-6, n_oside_neg / np.maximum(n_oside, 1.), n_oside_neg)
+        # 双侧语句对比例及正确比例
+        stats[:, 5] = n_dside / n_pair
+        stats[:, 6] = np.where(n_dside > 1e-6, n_dside_pos / np.maximum(n_dside, 1.), n_dside_pos)
+
+        sorted_words_power = [(words[valid[index]], list(stats[index])) for index in range(len(valid))]
+        LogUtil.log("INFO", "power words calculation done, len(words_power)=%d" % len(sorted_words_power))
+        return sorted_words_power
+
+    @staticmethod
+    def cal_subsets_word_power(train_data, subsets_indexs, tokenizer=sparse_utils._lower_split):
+        """
+        一次性计算多个子集（如交叉验证的各折训练集）的影响力词表
+        :param train_data: 训练数据
+        :param subsets_indexs: 子集索引列表
+        :param tokenizer: 分词函数
+        :return: 各子集的影响力词表
+        """
+        words, subsets_counts = PowerfulWord.cal_word_power_counts(train_data, subsets_indexs, tokenizer)
+        return [PowerfulWord.cal_word_power_by_counts(words, subsets_counts[subset_id], len(subsets_indexs[subset_id]))
+                for subset_id in range(len(subsets_indexs))]
+
     @staticmethod
     def cal_word_power(train_data, train_subset_indexs):
         """
@@ -485,56 +748,16 @@ class PowerfulWord(object):
         :param data: 训练数据
         :return: 影响力词典
         """
-        words_power = {}
-        train_subset_data = train_data.iloc[train_subset_indexs, :]
-        for index, row in train_subset_data.iterrows():
-            label = int(row['is_duplicate'])
-            q1_words = str(row['question1']).lower().split()
-            q2_words = str(row['question2']).lower().split()
-            all_words = set(q1_words + q2_words)
-            q1_words = set(q1_words)
-            q2_words = set(q2_words)
-            for word in all_words:
-                if word not in words_power:
-                    words_power[word] = [0. for i in range(7)]
-                # 计算出现语句对数量
-                words_power[word][0] += 1.
-                words_power[word][1] += 1.
-
-                if ((word in q1_words) and (word not in q2_words)) or ((word not in q1_words) and (word in q2_words)):
-                    # 计算单侧语句数量
-                    words_power[word][3] += 1.
-                    if 0 == label:
-                        # 计算正确语句对数量
-                        words_power[word][2] += 1.
-                        # 计算单侧语句正确比例
-                        words_power[word][4] += 1.
-                if (word in q1_words) and (word in q2_words):
-                    # 计算双侧语句数量
-                    words_power[word][5] += 1.
-                    if 1 == label:
-                        # 计算正确语句对数量
-                        words_power[word][2] += 1.
-                        # 计算双侧语句正确比例
-                        words_power[word][6] += 1.
-        for word in words_power:
-            # 计算出现语句对比例
-            words_power[word][1] /= len(train_subset_indexs)
-            # 计算正确语句对比例
-            words_power[word][2] /= words_power[word][0]
-            # 计算单侧语句对正确比例
-            if words_power[word][3] > 1e-6:
-                words_power[word][4] /= words_power[word][3]
-            # 计算单侧语句对比例
-            words_power[word][3] /= words_power[word][0]
-            # 计算双侧语句对正确比例
-            if words_power[word][5] > 1e-6:
-                words_power[word][6] /= words_power[word][5]
-            # 计算双侧语句对比例
-            words_power[word][5] /= words_power[word][0]
-        sorted_words_power = sorted(words_power.iteritems(), key=lambda d: d[1][0], reverse=True)
-        LogUtil.log("INFO", "power words calculation done, len(words_power)=%d" % len(sorted_words_power))
-        return sorted_words_power
+        return PowerfulWord.cal_subsets_word_power(train_data, [train_subset_indexs])[0]
+
+    @staticmethod
+    def load_cv_indexs(cf, tag, cv_num, rawset_name='train_with_swap'):
+        """
+        加载交叉验证各折训练集索引
+        :return: 索引列表
+        """
+        return [Feature.load_index('%s/cv_tag%s_n%d_f%d_train.%s.index' % (
+            cf.get('DEFAULT', 'feature_index_pt'), tag, cv_num, fold_id, rawset_name)) for fold_id in range(cv_num)]
 
     @staticmethod
     def save_word_power(words_power, fp):
@@ -570,41 +793,60 @@ class PowerfulWord(object):
         return words_power
 
     @staticmethod
-    def tag_dside_word_power(row):
+    def tag_word_power(data, words, tokenizer=sparse_utils._lower_split):
         """
-        针对一个Pair抽取特征：是否包含双边影响力词表
-        :param row: 一个Pair实例
-        :return: Tags
-        """
-        tags = []
-        q1_words = str(row['question1']).lower().split()
-        q2_words = str(row['question2']).lower().split()
-        for word in PowerfulWord.dside_word_power:
-            if (word in q1_words) and (word in q2_words):
-                tags.append(1.0)
-            else:
-                tags.append(0.0)
+        通过影响力词的哈希索引，标记Q1、Q2中出现的影响力词，每个去重question只分词一次
+        :param data: DataFrame数据
+        :param words: 影响力词表
+        :param tokenizer: 分词函数
+        :return: (Q1标记矩阵, Q2标记矩阵)，第i列表示是否包含words[i]
+        """
+        word2col = dict((word, index) for index, word in enumerate(words))
+        docs, ind1, ind2 = sparse_utils._unique_docs(data['question1'].tolist(), data['question2'].tolist())
+        tags = sparse_utils._binarize(sparse_utils._count_matrix(docs, word2col, tokenizer, grow=False))
+        return tags[ind1], tags[ind2]
+
+    @staticmethod
+    def tag_dside_word_power(data, words, tokenizer=sparse_utils._lower_split):
+        """
+        抽取特征：是否包含双边影响力词表
+        :param data: DataFrame数据
+        :param words: 双边影响力词表
+        :param tokenizer: 分词函数
+        :return: Tags，CSR矩阵
+        """
+        q1_tags, q2_tags = PowerfulWord.tag_word_power(data, words, tokenizer)
+        tags = q1_tags.multiply(q2_tags).tocsr()
+        tags.eliminate_zeros()
         return tags
 
     @staticmethod
-    def tag_oside_word_power(row):
+    def tag_oside_word_power(data, words, tokenizer=sparse_utils._lower_split):
         """
-        针对一个Pair抽取特征：是否包含单边影响力词表
-        :param row:
-        :return:
+        抽取特征：是否包含单边影响力词表
+        :param data: DataFrame数据
+        :param words: 单边影响力词表
+        :param tokenizer: 分词函数
+        :return: Tags，CSR矩阵
         """
-        tags = []
-        q1_words = set(str(row['question1']).lower().split())
-        q2_words = set(str(row['question2']).lower().split())
-        for word in PowerfulWord.oside_word_power:
-            if (word in q1_words) and (word not in q2_words):
-                tags.append(1.0)
-            elif (word not in q1_words) and (word in q2_words):
-                tags.append(1.0)
-            else:
-                tags.append(0.0)
+        q1_tags, q2_tags = PowerfulWord.tag_word_power(data, words, tokenizer)
+        tags = (q1_tags + q2_tags - 2 * q1_tags.multiply(q2_tags)).tocsr()
+        tags.eliminate_zeros()
         return tags
 
+    @staticmethod
+    def log_tag_stat(features, labels):
+        """
+        统计正负例中被标记的语句对数量
+        :param features: Tags，CSR矩阵
+        :param labels: 标签
+        :return: NONE
+        """
+        has_tag = np.diff(features.tocsr().indptr) > 0
+        labels = np.asarray(labels)
+        LogUtil.log("INFO", 'train neg: sum=%.2f, train pos: sum=%.2f' % (
+            np.sum(has_tag & (labels == 0)), np.sum(has_tag & (labels == 1))))
+
     @staticmethod
     def run_dside_word_power(train_data, test_data, words_power_fp, feature_pt):
 
@@ -614,23 +856,13 @@ class PowerfulWord(object):
         PowerfulWord.init_dside_word_power(words_power)
 
         # 抽取双边影响力词表特征
-        train_features = train_data.apply(PowerfulWord.tag_dside_word_power, axis=1, raw=True)
-        Feature.save_dataframe(train_features, feature_pt + '/dside_word_power.train.smat')
-        test_features = test_data.apply(PowerfulWord.tag_dside_word_power, axis=1, raw=True)
-        Feature.save_dataframe(test_features, feature_pt + '/dside_word_power.test.smat')
+        train_features = PowerfulWord.tag_dside_word_power(train_data, PowerfulWord.dside_word_power)
+        Feature.save_smat(train_features, feature_pt + '/dside_word_power.train.smat')
+        test_features = PowerfulWord.tag_dside_word_power(test_data, PowerfulWord.dside_word_power)
+        Feature.save_smat(test_features, feature_pt + '/dside_word_power.test.smat')
 
         # 统计
-        neg_train_features = train_features[train_data['is_duplicate'] == 0]
-        num_neg_dside_pair = 0
-        for row in neg_train_features:
-            if sum(row):
-                num_neg_dside_pair += 1
-        pos_train_features = train_features[train_data['is_duplicate'] == 1]
-        num_pos_dside_pair = 0
-        for row in pos_train_features:
-            if sum(row):
-                num_pos_dside_pair += 1
-        LogUtil.log("INFO", 'train neg: sum=%.2f, train pos: sum=%.2f' % (num_neg_dside_pair, num_pos_dside_pair))
+        PowerfulWord.log_tag_stat(train_features, train_data['is_duplicate'])
         return
 
     @staticmethod
@@ -642,40 +874,27 @@ class PowerfulWord(object):
         PowerfulWord.init_oside_word_power(words_power)
 
         # 抽取单边影响力词表特征
-        train_features = train_data.apply(PowerfulWord.tag_oside_word_power, axis=1, raw=True)
-        Feature.save_dataframe(train_features, feature_pt + '/oside_word_power.train.smat')
-        test_features = test_data.apply(PowerfulWord.tag_oside_word_power, axis=1, raw=True)
-        Feature.save_dataframe(test_features, feature_pt + '/oside_word_power.test.smat')
+        train_features = PowerfulWord.tag_oside_word_power(train_data, PowerfulWord.oside_word_power)
+        Feature.save_smat(train_features, feature_pt + '/oside_word_power.train.smat')
+        test_features = PowerfulWord.tag_oside_word_power(test_data, PowerfulWord.oside_word_power)
+        Feature.save_smat(test_features, feature_pt + '/oside_word_power.test.smat')
 
         # 统计
-        neg_train_features = train_features[train_data['is_duplicate'] == 0]
-        num_neg_oside_pair = 0
-        for row in neg_train_features:
-            if sum(row):
-                num_neg_oside_pair += 1
-        pos_train_features = train_features[train_data['is_duplicate'] == 1]
-        num_pos_oside_pair = 0
-        for row in pos_train_features:
-            if sum(row):
-                num_pos_oside_pair += 1
-        LogUtil.log("INFO", 'train neg: sum=%.2f, train pos: sum=%.2f' % (num_neg_oside_pair, num_pos_oside_pair))
+        PowerfulWord.log_tag_stat(train_features, train_data['is_duplicate'])
         return
 
     @staticmethod
-    def tag_any_dside_word_power(row):
+    def tag_any_dside_word_power(data, words, tokenizer=sparse_utils._lower_split):
         """
-        针对一个Pair抽取特征：是否包含任一双边影响力词表
-        :param row: 一个Pair实例
-        :return: Tag
+        抽取特征：是否包含任一双边影响力词表
+        :param data: DataFrame数据
+        :param words: 双边影响力词表
+        :param tokenizer: 分词函数
+        :return: Tag，CSR矩阵
         """
-        tag = [0.0]
-        q1_words = str(row['question1']).lower().split()
-        q2_words = str(row['question2']).lower().split()
-        for word in PowerfulWord.dside_word_power:
-            if (word in q1_words) and (word in q2_words):
-                tag[0] = 1.0
-                break
-        return tag
+        tags = PowerfulWord.tag_dside_word_power(data, words, tokenizer)
+        tag = (np.diff(tags.indptr) > 0).astype(float).reshape(-1, 1)
+        return sparse.csr_matrix(tag)
 
     @staticmethod
     def run_any_dside_word_power(train_data, test_data, words_power_fp, feature_pt):
@@ -693,23 +912,13 @@ class PowerfulWord(object):
         PowerfulWord.init_dside_word_power(words_power)
 
         # 抽取双边影响力词表特征
-        train_features = train_data.apply(PowerfulWord.tag_any_dside_word_power, axis=1, raw=True)
-        Feature.save_dataframe(train_features, feature_pt + '/any_dside_word_power.train.smat')
-        test_features = test_data.apply(PowerfulWord.tag_any_dside_word_power, axis=1, raw=True)
-        Feature.save_dataframe(test_features, feature_pt + '/any_dside_word_power.test.smat')
+        train_features = PowerfulWord.tag_any_dside_word_power(train_data, PowerfulWord.dside_word_power)
+        Feature.save_smat(train_features, feature_pt + '/any_dside_word_power.train.smat')
+        test_features = PowerfulWord.tag_any_dside_word_power(test_data, PowerfulWord.dside_word_power)
+        Feature.save_smat(test_features, feature_pt + '/any_dside_word_power.test.smat')
 
         # 统计
-        neg_train_features = train_features[train_data['is_duplicate'] == 0]
-        num_neg_dside_pair = 0
-        for row in neg_train_features:
-            if sum(row):
-                num_neg_dside_pair += 1
-        pos_train_features = train_features[train_data['is_duplicate'] == 1]
-        num_pos_dside_pair = 0
-        for row in pos_train_features:
-            if sum(row):
-                num_pos_dside_pair += 1
-        LogUtil.log("INFO", 'train neg: sum=%.2f, train pos: sum=%.2f' % (num_neg_dside_pair, num_pos_dside_pair))
+        PowerfulWord.log_tag_stat(train_features, train_data['is_duplicate'])
         return
 
     @staticmethod
@@ -805,6 +1014,30 @@ class PowerfulWord(object):
         # 存储影响力词表
         PowerfulWord.save_word_power(words_power, words_power_fp)
 
+    @staticmethod
+    def generate_cv_word_power(cf, argv):
+        """
+        生成并存储交叉验证各折训练集上的影响力词表
+        :param cf: 配置
+        :param argv: [tag, cv_num]
+        :return: NONE
+        """
+        tag = argv[0]
+        cv_num = int(argv[1])
+
+        # 加载stem.train.csv文件
+        train_stem_data = pd.read_csv('%s/stem.train.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
+        # 加载各折训练集索引
+        cv_indexs = PowerfulWord.load_cv_indexs(cf, tag, cv_num)
+
+        # 计算并存储各折影响力词表
+        cv_words_power = PowerfulWord.cal_subsets_word_power(train_stem_data, cv_indexs)
+        for fold_id in range(cv_num):
+            words_power_fp = '%s/words_power.stem.cv_tag%s_n%d_f%d_train.train_with_swap.txt' % (
+                cf.get('DEFAULT', 'feature_stat_pt'), tag, cv_num, fold_id)
+            PowerfulWord.save_word_power(cv_words_power[fold_id], words_power_fp)
+            LogUtil.log('INFO', 'save word power done (%s)' % words_power_fp)
+
     @staticmethod
     def run_rate_by_oside_word_power(train_data, test_data, words_power_fp, feature_pt):
         import matplotlib
@@ -848,11 +1081,13 @@ class PowerfulWord(object):
         PowerfulWord.init_aside_word_power(words_power)
 
     @staticmethod
-    def run():
-        # 读取配置文件
-        cf = ConfigParser.ConfigParser()
-        cf.read("../conf/python.conf")
-
+    def generate_subset_word_power(cf, argv):
+        """
+        生成并存储训练子集上的影响力词表
+        :param cf: 配置
+        :param argv: NONE
+        :return: NONE
+        """
         # 加载stem.train.csv文件
         train_stem_data = pd.read_csv('%s/stem.train.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
         # 加载训练子集索引文件（NOTE: 不是训练集）
@@ -866,6 +1101,17 @@ class PowerfulWord(object):
         # 生成影响力词表
         PowerfulWord.generate_word_power(train_stem_data, train_subset_indexs, words_power_stem_fp)
 
+    @staticmethod
+    def run(cf, argv):
+        cmd = argv[0]
+
+        if 'generate_subset_word_power' == cmd:
+            PowerfulWord.generate_subset_word_power(cf, argv[1:])
+        elif 'generate_cv_word_power' == cmd:
+            PowerfulWord.generate_cv_word_power(cf, argv[1:])
+        else:
+            LogUtil.log('WARNING', 'NO CMD')
+
     @staticmethod
     def demo():
         """
@@ -1149,62 +1395,46 @@ class TreeParser(object):
         4.  最大分叉数
     """
 
-    questions_features = None
-
     @staticmethod
-    def extract_questions_ind_multi(tree_fp):
-        features = {}
-        f = open(tree_fp)
-        for line in f:
-            [qid, json_s] = line.split(' ', 1)
-            features[qid] = []
-            parent = {}
-            indegree = {}
-            # 计算入度和父节点
-            if 0 < len(json_s.strip()):
-                tree_obj = json.loads(json_s)
-                assert len(tree_obj) <= 1
-                tree_obj = tree_obj[0]
-                for k, r in sorted(tree_obj.items(), key=lambda x: int(x[0]))[1:]:
-                    if r['word'] is None:
-                        continue
-                    head = int(r['head'])
-                    k = int(k)
-                    if 0 == head:
-                        root = k
-                    parent[k] = head
-                    indegree[head] = indegree.get(head, 0) + 1
-            # 计算入度乘积
-            ind_multi = 1.0
-            for id_node in indegree:
-                ind_multi *= indegree[id_node]
-            features[str(qid)] = [ind_multi]
-        f.close()
-        return features
+    def load_questions_features(tree_fp, n_jobs=1):
+        """
+        解析语法树文件，得到每个问题的特征，结果缓存在 <tree_fp>.features.npz
+        :param tree_fp: 语法树文件路径
+        :param n_jobs: 解析使用的进程数
+        :return: (qid -> 行号, (n_questions, 5) 特征矩阵)，特征依次为叶子节点个数、树深度、根节点分叉数、最大分叉数、入度乘积
+        """
+        cache_fp = '%s.features.npz' % tree_fp
+        if isfile(cache_fp):
+            cache = np.load(cache_fp)
+            qids, features = cache['qids'].tolist(), cache['features']
+        else:
+            qids, features = tree_utils._parse_tree_file(tree_fp, n_jobs)
+            np.savez(cache_fp, qids=np.array(qids), features=features)
+        # 重复的 qid 以最后一行为准
+        qid2row = dict((qid, index) for index, qid in enumerate(qids))
+        LogUtil.log('INFO', 'load questions features done (%s), len(questions)=%d' % (tree_fp, len(qid2row)))
+        return qid2row, features
 
     @staticmethod
-    def extract_row_ind_multi(row):
-        q1_id = str(row['qid1'])
-        q2_id = str(row['qid2'])
-        q1_features = TreeParser.questions_features[q1_id]
-        q2_features = TreeParser.questions_features[q2_id]
-        sum_features = (np.array(q1_features) + np.array(q2_features)).tolist()
-        sub_features = abs(np.array(q1_features) - np.array(q2_features)).tolist()
-        div_features = (np.array(q1_features) / (np.array(q2_features) + 1.)).tolist()
-        mul_features = (np.array(q1_features) * (np.array(q2_features) + 0.)).tolist()
-        features = q1_features + q2_features + sum_features + sub_features + div_features + mul_features
-        return features
+    def pair_features(data, qid2row, features):
+        """
+        :return: Q1 与 Q2 的特征矩阵
+        """
+        q1_rows = np.array([qid2row[str(qid)] for qid in data['qid1'].tolist()], dtype=np.int64)
+        q2_rows = np.array([qid2row[str(qid)] for qid in data['qid2'].tolist()], dtype=np.int64)
+        return features[q1_rows], features[q2_rows]
 
     @staticmethod
-    def extract_ind_multi(data, tree_fp):
-        TreeParser.questions_features = TreeParser.extract_questions_ind_multi(tree_fp)
-        LogUtil.log('INFO', 'extract questions features done (%s)' % tree_fp)
-        features = data.apply(TreeParser.extract_row_ind_multi, axis=1, raw=True)
+    def extract_ind_multi(data, tree_fp, n_jobs=1):
+        qid2row, features = TreeParser.load_questions_features(tree_fp, n_jobs)
+        q1_features, q2_features = TreeParser.pair_features(data, qid2row, features[:, 4:5])
+        features = np.hstack([q1_features, q2_features, q1_features + q2_features, abs(q1_features - q2_features),
+                              q1_features / (q2_features + 1.), q1_features * q2_features])
         LogUtil.log('INFO', 'extract data features done, len(features)=%d' % len(features))
         return features
 
     @staticmethod
-    def run_ind_multi(train_df, test_df, feature_pt, train_tree_fp, test_tree_fp):
+    def run_ind_multi(train_df, test_df, feature_pt, train_tree_fp, test_tree_fp, n_jobs=1):
         """
         抽取特征，语法树入度乘积，及加减乘除变化
         :param train_df:
@@ -1212,110 +1442,36 @@ class TreeParser(object):
         :param feature_pt:
         :param train_tree_fp:
         :param test_tree_fp:
+        :param n_jobs:
         :return:
         """
-        train_features = TreeParser.extract_ind_multi(train_df, train_tree_fp)
+        train_features = TreeParser.extract_ind_multi(train_df, train_tree_fp, n_jobs)
         Feature.save_dataframe(train_features, feature_pt + '/ind_multi.train.smat')
 
-        test_features = TreeParser.extract_ind_multi(test_df, test_tree_fp)
+        test_features = TreeParser.extract_ind_multi(test_df, test_tree_fp, n_jobs)
         Feature.save_dataframe(test_features, feature_pt + '/ind_multi.test.smat')
 
     @staticmethod
-    def extract_questions_features(tree_fp):
-        features = {}
-        f = open(tree_fp)
-        for line in f:
-            [qid, json_s] = line.split(' ', 1)
-            # print 'qid=%s' % qid
-            features[qid] = []
-            root = -1
-            parent = {}
-            indegree = {}
-            # print 'len(json_s=%d)' % len(json_s.strip())
-            # 计算入度和父节点
-            if 0 < len(json_s.strip()):
-                tree_obj = json.loads(json_s)
-                assert len(tree_obj) <= 1
-                tree_obj = tree_obj[0]
-                for k, r in sorted(tree_obj.items(), key=lambda x: int(x[0]))[1:]:
-                    if r['word'] is None:
-                        continue
-                    head = int(r['head'])
-                    k = int(k)
-                    if 0 == head:
-                        root = k
-                    # print '%s --> %s' % (k, head)
-                    parent[k] = head
-                    indegree[head] = indegree.get(head, 0) + 1
-            # 根节点
-            # print 'root=%d' % root
-            # print parent
-            # 计算叶子节点个数
-            n_child = 0
-            for i in parent:
-                if i not in indegree:
-                    n_child += 1
-            # print 'n_child=%d' % n_child
-            # 计算树深度
-            depth = 0
-            for i in parent:
-                if i not in indegree:
-                    temp_id = i
-                    temp_depth = 0
-                    while (temp_id in parent) and (0 != parent[temp_id]):
-                        temp_depth += 1
-                        temp_id = parent[temp_id]
-                        # print '\t%d' % temp_id,
-                    depth = max(depth, temp_depth)
-                    # print ''
-            # print 'depth=%d' % depth
-            # 计算根节点分叉数目
-            n_root_braches = indegree.get(root, 0)
-            # print 'n_root_braches=%d' % n_root_braches
-            # 计算最大分叉数目
-            n_max_braches = 0
-            if 0 < len(indegree):
-                n_max_braches = max(indegree.values())
-            # print 'n_max_braches=%d' % n_max_braches
-            features[str(qid)] = [n_child, depth, n_root_braches, n_max_braches]
-        f.close()
-        return features
-
-    @staticmethod
-    def extract_feature(row):
-        q1_id = str(row['qid1'])
-        q2_id = str(row['qid2'])
-        # print q1_id
-        # print q2_id
-        q1_features = TreeParser.questions_features[q1_id]
-        q2_features = TreeParser.questions_features[q2_id]
-
-        return q1_features + q2_features + abs(np.array(q1_features) - np.array(q2_features)).tolist()
-
-    @staticmethod
-    def extract_features(data):
-        assert TreeParser.questions_features is not None, "TreeParser.questions_features is None"
-        features = data.apply(TreeParser.extract_feature, axis=1, raw=True)
-        return features
+    def extract_features(data, tree_fp, n_jobs=1):
+        qid2row, features = TreeParser.load_questions_features(tree_fp, n_jobs)
+        q1_features, q2_features = TreeParser.pair_features(data, qid2row, features[:, :4])
+        return np.hstack([q1_features, q2_features, abs(q1_features - q2_features)])
 
     @staticmethod
-    def run_tree_parser(train_df, test_df, feature_pt, train_tree_fp, test_tree_fp):
+    def run_tree_parser(train_df, test_df, feature_pt, train_tree_fp, test_tree_fp, n_jobs=1):
         """
         抽取特征
         :param trian_df:
         :param test_df:
         :param feature_pt:
+        :param n_jobs:
         :return:
         """
-        TreeParser.questions_features = TreeParser.extract_questions_features(train_tree_fp)
-        LogUtil.log('INFO', 'extract train questions features done')
-        train_features = TreeParser.extract_features(train_df)
+        train_features = TreeParser.extract_features(train_df, train_tree_fp, n_jobs)
         LogUtil.log('INFO', 'extract train features done')
         Feature.save_dataframe(train_features, feature_pt + '/tree_parser.train.smat')
 
-        TreeParser.questions_features = TreeParser.extract_questions_features(test_tree_fp)
-        LogUtil.log('INFO', 'extract test questions features done')
-        test_features = TreeParser.extract_features(test_df)
+        test_features = TreeParser.extract_features(test_df, test_tree_fp, n_jobs)
         LogUtil.log('INFO', 'extract test features done')
         Feature.save_dataframe(test_features, feature_pt + '/tree_parser.test.smat')
 
@@ -1351,10 +1507,7 @@ class TreeParser(object):
         train_tree_fp = '%s/train_qid_query_detparse.txt' % cf.get('DEFAULT', 'devel_pt')
 
         # 提取特征
-        TreeParser.questions_features = TreeParser.extract_questions_ind_multi(train_tree_fp)
-        LogUtil.log('INFO', 'extract questions features done (%s)' % train_tree_fp)
-        features = train_swap_data.apply(TreeParser.extract_row_ind_multi, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract data features done, len(features)=%d' % len(features))
+        features = TreeParser.extract_ind_multi(train_swap_data, train_tree_fp)
 
         Feature.save_dataframe(features, feature_path + '/ind_multi.train_swap.smat')
 
@@ -1464,6 +1617,7 @@ class BTM(object):
 class WordEmbedding(object):
     idf = {}
     we_dict = {}
+    we_index = None
     to_lower = True
     len_vec = 300
 
@@ -1492,10 +1646,15 @@ class WordEmbedding(object):
     @staticmethod
     def load_word_embedding(fp):
         """
-        加载 Map(word, vector) 词典
+        加载 Map(word, vector) 词典，若已转换为二进制格式（见convert_word_embedding）则直接内存映射
         :param fp:
         :return:
         """
+        if embedding_utils._has_store(fp):
+            we_dic = embedding_utils.WordVectors(fp)
+            LogUtil.log('INFO', 'load word embedding store done (%s), len(words)=%d, dim=%d' % (
+                fp, len(we_dic), we_dic.matrix.shape[1]))
+            return we_dic
         we_dic = {}
         f = open(fp, 'r')
         for line in f:
@@ -1510,244 +1669,165 @@ class WordEmbedding(object):
         return we_dic
 
     @staticmethod
-    def extract_row_ave_dis(row):
+    def convert_word_embedding(cf, argv):
         """
-        按行抽取特征
-        :param row:
+        将文本格式的 word embedding 转换为二进制格式：词表文件 + 连续存储的矩阵
+        :param cf:
+        :param argv: [word embedding 路径, 存储类型(float32/float16)]
         :return:
         """
-        q1_words = str(row['question1']).strip().split() if WordEmbedding.to_lower else str(
-            row['question1']).lower().strip().split()
-        q2_words = str(row['question2']).strip().split() if WordEmbedding.to_lower else str(
-            row['question2']).lower().strip().split()
-
-        q1_vec = np.array(WordEmbedding.len_vec * [0.])
-        q2_vec = np.array(WordEmbedding.len_vec * [0.])
+        word_embedding_fp = argv[0]
+        dtype = argv[1] if 1 < len(argv) else 'float32'
 
-        for word in q1_words:
-            if word in WordEmbedding.we_dict:
-                q1_vec = q1_vec + WordEmbedding.we_dict[word]
-        for word in q2_words:
-            if word in WordEmbedding.we_dict:
-                q2_vec = q2_vec + WordEmbedding.we_dict[word]
+        n_words, dim = embedding_utils._convert(word_embedding_fp, dtype)
+        LogUtil.log('INFO', 'convert word embedding done (%s), len(words)=%d, dim=%d, dtype=%s' % (
+            word_embedding_fp, n_words, dim, dtype))
 
-        cos_sim = 0.
-
-        q1_vec = np.mat(q1_vec)
-        q2_vec = np.mat(q2_vec)
-
-        factor = linalg.norm(q1_vec) * linalg.norm(q2_vec)
-        if 1e-6 < factor:
-            cos_sim = float(q1_vec * q2_vec.T) / factor
-
-        return [cos_sim]
+    @staticmethod
+    def tokenize(question, lower):
+        return str(question).lower().strip().split() if lower else str(question).strip().split()
 
     @staticmethod
-    def extract_row_tfidf_dis(row):
+    def init_sentence_vectors(data, lower, weighted):
         """
-        按行抽取特征
-        :param row:
+        针对去重后的question批量计算句向量：词频（或TF-IDF加权）文档-词稀疏矩阵 x word embedding 矩阵
+        :param data: DataFrame数据
+        :param lower: 是否转化为小写
+        :param weighted: 是否使用IDF加权
+        :return: 句向量矩阵, Q1行号, Q2行号
+        """
+        word2row, matrix = WordEmbedding.we_index
+        weights = None
+        if weighted:
+            weights = np.zeros(len(word2row))
+            for word in WordEmbedding.idf:
+                if word in word2row:
+                    weights[word2row[word]] = WordEmbedding.idf[word]
+        docs, ind1, ind2 = sparse_utils._unique_docs(data['question1'].tolist(), data['question2'].tolist())
+        counts = sparse_utils._count_matrix(docs, word2row, lambda q: WordEmbedding.tokenize(q, lower), grow=False)
+        vecs = embedding_utils._sentence_vectors(counts, matrix, weights)
+        LogUtil.log('INFO', 'init sentence vectors done, len(docs)=%d, lower=%s, weighted=%s' % (
+            len(docs), lower, weighted))
+        return vecs, ind1, ind2
+
+    @staticmethod
+    def init(cf, argv):
+        """
+        设置参数并加载 word embedding 词典
+        :param cf:
+        :param argv: [word embedding 路径, word embedding 维度, 是否需要转化为小写]
         :return:
         """
-        q1_words = str(row['question1']).strip().split() if 'True' == WordEmbedding.to_lower else str(
-            row['question1']).lower().strip().split()
-        q2_words = str(row['question2']).strip().split() if 'True' == WordEmbedding.to_lower else str(
-            row['question2']).lower().strip().split()
-
-        q1_vec = np.array(WordEmbedding.len_vec * [0.])
-        q2_vec = np.array(WordEmbedding.len_vec * [0.])
-
-        q1_words_cnt = {}
-        q2_words_cnt = {}
-        for word in q1_words:
-            q1_words_cnt[word] = q1_words_cnt.get(word, 0.) + 1.
-        for word in q2_words:
-            q2_words_cnt[word] = q2_words_cnt.get(word, 0.) + 1.
-
-        for word in q1_words_cnt:
-            if word in WordEmbedding.we_dict:
-                q1_vec = q1_vec + WordEmbedding.idf.get(word, 0.) * q1_words_cnt[word] * WordEmbedding.we_dict[word]
-        for word in q2_words_cnt:
-            if word in WordEmbedding.we_dict:
-                q2_vec = q2_vec + WordEmbedding.idf.get(word, 0.) * q2_words_cnt[word] * WordEmbedding.we_dict[word]
-
-        cos_sim = 0.
-
-        q1_vec = np.mat(q1_vec)
-        q2_vec = np.mat(q2_vec)
-
-        factor = linalg.norm(q1_vec) * linalg.norm(q2_vec)
-        if 1e-6 < factor:
-            cos_sim = float(q1_vec * q2_vec.T) / factor
-
-        return [cos_sim]
-
-    @staticmethod
-    def extract_ave_dis(cf, argv):
-        # 运行需要设置的参数
         word_embedding_fp = argv[0]  # word embedding 路径
-        feature_name = argv[1]  # 特征名字
-        WordEmbedding.len_vec = int(argv[2])  # word embedding 维度
-        WordEmbedding.to_lower = bool(argv[3])  # 是否需要转化为小写
+        WordEmbedding.len_vec = int(argv[1])  # word embedding 维度
+        WordEmbedding.to_lower = bool(argv[2])  # 是否需要转化为小写
 
         # 加载 word embedding 词典
         WordEmbedding.we_dict = WordEmbedding.load_word_embedding(word_embedding_fp)
+        WordEmbedding.we_index = embedding_utils._from_dict(WordEmbedding.we_dict)
         LogUtil.log('INFO', 'load word embedding dict done')
 
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test_with_qid.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
-
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        train_features = train_data.apply(WordEmbedding.extract_row_ave_dis, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features done')
-        test_features = test_data.apply(WordEmbedding.extract_row_ave_dis, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features done')
-
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features done')
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features done')
-
     @staticmethod
-    def extract_tfidf_dis(cf, argv):
-        # 运行需要设置的参数
-        word_embedding_fp = argv[0]  # word embedding 路径
-        feature_name = argv[1]  # 特征名字
-        WordEmbedding.len_vec = int(argv[2])  # word embedding 维度
-        WordEmbedding.to_lower = bool(argv[3])  # 是否需要转化为小写
-
-        # 加载 word embedding 词典
-        WordEmbedding.we_dict = WordEmbedding.load_word_embedding(word_embedding_fp)
-        LogUtil.log('INFO', 'load word embedding dict done')
-
+    def init_idf_by_cf(cf):
         # 计算IDF词表
         train_qid2q_fp = '%s/train_qid2question.csv' % cf.get('DEFAULT', 'devel_pt')
         train_qid2q = pd.read_csv(train_qid2q_fp).fillna(value="")
         WordEmbedding.init_idf(train_qid2q)
 
+    @staticmethod
+    def extract(cf, feature_names):
+        """
+        抽取 Word Embedding 特征，相同分词方式及权重的特征共享同一份句向量
+        :param cf:
+        :param feature_names: Map(抽取器名字, 特征名字)，抽取器为ave_dis/tfidf_dis/ave_vec/tfidf_vec
+        :return:
+        """
+        # 各抽取器的(是否转化为小写, 是否使用IDF加权, 特征类型)，与原按行抽取的实现保持一致
+        extractors = {
+            'ave_dis': (not WordEmbedding.to_lower, False, 'dis'),
+            'tfidf_dis': (not ('True' == WordEmbedding.to_lower), True, 'dis'),
+            'ave_vec': (not WordEmbedding.to_lower, False, 'vec'),
+            'tfidf_vec': (not WordEmbedding.to_lower, True, 'vec'),
+        }
+
         # 加载数据文件
         train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
         test_data = pd.read_csv('%s/test_with_qid.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
-        # 抽取特征：train.csv
-        train_features = train_data.apply(WordEmbedding.extract_row_tfidf_dis, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (tfidf) done')
-        test_features = test_data.apply(WordEmbedding.extract_row_tfidf_dis, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (tfidf) done')
-        # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (tfidf) done')
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (tfidf) done')
+        for rawset_name, data in [('train', train_data), ('test', test_data)]:
+            sentence_vectors = {}
+            for extractor_name in ['ave_dis', 'tfidf_dis', 'ave_vec', 'tfidf_vec']:
+                if extractor_name not in feature_names:
+                    continue
+                lower, weighted, feature_type = extractors[extractor_name]
+                if (lower, weighted) not in sentence_vectors:
+                    sentence_vectors[(lower, weighted)] = WordEmbedding.init_sentence_vectors(data, lower, weighted)
+                vecs, ind1, ind2 = sentence_vectors[(lower, weighted)]
+                if 'dis' == feature_type:
+                    features = embedding_utils._pair_cosine_sim(vecs, ind1, ind2).reshape(-1, 1)
+                else:
+                    features = np.hstack([vecs[ind1], vecs[ind2]])
+                LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, extractor_name))
+                Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_names[extractor_name],
+                                                                    rawset_name))
+                LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, extractor_name))
 
     @staticmethod
-    def extract_row_ave_vec(row):
-        """
-        按行抽取特征
-        :param row:
-        :return:
-        """
-        q1_words = str(row['question1']).strip().split() if WordEmbedding.to_lower else str(
-            row['question1']).lower().strip().split()
-        q2_words = str(row['question2']).strip().split() if WordEmbedding.to_lower else str(
-            row['question2']).lower().strip().split()
+    def extract_ave_dis(cf, argv):
+        # 运行需要设置的参数
+        feature_name = argv[1]  # 特征名字
+        WordEmbedding.init(cf, [argv[0]] + argv[2:])
 
-        q1_vec = np.array(WordEmbedding.len_vec * [0.])
-        q2_vec = np.array(WordEmbedding.len_vec * [0.])
+        WordEmbedding.extract(cf, {'ave_dis': feature_name})
 
-        for word in q1_words:
-            if word in WordEmbedding.we_dict:
-                q1_vec = q1_vec + WordEmbedding.we_dict[word]
-        for word in q2_words:
-            if word in WordEmbedding.we_dict:
-                q2_vec = q2_vec + WordEmbedding.we_dict[word]
+    @staticmethod
+    def extract_tfidf_dis(cf, argv):
+        # 运行需要设置的参数
+        feature_name = argv[1]  # 特征名字
+        WordEmbedding.init(cf, [argv[0]] + argv[2:])
+        WordEmbedding.init_idf_by_cf(cf)
 
-        return list(q1_vec) + list(q2_vec)
+        WordEmbedding.extract(cf, {'tfidf_dis': feature_name})
 
     @staticmethod
     def extract_ave_vec(cf, argv):
         # 运行需要设置的参数
-        word_embedding_fp = argv[0]  # word embedding 路径
         feature_name = argv[1]  # 特征名字
-        WordEmbedding.len_vec = int(argv[2])  # word embedding 维度
-        WordEmbedding.to_lower = bool(argv[3])  # 是否需要转化为小写
+        WordEmbedding.init(cf, [argv[0]] + argv[2:])
 
-        # 加载 word embedding 词典
-        WordEmbedding.we_dict = WordEmbedding.load_word_embedding(word_embedding_fp)
-        LogUtil.log('INFO', 'load word embedding dict done')
-
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test_with_qid.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
-
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
+        WordEmbedding.extract(cf, {'ave_vec': feature_name})
 
-        train_features = train_data.apply(WordEmbedding.extract_row_ave_vec, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (ave_vec) done')
-        test_features = test_data.apply(WordEmbedding.extract_row_ave_vec, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (ave_vec) done')
+    @staticmethod
+    def extract_tfidf_vec(cf, argv):
+        # 运行需要设置的参数
+        feature_name = argv[1]  # 特征名字
+        WordEmbedding.init(cf, [argv[0]] + argv[2:])
+        WordEmbedding.init_idf_by_cf(cf)
 
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features done')
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features done')
+        WordEmbedding.extract(cf, {'tfidf_vec': feature_name})
 
     @staticmethod
-    def extract_row_tfidf_vec(row):
+    def extract_wmd(cf, argv):
         """
-        按行抽取特征
-        :param row:
+        抽取特征：Word Mover's Distance（小写、去停用词、只保留词典中的词）
+        :param cf:
+        :param argv: [word embedding 路径, 特征名字, 进程数, 截断阈值(可选，超过阈值的距离以下界代替)]
         :return:
         """
-        q1_words = str(row['question1']).strip().split() if WordEmbedding.to_lower else str(
-            row['question1']).lower().strip().split()
-        q2_words = str(row['question2']).strip().split() if WordEmbedding.to_lower else str(
-            row['question2']).lower().strip().split()
-
-        q1_vec = np.array(WordEmbedding.len_vec * [0.])
-        q2_vec = np.array(WordEmbedding.len_vec * [0.])
-
-        q1_words_cnt = {}
-        q2_words_cnt = {}
-        for word in q1_words:
-            q1_words_cnt[word] = q1_words_cnt.get(word, 0.) + 1.
-        for word in q2_words:
-            q2_words_cnt[word] = q2_words_cnt.get(word, 0.) + 1.
-
-        for word in q1_words_cnt:
-            if word in WordEmbedding.we_dict:
-                q1_vec = q1_vec + WordEmbedding.idf.get(word, 0.) * q1_words_cnt[word] * WordEmbedding.we_dict[word]
-        for word in q2_words_cnt:
-            if word in WordEmbedding.we_dict:
-                q2_vec = q2_vec + WordEmbedding.idf.get(word, 0.) * q2_words_cnt[word] * WordEmbedding.we_dict[word]
-
-        return list(q1_vec) + list(q2_vec)
-
-    @staticmethod
-    def extract_tfidf_vec(cf, argv):
         # 运行需要设置的参数
         word_embedding_fp = argv[0]  # word embedding 路径
         feature_name = argv[1]  # 特征名字
-        WordEmbedding.len_vec = int(argv[2])  # word embedding 维度
-        WordEmbedding.to_lower = bool(argv[3])  # 是否需要转化为小写
-
-        # 加载 word embedding 词典
-        WordEmbedding.we_dict = WordEmbedding.load_word_embedding(word_embedding_fp)
-        LogUtil.log('INFO', 'load word embedding dict done')
+        n_jobs = int(argv[2])  # 进程数
+        cutoff = float(argv[3]) if 3 < len(argv) else None  # 截断阈值
 
-        # 计算IDF词表
-        train_qid2q_fp = '%s/train_qid2question.csv' % cf.get('DEFAULT', 'devel_pt')
-        train_qid2q = pd.read_csv(train_qid2q_fp).fillna(value="")
-        WordEmbedding.init_idf(train_qid2q)
+        # 加载 word embedding 二进制词典
+        if not embedding_utils._has_store(word_embedding_fp):
+            WordEmbedding.convert_word_embedding(cf, [word_embedding_fp])
+        word2row, matrix = embedding_utils._load(word_embedding_fp)
+        LogUtil.log('INFO', 'load word embedding store done, len(words)=%d' % len(word2row))
 
         # 加载数据文件
         train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
@@ -1755,19 +1835,32 @@ class WordEmbedding(object):
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
-        # 抽取特征：train.csv
-        train_features = train_data.apply(WordEmbedding.extract_row_tfidf_vec, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (tfidf_vec) done')
-        test_features = test_data.apply(WordEmbedding.extract_row_tfidf_vec, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (tfidf_vec) done')
-        # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (tfidf_vec) done')
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (tfidf_vec) done')
+        for rawset_name, data in [('train', train_data), ('test', test_data)]:
+            docs, ind1, ind2 = sparse_utils._unique_docs(data['question1'].tolist(), data['question2'].tolist())
+            rows = [np.array([word2row[word] for word in WordEmbedding.tokenize(doc, True)
+                              if (word in word2row) and (word not in WordMatchShare.stops)], dtype=np.int64)
+                    for doc in docs]
+            pairs = [(rows[ind1[index]], rows[ind2[index]]) for index in range(len(ind1))]
+
+            # 抽取特征
+            features = embedding_utils._parallel_wmd(word_embedding_fp, pairs, n_jobs, cutoff)
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features.reshape(-1, 1), '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
+
+    @staticmethod
+    def extract_all(cf, argv):
+        """
+        一次性抽取全部 Word Embedding 特征
+        :param cf:
+        :param argv: [word embedding 路径, word embedding 维度, 是否需要转化为小写, ave_dis特征名, tfidf_dis特征名, ave_vec特征名, tfidf_vec特征名]
+        :return:
+        """
+        WordEmbedding.init(cf, argv[:3])
+        WordEmbedding.init_idf_by_cf(cf)
+
+        WordEmbedding.extract(cf, dict(zip(['ave_dis', 'tfidf_dis', 'ave_vec', 'tfidf_vec'], argv[3:7])))
 
     @staticmethod
     def run(argv):
@@ -1789,51 +1882,61 @@ class WordEmbedding(object):
             WordEmbedding.extract_ave_vec(cf, argv[1:])
         elif 'extract_tfidf_vec' == cmd:
             WordEmbedding.extract_tfidf_vec(cf, argv[1:])
+        elif 'convert_word_embedding' == cmd:
+            WordEmbedding.convert_word_embedding(cf, argv[1:])
+        elif 'extract_all' == cmd:
+            WordEmbedding.extract_all(cf, argv[1:])
+        elif 'extract_wmd' == cmd:
+            WordEmbedding.extract_wmd(cf, argv[1:])
 
 
 class ID(object):
 
-    question2id = {}
+    # 归一化方式 -> 问题表
+    question_tables = {}
 
     @staticmethod
-    def extract_row_id(row):
+    def load_question_table(cf, norm='strip'):
         """
-        按行抽取特征
-        :param row:
-        :return:
+        加载问题表（不存在时由 train.csv, test.csv 构建）
+        :param cf:
+        :param norm: 问题归一化方式，strip 或 nostrip
+        :return: question_table.QuestionTable
         """
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        v = max(ID.question2id.setdefault(q1, len(ID.question2id)), ID.question2id.setdefault(q2, len(ID.question2id)))
-
-        return [v]
+        if norm not in ID.question_tables:
+            prefix = '%s/question_table' % cf.get('DEFAULT', 'devel_pt')
+            if not isfile(question_table._fp(prefix, norm, 'questions.offset')):
+                n_questions = question_table._build({'train': '%s/train.csv' % cf.get('DEFAULT', 'origin_pt'),
+                                                     'test': '%s/test.csv' % cf.get('DEFAULT', 'origin_pt')}, prefix)
+                LogUtil.log('INFO', 'build question table done, n_questions=%s' % str(n_questions))
+            ID.question_tables[norm] = question_table.QuestionTable(prefix, norm)
+        return ID.question_tables[norm]
 
+    @staticmethod
+    def pair_id(pairs):
+        """
+        由 <qid1, qid2> 计算 id 特征
+        :param pairs: (n_rows, 2) <qid1, qid2>
+        :return: (n_rows, 1) 特征矩阵
+        """
+        return pairs.max(axis=1).reshape(-1, 1)
 
     @staticmethod
     def extract_id(cf, argv):
         # 设置参数
         feature_name = 'id'
 
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test_with_qid.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
+        # 问题 ID 按 train、test 中首次出现的顺序分配
+        table = ID.load_question_table(cf)
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
-        # 抽取特征：train.csv
-        train_features = train_data.apply(ID.extract_row_id, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        test_features = test_data.apply(ID.extract_row_id, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        for rawset_name in ['train', 'test']:
+            features = ID.pair_id(table.pairs(rawset_name))
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
     def run(argv):
@@ -1853,189 +1956,172 @@ class POSTag(object):
     postag = {}
 
     @staticmethod
-    def init_row_postag(row):
-        q1_postag = json.loads(row['question1_postag'])
-        for sentence in q1_postag:
-            for kv in sentence:
-                POSTag.postag.setdefault(kv[1], len(POSTag.postag))
-
-        q2_postag = json.loads(row['question2_postag'])
-        for sentence in q2_postag:
-            for kv in sentence:
-                POSTag.postag.setdefault(kv[1], len(POSTag.postag))
-
+    def postag_fp(cf, rawset_name):
+        return '%s/%s_postag.npz' % (cf.get('DEFAULT', 'devel_pt'), rawset_name)
 
     @staticmethod
-    def extract_row_postag_cnt(row):
-        q1_vec = len(POSTag.postag) * [0]
-        q1_postag = json.loads(row['question1_postag'])
-        for s in q1_postag:
-            for kv in s:
-                id = POSTag.postag[kv[1]]
-                q1_vec[id] += 1
-
-        q2_vec = len(POSTag.postag) * [0]
-        q2_postag = json.loads(row['question2_postag'])
-        for s in q2_postag:
-            for kv in s:
-                id = POSTag.postag[kv[1]]
-                q2_vec[id] += 1
-
-        q1_vec = np.array(q1_vec)
-        q2_vec = np.array(q2_vec)
-
-        sum_vec = q1_vec + q2_vec
-        sub_vec = abs(q1_vec - q2_vec)
-        dot_vec = q1_vec.dot(q2_vec)
-        q1_len = np.sqrt(q1_vec.dot(q1_vec))
-        q2_len = np.sqrt(q2_vec.dot(q2_vec))
-        cos_sim = 0.
-        if q1_len * q2_len > 1e-6:
-            cos_sim = dot_vec / q1_len / q2_len
-
-        return list(q1_vec) + list(q2_vec) + list(sum_vec) + list(sub_vec) + [dot_vec, q1_len, q2_len, cos_sim]
+    def convert_postag(cf, argv):
+        """
+        将 POS-tag JSON 一次性转换为 uint8 的 tag ID 数组与每个问题的偏移量
+        tag ID 按 train、test 中首次出现的顺序分配
+        :param cf:
+        :param argv:
+        :return:
+        """
+        POSTag.postag = {}
+        for rawset_name in ['train', 'test']:
+            data = pd.read_csv('%s/%s_postag.csv' % (cf.get('DEFAULT', 'devel_pt'), rawset_name)).fillna(value="")
+            arrays = {}
+            for col in ['question1', 'question2']:
+                tags = []
+                indptr = [0]
+                for postag in data['%s_postag' % col].tolist():
+                    for sentence in json.loads(postag):
+                        for kv in sentence:
+                            tags.append(POSTag.postag.setdefault(kv[1], len(POSTag.postag)))
+                    indptr.append(len(tags))
+                assert len(POSTag.postag) <= 256, 'too many postags for uint8'
+                arrays['%s_tags' % col] = np.array(tags, dtype=np.uint8)
+                arrays['%s_indptr' % col] = np.array(indptr, dtype=np.int64)
+            tag_names = sorted(POSTag.postag, key=POSTag.postag.get)
+            np.savez(POSTag.postag_fp(cf, rawset_name), tag_names=np.array(tag_names), **arrays)
+            LogUtil.log('INFO', 'convert %s postag done, len(postag)=%d' % (rawset_name, len(POSTag.postag)))
+
+    @staticmethod
+    def load_postag_cnt(cf, rawset_name, n_tags):
+        """
+        加载 tag ID 数组并统计每个问题的 tag 数
+        :return: Q1, Q2 的 (n, n_tags) 计数矩阵
+        """
+        arrays = np.load(POSTag.postag_fp(cf, rawset_name))
+        vecs = []
+        for col in ['question1', 'question2']:
+            tags = arrays['%s_tags' % col].astype(np.int64)
+            indptr = arrays['%s_indptr' % col]
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            vecs.append(np.bincount(rows * n_tags + tags, minlength=(len(indptr) - 1) * n_tags).reshape(-1, n_tags))
+        return vecs
 
     @staticmethod
     def extract_postag_cnt(cf, argv):
         # 设置参数
         feature_name = 'postag_cnt'
 
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train_postag.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test_postag.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
-
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
-        # 初始化
-        POSTag.postag = {}
-        train_data.apply(POSTag.init_row_postag, axis=1, raw=True)
-        test_data.apply(POSTag.init_row_postag, axis=1, raw=True)
+        # 初始化：test 的 tag 表包含 train 的 tag 表
+        if not (isfile(POSTag.postag_fp(cf, 'train')) and isfile(POSTag.postag_fp(cf, 'test'))):
+            POSTag.convert_postag(cf, [])
+        tag_names = np.load(POSTag.postag_fp(cf, 'test'))['tag_names'].tolist()
+        POSTag.postag = dict((tag, index) for index, tag in enumerate(tag_names))
         LogUtil.log('INFO', 'len(postag)=%d, postag=%s' % (len(POSTag.postag), str(POSTag.postag)))
 
-        # 抽取特征：train.csv
-        train_features = train_data.apply(POSTag.extract_row_postag_cnt, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        test_features = test_data.apply(POSTag.extract_row_postag_cnt, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        for rawset_name in ['train', 'test']:
+            q1_vec, q2_vec = POSTag.load_postag_cnt(cf, rawset_name, len(POSTag.postag))
+            sum_vec = q1_vec + q2_vec
+            sub_vec = abs(q1_vec - q2_vec)
+            dot_vec = (q1_vec * q2_vec).sum(axis=1)
+            q1_len = np.sqrt((q1_vec * q1_vec).sum(axis=1))
+            q2_len = np.sqrt((q2_vec * q2_vec).sum(axis=1))
+            factor = q1_len * q2_len
+            cos_sim = np.where(factor > 1e-6, dot_vec / np.maximum(factor, 1e-6), 0.)
 
+            features = np.hstack([q1_vec, q2_vec, sum_vec, sub_vec,
+                                  np.column_stack([dot_vec, q1_len, q2_len, cos_sim])])
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
     def run(argv):
-        # 运行抽取器
-        POSTag.extract_postag_cnt(cf, argv)
+        if 0 < len(argv) and 'convert_postag' == argv[0]:
+            POSTag.convert_postag(cf, argv[1:])
+        else:
+            # 运行抽取器
+            POSTag.extract_postag_cnt(cf, argv)
 
 
 class DulNum(object):
 
-    dul_num = {}
-
     def __init__(self):
         pass
 
     @staticmethod
-    def init_dul_num(train_data, test_data):
-        for index, row in train_data.iterrows():
-            q1 = str(row.question1).strip()
-            q2 = str(row.question2).strip()
-            DulNum.dul_num[q1] = DulNum.dul_num.get(q1, 0) + 1
-            if q1 != q2:
-                DulNum.dul_num[q2] = DulNum.dul_num.get(q2, 0) + 1
-
-        for index, row in test_data.iterrows():
-            q1 = str(row.question1).strip()
-            q2 = str(row.question2).strip()
-            DulNum.dul_num[q1] = DulNum.dul_num.get(q1, 0) + 1
-            if q1 != q2:
-                DulNum.dul_num[q2] = DulNum.dul_num.get(q2, 0) + 1
+    def count_dul_num(table):
+        """
+        统计每个问题出现的次数（Q1 与 Q2 相同时只计一次）
+        :param table: 问题表
+        :return: 问题 ID -> 出现次数
+        """
+        dul_num = np.zeros(len(table), dtype=np.int64)
+        for rawset_name in ['train', 'test']:
+            pairs = table.pairs(rawset_name)
+            dul_num += np.bincount(pairs[:, 0], minlength=len(table))
+            dul_num += np.bincount(pairs[:, 1][pairs[:, 0] != pairs[:, 1]], minlength=len(table))
+        return dul_num
 
     @staticmethod
-    def extract_row_dul_num(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        dn1 = DulNum.dul_num[q1]
-        dn2 = DulNum.dul_num[q2]
+    def pair_dul_num(dul_num, pairs):
+        """
+        由问题出现次数计算 <Q1,Q2> 的 dul_num 特征
+        :param dul_num: 问题 ID -> 出现次数
+        :param pairs: (n_rows, 2) <qid1, qid2>
+        :return: (n_rows, 4) 特征矩阵
+        """
+        dn1 = dul_num[pairs[:, 0]]
+        dn2 = dul_num[pairs[:, 1]]
+        return np.column_stack([dn1, dn2, np.maximum(dn1, dn2), np.minimum(dn1, dn2)])
 
-        return [dn1, dn2, max(dn1, dn2), min(dn1, dn2)]
+    @staticmethod
+    def pair_dul_num_ratio(dul_num, pairs):
+        """
+        由问题出现次数计算 <Q1,Q2> 的 dul_num_ratio 特征
+        :param dul_num: 问题 ID -> 出现次数
+        :param pairs: (n_rows, 2) <qid1, qid2>
+        :return: (n_rows, 1) 特征矩阵
+        """
+        dn1 = dul_num[pairs[:, 0]]
+        dn2 = dul_num[pairs[:, 1]]
+        return (1.0 * dn1 / np.maximum(dn2, 1)).reshape(-1, 1)
 
     @staticmethod
     def extract_dul_num(cf, argv):
         # 设置参数
         feature_name = 'dul_num'
 
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train_postag.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test_postag.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
+        # 初始化
+        table = ID.load_question_table(cf)
+        dul_num = DulNum.count_dul_num(table)
+        LogUtil.log('INFO', 'len(dul_num)=%d' % len(dul_num))
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 初始化
-        DulNum.init_dul_num(train_data, test_data)
-        LogUtil.log('INFO', 'len(dul_num)=%d' % (len(DulNum.dul_num)))
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(DulNum.extract_row_dul_num, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        test_features = test_data.apply(DulNum.extract_row_dul_num, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
-
-
-    @staticmethod
-    def extract_row_dul_num_ratio(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        dn1 = DulNum.dul_num[q1]
-        dn2 = DulNum.dul_num[q2]
-
-        ratio = (1.0 * dn1 / dn2) if dn2 > 1e-12 else 0.0
 
-        return [ratio]
+        for rawset_name in ['train', 'test']:
+            features = DulNum.pair_dul_num(dul_num, table.pairs(rawset_name))
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
     def extract_dul_num_ratio(cf, argv):
         # 设置参数
         feature_name = 'dul_num_ratio'
 
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test_with_qid.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
+        # 初始化
+        table = ID.load_question_table(cf)
+        dul_num = DulNum.count_dul_num(table)
+        LogUtil.log('INFO', 'len(dul_num)=%d' % len(dul_num))
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 初始化
-        DulNum.init_dul_num(train_data, test_data)
-        LogUtil.log('INFO', 'len(dul_num)=%d' % (len(DulNum.dul_num)))
 
-        # 抽取特征：train.csv
-        train_features = train_data.apply(DulNum.extract_row_dul_num_ratio, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        test_features = test_data.apply(DulNum.extract_row_dul_num_ratio, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        for rawset_name in ['train', 'test']:
+            features = DulNum.pair_dul_num_ratio(dul_num, table.pairs(rawset_name))
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
     def run(argv):
@@ -2260,6 +2346,16 @@ class PowerfulWordV2(object):
     aside_word_power = []
     word_power_dict = []
 
+    @staticmethod
+    def stem_words(question):
+        """
+        对question清洗、分词并提取词干
+        :param question: 问题文本
+        :return: 词干列表
+        """
+        return [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in
+                nltk.word_tokenize(Preprocessor.clean_text(str(question).decode('utf-8')))]
+
     @staticmethod
     def cal_word_power(train_data):
         """
@@ -2268,55 +2364,7 @@ class PowerfulWordV2(object):
         :param data: 训练数据
         :return: 影响力词典
         """
-        words_power = {}
-        for index, row in train_data.iterrows():
-            label = int(row['is_duplicate'])
-            q1_words = [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in nltk.word_tokenize(Preprocessor.clean_text(str(row['question1']).decode('utf-8')))]
-            q2_words = [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))]
-            all_words = set(q1_words + q2_words)
-            q1_words = set(q1_words)
-            q2_words = set(q2_words)
-            for word in all_words:
-                if word not in words_power:
-                    words_power[word] = [0. for i in range(7)]
-                # 计算出现语句对数量
-                words_power[word][0] += 1.
-                words_power[word][1] += 1.
-
-                if ((word in q1_words) and (word not in q2_words)) or ((word not in q1_words) and (word in q2_words)):
-                    # 计算单侧语句数量
-                    words_power[word][3] += 1.
-                    if 0 == label:
-                        # 计算正确语句对数量
-                        words_power[word][2] += 1.
-                        # 计算单侧语句正确比例
-                        words_power[word][4] += 1.
-                if (word in q1_words) and (word in q2_words):
-                    # 计算双侧语句数量
-                    words_power[word][5] += 1.
-                    if 1 == label:
-                        # 计算正确语句对数量
-                        words_power[word][2] += 1.
-                        # 计算双侧语句正确比例
-                        words_power[word][6] += 1.
-        for word in words_power:
-            # 计算出现语句对比例
-            words_power[word][1] /= len(train_data)
-            # 计算正确语句对比例
-            words_power[word][2] /= words_power[word][0]
-            # 计算单侧语句对正确比例
-            if words_power[word][3] > 1e-6:
-                words_power[word][4] /= words_power[word][3]
-            # 计算单侧语句对比例
-            words_power[word][3] /= words_power[word][0]
-            # 计算双侧语句对正确比例
-            if words_power[word][5] > 1e-6:
-                words_power[word][6] /= words_power[word][5]
-            # 计算双侧语句对比例
-            words_power[word][5] /= words_power[word][0]
-        sorted_words_power = sorted(words_power.iteritems(), key=lambda d: d[1][0], reverse=True)
-        LogUtil.log("INFO", "power words calculation done, len(words_power)=%d" % len(sorted_words_power))
-        return sorted_words_power
+        return PowerfulWord.cal_subsets_word_power(train_data, [range(len(train_data))], PowerfulWordV2.stem_words)[0]
 
     @staticmethod
     def init_dside_word_power(words_power):
@@ -2404,45 +2452,46 @@ class PowerfulWordV2(object):
         PowerfulWordV2.save_word_power(words_power, words_power_fp)
 
     @staticmethod
-    def extract_row_dside_word_power(row):
+    def generate_cv_powerful_word(cf, argv):
         """
-        针对一个Pair抽取特征：是否包含双边影响力词表
-        :param row: 一个Pair实例
-        :return: Tags
+        生成并存储交叉验证各折训练集上的影响力词表
+        :param cf: 配置
+        :param argv: [tag, cv_num]
+        :return: NONE
         """
-        tags = []
-        q1_words = [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question1']).decode('utf-8')))]
-        q2_words = [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))]
-        for word in PowerfulWordV2.dside_word_power:
-            if (word in q1_words) and (word in q2_words):
-                tags.append(1.0)
-            else:
-                tags.append(0.0)
-        return tags
+        tag = argv[0]
+        cv_num = int(argv[1])
+
+        # 加载train.csv文件
+        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+        # 加载各折训练集索引
+        cv_indexs = PowerfulWord.load_cv_indexs(cf, tag, cv_num)
+
+        # 计算并存储各折影响力词表
+        cv_words_power = PowerfulWord.cal_subsets_word_power(train_data, cv_indexs, PowerfulWordV2.stem_words)
+        for fold_id in range(cv_num):
+            words_power_fp = '%s/words_power_v2.cv_tag%s_n%d_f%d_train.train_with_swap.txt' % (
+                cf.get('DEFAULT', 'feature_stat_pt'), tag, cv_num, fold_id)
+            PowerfulWordV2.save_word_power(cv_words_power[fold_id], words_power_fp)
+            LogUtil.log('INFO', 'save word power done (%s)' % words_power_fp)
 
     @staticmethod
-    def extract_row_oside_word_power(row):
+    def extract_dside_word_power(data):
         """
-        针对一个Pair抽取特征：是否包含单边影响力词表
-        :param row: 一个Pair实例
-        :return: Tags
+        抽取特征：是否包含双边影响力词表
+        :param data: DataFrame数据
+        :return: Tags，CSR矩阵
         """
-        tags = []
-        q1_words = [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question1']).decode('utf-8')))]
-        q2_words = [PowerfulWordV2.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))]
+        return PowerfulWord.tag_dside_word_power(data, PowerfulWordV2.dside_word_power, PowerfulWordV2.stem_words)
 
-        for word in PowerfulWordV2.oside_word_power:
-            if (word in q1_words) and (word not in q2_words):
-                tags.append(1.0)
-            elif (word not in q1_words) and (word in q2_words):
-                tags.append(1.0)
-            else:
-                tags.append(0.0)
-        return tags
+    @staticmethod
+    def extract_oside_word_power(data):
+        """
+        抽取特征：是否包含单边影响力词表
+        :param data: DataFrame数据
+        :return: Tags，CSR矩阵
+        """
+        return PowerfulWord.tag_oside_word_power(data, PowerfulWordV2.oside_word_power, PowerfulWordV2.stem_words)
 
     @staticmethod
     def extract_dside_word_power_v2(cf, argv):
@@ -2466,14 +2515,14 @@ class PowerfulWordV2(object):
 
 
         # 抽取特征：train.csv
-        train_features = train_data.apply(PowerfulWordV2.extract_row_dside_word_power, axis=1, raw=True)
+        train_features = PowerfulWordV2.extract_dside_word_power(train_data)
         LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        test_features = test_data.apply(PowerfulWordV2.extract_row_dside_word_power, axis=1, raw=True)
+        test_features = PowerfulWordV2.extract_dside_word_power(test_data)
         LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
         # 抽取特征: test.csv
-        Feature.save_dataframe(train_features, train_feature_fp)
+        Feature.save_smat(train_features, train_feature_fp)
         LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
+        Feature.save_smat(test_features, test_feature_fp)
         LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
 
     @staticmethod
@@ -2497,14 +2546,14 @@ class PowerfulWordV2(object):
         PowerfulWordV2.init_oside_word_power(words_power)
 
         # 抽取特征：train.csv
-        train_features = train_data.apply(PowerfulWordV2.extract_row_oside_word_power, axis=1, raw=True)
+        train_features = PowerfulWordV2.extract_oside_word_power(train_data)
         LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
+        Feature.save_smat(train_features, train_feature_fp)
         LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
 
-        test_features = test_data.apply(PowerfulWordV2.extract_row_oside_word_power, axis=1, raw=True)
+        test_features = PowerfulWordV2.extract_oside_word_power(test_data)
         LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
+        Feature.save_smat(test_features, test_feature_fp)
         LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
 
     @staticmethod
@@ -2513,6 +2562,8 @@ class PowerfulWordV2(object):
 
         if 'generate_powerful_word' == cmd:
             PowerfulWordV2.generate_powerful_word(cf, argv[1:])
+        elif 'generate_cv_powerful_word' == cmd:
+            PowerfulWordV2.generate_cv_powerful_word(cf, argv[1:])
         elif 'extract_dside_word_power_v2' == cmd:
             PowerfulWordV2.extract_dside_word_power_v2(cf, argv[1:])
         elif 'extract_oside_word_power_v2' == cmd:
@@ -2520,332 +2571,142 @@ class PowerfulWordV2(object):
 
 
 class Graph(object):
-    G = None
-    q2id = None
-    p2weight = None
-    pr = None
-    hits_h = None
-    hits_a = None
-    counter = 0
+
+    # 归一化方式 -> 问题图
+    graphs = {}
+    # (权重特征名, 特征第几维, 是否取反) -> 每条边的权重
+    edge_weights = {}
 
     def __init__(self):
         pass
 
     @staticmethod
-    def init_graph(cf, argv):
-        Graph.q2id = {}
-
-        fin = csv.reader(open('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')))
-        fin.next()
-        fout = open('%s/graph_question2id.train.txt' % cf.get('DEFAULT', 'devel_pt'), 'w')
-        for p in fin:
-            q1 = str(p[3]).strip()
-            q2 = str(p[4]).strip()
-            label = p[5]
-            if q1 not in Graph.q2id:
-                Graph.q2id[q1] = len(Graph.q2id)
-            if q2 not in Graph.q2id:
-                Graph.q2id[q2] = len(Graph.q2id)
-            print >> fout, Graph.q2id[q1], Graph.q2id[q2], label
-        LogUtil.log('INFO', 'len(questions)=%d' % len(Graph.q2id))
-        fout.close()
+    def load_graph(cf, norm='strip'):
+        """
+        加载问题图（不存在时由问题表构建），边权重为 label + 1（train）或 0（test）
+        :param cf:
+        :param norm: 问题归一化方式，strip 或 nostrip
+        :return: graph_utils.QuestionGraph
+        """
+        if norm not in Graph.graphs:
+            prefix = '%s/question_graph' % cf.get('DEFAULT', 'devel_pt')
+            if not isfile(question_table._fp(prefix, norm, 'indptr')):
+                table = ID.load_question_table(cf, norm)
+                fin = csv.reader(open('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')))
+                fin.next()
+                train_weights = np.array([int(p[5]) + 1 for p in fin], dtype=np.float32)
+                test_weights = np.zeros(len(table.pairs('test')), dtype=np.float32)
+                n_edges = graph_utils._build([('train', table.pairs('train')), ('test', table.pairs('test'))],
+                                             [train_weights, test_weights], len(table), prefix, norm)
+                LogUtil.log('INFO', 'build question graph (%s) done, n_edges=%d' % (norm, n_edges))
+            Graph.graphs[norm] = graph_utils.QuestionGraph(prefix, norm)
+        return Graph.graphs[norm]
+
+    @staticmethod
+    def extract_pair_features(cf, feature_name, extract, norm='strip'):
+        """
+        对 train、test 中的全部 <Q1,Q2> 抽取特征并存储
+        :param extract: 由 (n_pairs, 2) <qid1, qid2> 计算特征矩阵的函数
+        """
+        table = ID.load_question_table(cf, norm)
 
-        fin = csv.reader(open('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')))
-        fin.next()
-        fout = open('%s/graph_question2id.test.txt' % cf.get('DEFAULT', 'devel_pt'), 'w')
-        for p in fin:
-            q1 = str(p[1]).strip()
-            q2 = str(p[2]).strip()
-            if q1 not in Graph.q2id:
-                Graph.q2id[q1] = len(Graph.q2id)
-            if q2 not in Graph.q2id:
-                Graph.q2id[q2] = len(Graph.q2id)
-            print >> fout, Graph.q2id[q1], Graph.q2id[q2]
-        LogUtil.log('INFO', 'len(questions)=%d' % len(Graph.q2id))
-        fout.close()
+        # 特征存储路径
+        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
 
-        Graph.G = nx.Graph()
-        for line in open('%s/graph_question2id.train.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail, label = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail, weight=label + 1)
-        for line in open('%s/graph_question2id.test.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail, weight=0)
-        LogUtil.log('INFO', 'Graph constructed.')
-
-        # ccs = nx.connected_components(G)
-        # Graph.connected_components = []
-        # Graph.p2cc = {}
-        # for cc in ccs:
-        #     for p in cc:
-        #         if p in Graph.p2cc:
-        #             LogUtil.log('WARNING', '%d already in p2cc(=%d)' % (p, Graph.p2cc[p]))
-        #         else:
-        #             Graph.p2cc[p] = len(Graph.connected_components)
-        #     Graph.connected_components.append(cc)
-        #
-        # LogUtil.log('INFO', 'len(Graph.connected_components)=%d' % len(Graph.connected_components))
-        # LogUtil.log('INFO', 'len(Graph.p2cc)=%d' % len(Graph.p2cc))
+        for rawset_name in ['train', 'test']:
+            features = extract(np.asarray(table.pairs(rawset_name)))
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
-    def init_graph_with_weight(cf, weight_featue_name, weight_feature_id,  reverse=False):
-        Graph.q2id = {}
-        Graph.p2weight = {}
-        Graph.G = nx.Graph()
-
-        train_wfs_fs = Feature.load(
-            '%s/%s.train.smat' % (cf.get('DEFAULT', 'feature_question_pair_pt'), weight_featue_name)).toarray()
-        test_wfs_fs = Feature.load(
-            '%s/%s.test.smat' % (cf.get('DEFAULT', 'feature_question_pair_pt'), weight_featue_name)).toarray()
-
-        if 'True' == reverse:
-            LogUtil.log('INFO', 'will reverse')
-            for index in range(len(train_wfs_fs)):
-                train_wfs_fs[index][weight_feature_id] = 1. - train_wfs_fs[index][weight_feature_id]
-            for index in range(len(test_wfs_fs)):
-                test_wfs_fs[index][weight_feature_id] = 1. - test_wfs_fs[index][weight_feature_id]
-
-        fin = csv.reader(open('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')))
-        fin.next()
-        # fout = open('%s/graph_question2id.train.txt' % cf.get('DEFAULT', 'devel_pt'), 'w')
-        index = 0
-        for p in fin:
-            q1 = str(p[3]).strip()
-            q2 = str(p[4]).strip()
-            label = p[5]
-            weight = train_wfs_fs[index][weight_feature_id]
-            if q1 not in Graph.q2id:
-                Graph.q2id[q1] = len(Graph.q2id)
-            if q2 not in Graph.q2id:
-                Graph.q2id[q2] = len(Graph.q2id)
-            # print >> fout, Graph.q2id[q1], Graph.q2id[q2], label, weight
-            Graph.G.add_edge(Graph.q2id[q1], Graph.q2id[q2], weight=weight)
-            Graph.p2weight[(Graph.q2id[q1], Graph.q2id[q2])] = weight
-            Graph.p2weight[(Graph.q2id[q2], Graph.q2id[q1])] = weight
-            index += 1
-        LogUtil.log('INFO', 'len(questions)=%d' % len(Graph.q2id))
-        # fout.close()
-
-        fin = csv.reader(open('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')))
-        fin.next()
-        # fout = open('%s/graph_question2id.test.txt' % cf.get('DEFAULT', 'devel_pt'), 'w')
-        index  = 0
-        for p in fin:
-            q1 = str(p[1]).strip()
-            q2 = str(p[2]).strip()
-            weight = test_wfs_fs[index][weight_feature_id]
-            if q1 not in Graph.q2id:
-                Graph.q2id[q1] = len(Graph.q2id)
-            if q2 not in Graph.q2id:
-                Graph.q2id[q2] = len(Graph.q2id)
-            # print >> fout, Graph.q2id[q1], Graph.q2id[q2], weight
-            Graph.G.add_edge(Graph.q2id[q1], Graph.q2id[q2], weight=weight)
-            Graph.p2weight[(Graph.q2id[q1], Graph.q2id[q2])] = weight
-            Graph.p2weight[(Graph.q2id[q2], Graph.q2id[q1])] = weight
-            index += 1
-        LogUtil.log('INFO', 'len(questions)=%d' % len(Graph.q2id))
-        # fout.close()
-
-        # Graph.G = nx.Graph()
-        # for line in open('%s/graph_question2id.train.txt' % cf.get('DEFAULT', 'devel_pt')):
-        #     head, tail, label, weight = line.strip().split()
-        #     head = int(head)
-        #     tail = int(tail)
-        #     label = int(label)
-        #     weight = Graph.p2weight[(head, tail)]
-        #     Graph.G.add_edge(head, tail, weight=weight)
-        # for line in open('%s/graph_question2id.test.txt' % cf.get('DEFAULT', 'devel_pt')):
-        #     head, tail, weight = line.strip().split()
-        #     head = int(head)
-        #     tail = int(tail)
-        #     weight = Graph.p2weight[(head, tail)]
-        #     Graph.G.add_edge(head, tail, weight=weight)
-        LogUtil.log('INFO', 'Graph constructed.')
-
-    @staticmethod
-    def init_graph_nostrip(cf, argv):
-        Graph.q2id = {}
-
-        fin = csv.reader(open('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')))
-        fin.next()
-        fout = open('%s/graph_question2id_nostrip.train.txt' % cf.get('DEFAULT', 'devel_pt'), 'w')
-        for p in fin:
-            q1 = str(p[3])
-            q2 = str(p[4])
-            label = p[5]
-            if q1 not in Graph.q2id:
-                Graph.q2id[q1] = len(Graph.q2id)
-            if q2 not in Graph.q2id:
-                Graph.q2id[q2] = len(Graph.q2id)
-            print >> fout, Graph.q2id[q1], Graph.q2id[q2], label
-        LogUtil.log('INFO', 'len(questions)=%d' % len(Graph.q2id))
-        fout.close()
-
-        fin = csv.reader(open('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')))
-        fin.next()
-        fout = open('%s/graph_question2id_nostrip.test.txt' % cf.get('DEFAULT', 'devel_pt'), 'w')
-        for p in fin:
-            q1 = str(p[1])
-            q2 = str(p[2])
-            if q1 not in Graph.q2id:
-                Graph.q2id[q1] = len(Graph.q2id)
-            if q2 not in Graph.q2id:
-                Graph.q2id[q2] = len(Graph.q2id)
-            print >> fout, Graph.q2id[q1], Graph.q2id[q2]
-        LogUtil.log('INFO', 'len(questions)=%d' % len(Graph.q2id))
-        fout.close()
-
-        Graph.G = nx.Graph()
-        for line in open('%s/graph_question2id_nostrip.train.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail, label = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail, weight=label + 1)
-        for line in open('%s/graph_question2id_nostrip.test.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail, weight=0)
-        LogUtil.log('INFO', 'Graph constructed.')
-
-    @staticmethod
-    def init_pagerank(cf, alpha, max_iter):
-        Graph.G = nx.Graph()
-        for line in open('%s/graph_question2id.train.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail, label = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail)
-        for line in open('%s/graph_question2id.test.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail)
-        LogUtil.log('INFO', 'Graph for pagerank constructed.')
-
-        Graph.pr = nx.pagerank(Graph.G, alpha=alpha, max_iter=max_iter)
-        LogUtil.log('INFO', 'Graph cal pagerank done')
+    def part_pairs(cf, dataset_name, part_num, part_id):
+        """
+        获取数据集第 part_id 部分的 <qid1, qid2>
+        """
+        pairs = ID.load_question_table(cf).pairs(dataset_name)
+        begin_id = int(1. * len(pairs) / part_num * part_id)
+        end_id = int(1. * len(pairs) / part_num * (part_id + 1))
+        return np.asarray(pairs[begin_id:end_id])
 
     @staticmethod
-    def init_hits_symm(cf, max_iter):
-        Graph.G = nx.Graph()
-        for line in open('%s/graph_question2id.train.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail, label = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail)
-        for line in open('%s/graph_question2id.test.txt' % cf.get('DEFAULT', 'devel_pt')):
-            head, tail = [int(x) for x in line.split()]
-            Graph.G.add_edge(head, tail)
-        LogUtil.log('INFO', 'Graph for hits constructed.')
+    def load_edge_weights(cf, weight_featue_name, weight_feature_id, reverse=False):
+        """
+        以 <Q1,Q2> 特征的某一维作为边权重，取最后一个 <Q1,Q2> 的特征值
+        只加载特征文件的第 weight_feature_id 列，结果按边 ID 存为 float32 并缓存
+        :return: 每条边的权重
+        """
+        key = (weight_featue_name, weight_feature_id, 'True' == reverse)
+        if key not in Graph.edge_weights:
+            graph = Graph.load_graph(cf)
 
-        Graph.hits_h, Graph.hits_a = nx.hits(Graph.G, max_iter=max_iter)
-        LogUtil.log('INFO', 'Graph cal hits done')
+            pair_weights = []
+            for rawset_name in ['train', 'test']:
+                pair_weights.append((rawset_name, Feature.load_column('%s/%s.%s.smat' % (
+                    cf.get('DEFAULT', 'feature_question_pair_pt'), weight_featue_name, rawset_name), weight_feature_id)))
+            weights = graph.edge_values(pair_weights)
 
+            if 'True' == reverse:
+                LogUtil.log('INFO', 'will reverse')
+                weights = 1. - weights
+            Graph.edge_weights[key] = weights
+        return Graph.edge_weights[key]
 
     @staticmethod
-    def extract_row_graph_edge_max_clique_size(row, *args):
-        n2clique = args[0]
-        cliques = args[1]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        edge_max_clique_size = 0
-
-        for clique_id in n2clique[qid1]:
-            if qid2 in cliques[clique_id]:
-                edge_max_clique_size = max(edge_max_clique_size, len(cliques[clique_id]))
-
-        return [edge_max_clique_size]
+    def feature_version(cf, feature_name):
+        """
+        <Q1,Q2> 特征文件的版本，由 train、test 特征文件的大小及修改时间计算，特征重新抽取后随之改变
+        :return: 版本摘要
+        """
+        stats = []
+        for rawset_name in ['train', 'test']:
+            feature_fp = '%s/%s.%s.smat' % (cf.get('DEFAULT', 'feature_question_pair_pt'), feature_name, rawset_name)
+            for fp in [feature_fp, '%s.npz' % feature_fp]:
+                if isfile(fp):
+                    stats.append('%s %d %.6f' % (fp, getsize(fp), getmtime(fp)))
+        return hashlib.md5('\n'.join(stats)).hexdigest()[:16]
 
     @staticmethod
-    def extract_graph_edge_max_clique_size(cf, argv):
-        # 设置参数
-        feature_name = 'graph_edge_max_clique_size'
-
-        Graph.init_graph(cf, argv)
-
-        n2clique = {}
-        cliques = []
-        for clique in nx.find_cliques(Graph.G):
-            for n in clique:
-                if n not in n2clique:
-                    n2clique[n] = []
-                n2clique[n].append(len(cliques))
-            cliques.append(clique)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(cliques))
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+    def extract_edge_features(cf, feature_name, edge_features, norm='strip'):
+        """
+        按 <Q1,Q2> 对应的边抽取特征并存储
+        :param edge_features: 每条边的特征，(n_edges,) 或 (n_edges, n_features)
+        """
+        graph = Graph.load_graph(cf, norm)
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_edge_max_clique_size, axis=1, raw=True, args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
 
-        test_features = test_data.apply(Graph.extract_row_graph_edge_max_clique_size, axis=1, raw=True, args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        for rawset_name in ['train', 'test']:
+            features = edge_features[graph.pair_edges(rawset_name)].reshape(len(graph.pair_edges(rawset_name)), -1)
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
-    def extract_row_graph_edge_max_clique_size_nostrip(row, *args):
-        n2clique = args[0]
-        cliques = args[1]
-
-        q1 = str(row['question1'])
-        q2 = str(row['question2'])
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        edge_max_clique_size = 0
+    def load_clique_stats(cf, norm='strip'):
+        """
+        加载极大团统计量（团仅在首次使用时枚举并存储）
+        :return: {node_max, node_min, node_num, edge_max, edge_min, edge_num}
+        """
+        graph = Graph.load_graph(cf, norm)
+        stats = graph.clique_stats()
+        LogUtil.log('INFO', 'len(cliques)=%d' % (len(graph.cliques()[0]) - 1))
+        return stats
 
-        for clique_id in n2clique[qid1]:
-            if qid2 in cliques[clique_id]:
-                edge_max_clique_size = max(edge_max_clique_size, len(cliques[clique_id]))
+    @staticmethod
+    def extract_graph_edge_max_clique_size(cf, argv):
+        # 设置参数
+        feature_name = 'graph_edge_max_clique_size'
 
-        return [edge_max_clique_size]
+        Graph.extract_edge_features(cf, feature_name, Graph.load_clique_stats(cf)['edge_max'])
 
     @staticmethod
     def extract_graph_edge_max_clique_size_nostrip(cf, argv):
         # 设置参数
         feature_name = 'graph_edge_max_clique_size_nostrip'
 
-        Graph.init_graph_nostrip(cf, argv)
-
-        n2clique = {}
-        cliques = []
-        for clique in nx.find_cliques(Graph.G):
-            for n in clique:
-                if n not in n2clique:
-                    n2clique[n] = []
-                n2clique[n].append(len(cliques))
-            cliques.append(clique)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(cliques))
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-
-        # 特征存储路径
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_edge_max_clique_size_nostrip, axis=1, raw=True,
-                                          args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_edge_max_clique_size_nostrip, axis=1, raw=True,
-                                        args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        Graph.extract_edge_features(cf, feature_name, Graph.load_clique_stats(cf, 'nostrip')['edge_max'], 'nostrip')
 
     @staticmethod
     def show_graph_edge_max_clique_size(cf, argv):
@@ -2877,82 +2738,12 @@ class Graph(object):
         plt.xlabel(feature_name, fontsize=15)
         plt.show()
 
-    @staticmethod
-    def extract_row_graph_edge_min_clique_size(row, *args):
-        n2clique = args[0]
-        cliques = args[1]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        edge_min_clique_size = 5000000
-
-        for clique_id in n2clique[qid1]:
-            if qid2 in cliques[clique_id]:
-                edge_min_clique_size = min(edge_min_clique_size, len(cliques[clique_id]))
-
-        return [edge_min_clique_size]
-
     @staticmethod
     def extract_graph_edge_min_clique_size(cf, argv):
         # 设置参数
         feature_name = 'graph_edge_min_clique_size'
 
-        Graph.init_graph(cf, argv)
-
-        n2clique = {}
-        cliques = []
-        for clique in nx.find_cliques(Graph.G):
-            for n in clique:
-                if n not in n2clique:
-                    n2clique[n] = []
-                n2clique[n].append(len(cliques))
-            cliques.append(clique)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(cliques))
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-
-        # 特征存储路径
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_edge_min_clique_size, axis=1, raw=True,
-                                          args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_edge_min_clique_size, axis=1, raw=True,
-                                        args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
-
-    @staticmethod
-    def extract_row_graph_num_clique(row, *args):
-        n2clique = args[0]
-        cliques = args[1]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        num_clique = 0
-
-        for clique_id in n2clique[qid1]:
-            if qid2 in cliques[clique_id]:
-                num_clique += 1
-
-        return [num_clique]
+        Graph.extract_edge_features(cf, feature_name, Graph.load_clique_stats(cf)['edge_min'])
 
     @staticmethod
     def extract_graph_num_clique(cf, argv):
@@ -2965,168 +2756,130 @@ class Graph(object):
         # 设置参数
         feature_name = 'graph_num_clique'
 
-        Graph.init_graph(cf, argv)
-
-        n2clique = {}  # 节点到团的映射
-        cliques = []  # 所有团
-        for clique in nx.find_cliques(Graph.G):
-            for n in clique:
-                if n not in n2clique:
-                    n2clique[n] = []
-                n2clique[n].append(len(cliques))
-            cliques.append(clique)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(cliques))
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-
-        # 特征存储路径
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_num_clique, axis=1, raw=True,
-                                          args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_num_clique, axis=1, raw=True,
-                                        args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        Graph.extract_edge_features(cf, feature_name, Graph.load_clique_stats(cf)['edge_num'])
 
     @staticmethod
-    def extract_row_graph_edge_cc_size(row, *args):
-        n2cc = args[0]
-        ccs = args[1]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
+    def extract_graph_node_max_clique_size(cf, argv):
+        # 设置参数
+        feature_name = 'graph_node_max_clique_size'
 
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
+        node_max = Graph.load_clique_stats(cf)['node_max']
 
-        edge_cc_size = len(ccs[n2cc[qid1]])
+        Graph.extract_pair_features(cf, feature_name, lambda pairs: Graph.pair_node_features(node_max, pairs))
 
-        return [edge_cc_size]
+    @staticmethod
+    def pair_structure_features(graph, pairs):
+        """
+        计算 <Q1,Q2> 所在连通分量的大小、两个节点的邻居数以及公共邻居数
+        :param graph: graph_utils.QuestionGraph
+        :param pairs: (n_pairs, 2) <qid1, qid2>
+        :return: 特征名 -> 特征矩阵
+        """
+        labels, sizes = graph.components()
+        degree = graph.degree()
+        d1 = degree[pairs[:, 0]]
+        d2 = degree[pairs[:, 1]]
+        return {
+            'graph_edge_cc_size': sizes[labels[pairs[:, 0]]].reshape(-1, 1),
+            'graph_node_degree': np.column_stack([d1, d2, np.maximum(d1, d2), np.minimum(d1, d2)]),
+            'node_neighbors_share_num': graph.common_neighbors(pairs[:, 0], pairs[:, 1]).reshape(-1, 1),
+        }
+
+    @staticmethod
+    def pair_local_features(graph, pairs, pair_edges):
+        """
+        计算 <Q1,Q2> 的局部图特征：连通分量大小、度、公共邻居数及极大团统计
+        :param graph: graph_utils.QuestionGraph
+        :param pairs: (n_pairs, 2) <qid1, qid2>
+        :param pair_edges: <Q1,Q2> 对应的边 ID
+        :return: 特征名 -> 特征矩阵
+        """
+        clique_stats = graph.clique_stats()
+        features = Graph.pair_structure_features(graph, pairs)
+        features['graph_edge_max_clique_size'] = clique_stats['edge_max'][pair_edges].reshape(-1, 1)
+        features['graph_edge_min_clique_size'] = clique_stats['edge_min'][pair_edges].reshape(-1, 1)
+        features['graph_num_clique'] = clique_stats['edge_num'][pair_edges].reshape(-1, 1)
+        features['graph_node_max_clique_size'] = Graph.pair_node_features(clique_stats['node_max'], pairs)
+        features['graph_mc_cc_rate'] = \
+            1. * features['graph_edge_max_clique_size'] / features['graph_edge_cc_size']
+        return features
 
     @staticmethod
     def extract_graph_edge_cc_size(cf, argv):
         # 设置参数
         feature_name = 'graph_edge_cc_size'
 
-        Graph.init_graph(cf, argv)
-
-        n2cc = {}
-        ccs = []
-        for cc in nx.connected_components(Graph.G):
-            for n in cc:
-                if n in n2cc:
-                    LogUtil.log('WARNING', '%d already in n2cc(=%d)' % (n, n2cc[n]))
-                n2cc[n] = len(ccs)
-            ccs.append(cc)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(ccs))
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+        graph = Graph.load_graph(cf)
+        labels, sizes = graph.components()
+        LogUtil.log('INFO', 'len(ccs)=%d' % np.count_nonzero(sizes))
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_edge_cc_size, axis=1, raw=True,
-                                          args=[n2cc, ccs])
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_edge_cc_size, axis=1, raw=True,
-                                        args=[n2cc, ccs])
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
-
-    @staticmethod
-    def extract_row_graph_node_max_clique_size(row, *args):
-        n2clique = args[0]
-        cliques = args[1]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        lnode_max_clique_size = 0
-        rnode_max_clique_size = 0
-
-        for clique_id in n2clique[qid1]:
-            lnode_max_clique_size = max(lnode_max_clique_size, len(cliques[clique_id]))
-
-        for clique_id in n2clique[qid2]:
-            rnode_max_clique_size = max(rnode_max_clique_size, len(cliques[clique_id]))
-
-        return [lnode_max_clique_size, rnode_max_clique_size, max(lnode_max_clique_size, rnode_max_clique_size), min(lnode_max_clique_size, rnode_max_clique_size)]
 
+        for rawset_name in ['train', 'test']:
+            features = sizes[labels[Graph.part_pairs(cf, rawset_name, 1, 0)[:, 0]]].reshape(-1, 1)
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
-    def extract_graph_node_max_clique_size(cf, argv):
-        # 设置参数
-        feature_name = 'graph_node_max_clique_size'
-
-        Graph.init_graph(cf, argv)
-
-        n2clique = {}
-        cliques = []
-        for clique in nx.find_cliques(Graph.G):
-            for n in clique:
-                if n not in n2clique:
-                    n2clique[n] = []
-                n2clique[n].append(len(cliques))
-            cliques.append(clique)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(cliques))
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+    def extract_graph_structure(cf, argv):
+        """
+        一次计算 graph_edge_cc_size、graph_node_degree、node_neighbors_share_num 三组特征
+        :param cf:
+        :param argv:
+        :return:
+        """
+        graph = Graph.load_graph(cf)
 
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_node_max_clique_size, axis=1, raw=True,
-                                          args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_node_max_clique_size, axis=1, raw=True,
-                                        args=[n2clique, cliques])
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        for rawset_name in ['train', 'test']:
+            features = Graph.pair_structure_features(graph, Graph.part_pairs(cf, rawset_name, 1, 0))
+            for feature_name in sorted(features):
+                LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+                Feature.save_dataframe(features[feature_name],
+                                       '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+                LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
     @staticmethod
-    def extract_row_graph_pagerank_symm(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
+    def pair_node_features(node_scores, pairs):
+        """
+        由节点得分计算 <Q1,Q2> 的特征 [s1, s2, max, min]
+        """
+        s1 = node_scores[pairs[:, 0]]
+        s2 = node_scores[pairs[:, 1]]
+        return np.column_stack([s1, s2, np.maximum(s1, s2), np.minimum(s1, s2)])
 
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
+    @staticmethod
+    def pair_pagerank_features(pr, pairs):
+        pr1 = pr[pairs[:, 0]] * 1e6
+        pr2 = pr[pairs[:, 1]] * 1e6
 
-        pr1 = Graph.pr[qid1] * 1e6
-        pr2 = Graph.pr[qid2] * 1e6
+        return np.column_stack([pr1, pr2, np.maximum(pr1, pr2), np.minimum(pr1, pr2), (pr1 + pr2) / 2.])
 
-        return [pr1, pr2, max(pr1, pr2), min(pr1, pr2), (pr1 + pr2) / 2.]
+    @staticmethod
+    def load_pagerank(cf, alpha, max_iter, weight_feature_name=None, weight_feature_id=None):
+        """
+        加载节点的 PageRank（首次使用时计算并存储）
+        :param weight_feature_name: 边权重特征名，None 表示不带权重
+        :return: 每个节点的 PageRank
+        """
+        graph = Graph.load_graph(cf)
+        if weight_feature_name is None:
+            pr = graph.node_scores('pagerank_%.2f_%d' % (alpha, max_iter), lambda: graph.pagerank(alpha, max_iter))
+        else:
+            # 带权 PageRank 随权重特征文件的版本保存，权重特征重新抽取后删除旧版本并重新计算
+            name = 'pagerank_%s_%d_%.2f_%d' % (weight_feature_name, weight_feature_id, alpha, max_iter)
+            version_name = '%s_%s' % (name, Graph.feature_version(cf, weight_feature_name))
+            graph.remove_scores('%s_*' % name, keep=version_name)
+            pr = graph.node_scores(
+                version_name,
+                lambda: graph.pagerank(alpha, max_iter,
+                                       edge_weights=Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id)))
+        LogUtil.log('INFO', 'Graph cal pagerank done')
+        return pr
 
     @staticmethod
     def extract_graph_pagerank_symm(cf, argv):
@@ -3135,29 +2888,9 @@ class Graph(object):
         max_iter = int(argv[1])
         feature_name = 'graph_pagerank_symm_%.2f_%d' % (alpha, max_iter)
 
-        Graph.init_graph(cf, argv)
-
-        Graph.init_pagerank(cf, alpha, max_iter)
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-
-        # 特征存储路径
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_pagerank_symm, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
+        pr = Graph.load_pagerank(cf, alpha, max_iter)
 
-        test_features = test_data.apply(Graph.extract_row_graph_pagerank_symm, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        Graph.extract_pair_features(cf, feature_name, lambda pairs: Graph.pair_pagerank_features(pr, pairs))
 
     @staticmethod
     def extract_graph_pagerank_symm_with_weight(cf, argv):
@@ -3168,49 +2901,33 @@ class Graph(object):
         weight_feature_id = int(argv[3])
         feature_name = 'graph_pagerank_symm_%s_%d_%.2f_%d' % (weight_feature_name, weight_feature_id, alpha, max_iter)
 
-        Graph.init_graph_with_weight(cf, weight_feature_name, weight_feature_id)
+        pr = Graph.load_pagerank(cf, alpha, max_iter, weight_feature_name, weight_feature_id)
 
-        Graph.pr = nx.pagerank(Graph.G, alpha=alpha, max_iter=max_iter)
-        LogUtil.log('INFO', 'Graph cal pagerank done')
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-
-        # 特征存储路径
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_pagerank_symm, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_pagerank_symm, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        Graph.extract_pair_features(cf, feature_name, lambda pairs: Graph.pair_pagerank_features(pr, pairs))
 
     @staticmethod
-    def extract_row_graph_hits_symm(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
+    def load_hits(cf, max_iter):
+        """
+        加载节点的 HITS 得分（首次使用时计算并存储）
+        :return: (n_nodes, 2) [hub, authority]
+        """
+        graph = Graph.load_graph(cf)
+        hits = graph.node_scores('hits_%d' % max_iter, lambda: np.column_stack(graph.hits(max_iter)))
+        LogUtil.log('INFO', 'Graph cal hits done')
+        return hits
 
-        h1 = Graph.hits_h[qid1] * 1e6
-        h2 = Graph.hits_h[qid2] * 1e6
+    @staticmethod
+    def pair_hits_features(hits, pairs):
+        h1 = hits[pairs[:, 0], 0] * 1e6
+        h2 = hits[pairs[:, 1], 0] * 1e6
 
-        a1 = Graph.hits_a[qid1] * 1e6
-        a2 = Graph.hits_a[qid2] * 1e6
+        a1 = hits[pairs[:, 0], 1] * 1e6
+        a2 = hits[pairs[:, 1], 1] * 1e6
 
-        return [h1, h2, a1, a2,
-                max(h1, h2), max(a1, a2),
-                min(h1, h2), min(a1, a2),
-                (h1 + h2) / 2., (a1 + a2) / 2.]
+        return np.column_stack([h1, h2, a1, a2,
+                                np.maximum(h1, h2), np.maximum(a1, a2),
+                                np.minimum(h1, h2), np.minimum(a1, a2),
+                                (h1 + h2) / 2., (a1 + a2) / 2.])
 
     @staticmethod
     def extract_graph_hits_symm(cf, argv):
@@ -3218,29 +2935,9 @@ class Graph(object):
         max_iter = int(argv[0])
         feature_name = 'graph_hits_symm_%d' % max_iter
 
-        Graph.init_graph(cf, argv)
-
-        Graph.init_hits_symm(cf, max_iter)
+        hits = Graph.load_hits(cf, max_iter)
 
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-
-        # 特征存储路径
-        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Graph.extract_row_graph_hits_symm, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
-
-        test_features = test_data.apply(Graph.extract_row_graph_hits_symm, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+        Graph.extract_pair_features(cf, feature_name, lambda pairs: Graph.pair_hits_features(hits, pairs))
 
     @staticmethod
     def extract_graph_mc_cc_rate(cf, argv):
@@ -3278,24 +2975,15 @@ class Graph(object):
         Feature.save_smat(test_features, test_feature_fp)
         LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
 
-    @staticmethod
-    def extract_row_graph_shortest_path(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        shortest_path = -1
-        Graph.G.remove_edge(qid1, qid2)
-        if nx.has_path(Graph.G, qid1, qid2):
-            shortest_path = nx.dijkstra_path_length(Graph.G, qid1, qid2)
-        Graph.G.add_edge(qid1, qid2, weight=Graph.p2weight[(qid1, qid2)])
-
-        return [shortest_path]
-
     @staticmethod
     def extract_graph_shortest_path(cf, argv):
+        """
+        去掉 <Q1,Q2> 自身的边后，两个节点间的最短路径长度（无路径时为 -1）
+        :param cf:
+        :param argv: weight_feature_name, dataset_name, part_num, part_id, reverse, weight_feature_id,
+                     [n_jobs], [max_hops]
+        :return:
+        """
         # 路径权重特征名
         weight_feature_name = argv[0]  # e.g. my_tfidf_word_match_share
         # 抽取特征的数据集名称
@@ -3308,27 +2996,39 @@ class Graph(object):
         reverse = argv[4]
         # 特征第几维
         weight_feature_id = int(argv[5])
+        # 进程数
+        n_jobs = int(argv[6]) if len(argv) > 6 else 1
+        # 路径的最大边数，0 表示不限制
+        max_hops = int(argv[7]) if len(argv) > 7 else 0
         # 设置参数
         feature_name = 'graph_shortest_path_%s_%s' % (weight_feature_name, reverse)
+        if max_hops > 0:
+            feature_name = '%s_%dhop' % (feature_name, max_hops)
 
-        Graph.init_graph_with_weight(cf, weight_feature_name, weight_feature_id, reverse)
-
-        # 加载数据文件
-        data = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), dataset_name)).fillna(value="")
-        begin_id = int(1. * len(data) / part_num * part_id)
-        end_id = int(1. * len(data) / part_num * (part_id + 1))
+        graph = Graph.load_graph(cf)
+        weights = Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id, reverse)
 
         # 存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
+        if 1 == part_num:
+            data_feature_fp = '%s/%s.%s.smat' % (feature_pt, feature_name, dataset_name)
+        else:
+            data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id:end_id].apply(Graph.extract_row_graph_shortest_path, axis=1, raw=True)
+        pairs = Graph.part_pairs(cf, dataset_name, part_num, part_id)
+        features = graph.shortest_paths(pairs[:, 0], pairs[:, 1], weights, n_jobs, max_hops).reshape(-1, 1)
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO', 'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
     @staticmethod
     def merge_graph_shortest_path(cf, argv):
+        """
+        合并 extract_graph_shortest_path 各 part 的特征文件
+        :param cf:
+        :param argv: weight_feature_name, dataset_name, part_num, reverse, [max_hops]
+        :return:
+        """
         # 路径权重特征名
         weight_feature_name = argv[0]  # e.g. my_tfidf_word_match_share
         # 抽取特征的数据集名称
@@ -3337,9 +3037,13 @@ class Graph(object):
         part_num = int(argv[2])
         # reverse
         reverse = argv[3]
+        # 路径的最大边数，0 表示不限制
+        max_hops = int(argv[4]) if len(argv) > 4 else 0
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        # 设置参数
+        # 设置参数，与 extract_graph_shortest_path 一致
         feature_name = 'graph_shortest_path_%s_%s' % (weight_feature_name, reverse)
+        if max_hops > 0:
+            feature_name = '%s_%dhop' % (feature_name, max_hops)
 
         features = None
         for part_id in range(part_num):
@@ -3355,72 +3059,6 @@ class Graph(object):
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d) done' % (feature_name, dataset_name, part_num))
 
-    @staticmethod
-    def extract_row_clique_size_e3_other_edge(row, *args):
-        n2clique = args[0]
-        cliques = args[1]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        edge_max_clique_size = 0
-
-        for clique_id in n2clique[qid1]:
-            if qid2 in cliques[clique_id]:
-                edge_max_clique_size = max(edge_max_clique_size, len(cliques[clique_id]))
-
-        aggregation_mode = ["mean", "std", "max", "min"]
-        aggregation_mode, aggregator = Distance._check_aggregation_mode(aggregation_mode)
-
-        sub = []
-        add = []
-        fs = [0]
-        if edge_max_clique_size == 3:
-            for clique_id in n2clique[qid1]:
-                if (3 == len(cliques[clique_id])) and (qid2 in cliques[clique_id]) and (qid1 != qid2):
-                    _sum = 0
-                    for n in cliques[clique_id]:
-                        _sum += n
-                    qid3 = _sum - qid1 - qid2
-                    # try:
-                    w1 = Graph.p2weight[(qid1, qid3)]
-                    w2 = Graph.p2weight[(qid2, qid3)]
-                    # except:
-                    #     print 'qid1=%d,qid2=%d,qid3=%d' % (qid1, qid2, qid3)
-                    #     for n in cliques[clique_id]:
-                    #         print n
-                    #     raise
-                    sub.append(abs(w1 - w2))
-                    add.append(w1 + w2)
-                    fs[0] += 1.
-        if len(sub) == 0:
-            sub.append(-1)
-        if len(add) == 0:
-            add.append(-1)
-
-        for agg in aggregator:
-            try:
-                s = agg(sub)
-            except:
-                s = config.MISSING_VALUE_NUMERIC
-            fs.append(s)
-        for agg in aggregator:
-            try:
-                s = agg(add)
-            except:
-                s = config.MISSING_VALUE_NUMERIC
-            fs.append(s)
-
-        # 计数器
-        Graph.counter += 1
-        if Graph.counter % 1000 == 0:
-            LogUtil.log('INFO', 'Graph.counter=%d' % Graph.counter)
-
-        return fs
-
     @staticmethod
     def extractor_clique_size_e3_other_edge(cf, argv):
         # 路径权重特征名
@@ -3436,22 +3074,8 @@ class Graph(object):
         # 设置参数
         feature_name = 'graph_clique_size_e3_other_edge_%s' % weight_feature_name
 
-        Graph.init_graph_with_weight(cf, weight_feature_name, weight_feature_id)
-
-        n2clique = {}
-        cliques = []
-        for clique in nx.find_cliques(Graph.G):
-            for n in clique:
-                if n not in n2clique:
-                    n2clique[n] = []
-                n2clique[n].append(len(cliques))
-            cliques.append(clique)
-        LogUtil.log('INFO', 'len(cliques)=%d' % len(cliques))
-
-        # 加载数据文件
-        data = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), dataset_name)).fillna(value="")
-        begin_id = int(1. * len(data) / part_num * part_id)
-        end_id = int(1. * len(data) / part_num * (part_id + 1))
+        graph = Graph.load_graph(cf)
+        edge_features = graph.triangle_weights(Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id))
 
         # 存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
@@ -3461,74 +3085,14 @@ class Graph(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id:end_id].apply(Graph.extract_row_clique_size_e3_other_edge, axis=1, raw=True, args=[n2clique, cliques])
+        pair_edges = graph.pair_edges(dataset_name)
+        begin_id = int(1. * len(pair_edges) / part_num * part_id)
+        end_id = int(1. * len(pair_edges) / part_num * (part_id + 1))
+        features = edge_features[pair_edges[begin_id:end_id]]
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
-    @staticmethod
-    def extractor_row_node_neighbors(row, *args):
-        has_size = args[0]
-
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        l = []
-        r = []
-
-        l_nb = Graph.G.neighbors(qid1)
-        r_nb = Graph.G.neighbors(qid2)
-
-        l_bool = True
-        r_bool = True
-
-        for n in l_nb:
-            if (n != qid2) and (n != qid1):
-                l.append(Graph.p2weight[(qid1, n)])
-        for n in r_nb:
-            if (n != qid2) and (n != qid1):
-                r.append(Graph.p2weight[(qid2, n)])
-        if 0 == len(l):
-            l.append(-1.)
-            l_bool = False
-        if 0 == len(r):
-            r.append(-1.)
-            r_bool = False
-
-        aggregation_mode = ["size", "mean", "std", "max", "min", "median"]
-        aggregation_mode, aggregator = Distance._check_aggregation_mode(aggregation_mode)
-
-        fs = []
-        for agg in aggregator:
-            try:
-                s = agg(l)
-            except:
-                s = config.MISSING_VALUE_NUMERIC
-            fs.append(s)
-        for agg in aggregator:
-            try:
-                s = agg(r)
-            except:
-                s = config.MISSING_VALUE_NUMERIC
-            fs.append(s)
-        if not l_bool:
-            fs[0] = 0.
-        if not r_bool:
-            fs[len(aggregation_mode)] = 0.
-
-        if 'True' != has_size:
-            fs = fs[1:6] + fs[7:12]
-
-        # 计数器
-        Graph.counter += 1
-        if Graph.counter % 1000 == 0:
-            LogUtil.log('INFO', 'Graph.counter=%d' % Graph.counter)
-
-        return fs
-
     @staticmethod
     def extractor_node_neighbors(cf, argv):
         # 路径权重特征名
@@ -3546,12 +3110,8 @@ class Graph(object):
         # 设置参数
         feature_name = 'graph_node_neighbors_%s_%03d' % (weight_feature_name, weight_feature_id)
 
-        Graph.init_graph_with_weight(cf, weight_feature_name, weight_feature_id)
-
-        # 加载数据文件
-        data = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), dataset_name)).fillna(value="")
-        begin_id = int(1. * len(data) / part_num * part_id)
-        end_id = int(1. * len(data) / part_num * (part_id + 1))
+        graph = Graph.load_graph(cf)
+        weights = Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id)
 
         # 存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
@@ -3561,28 +3121,15 @@ class Graph(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id:end_id].apply(Graph.extractor_row_node_neighbors, axis=1, raw=True, args=[has_size])
+        pairs = Graph.part_pairs(cf, dataset_name, part_num, part_id)
+        features = np.hstack([graph.neighbor_weight_stats(pairs[:, 0], pairs[:, 1], weights),
+                              graph.neighbor_weight_stats(pairs[:, 1], pairs[:, 0], weights)])
+        if 'True' != has_size:
+            features = features[:, [1, 2, 3, 4, 5, 7, 8, 9, 10, 11]]
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
-    @staticmethod
-    def extractor_row_node_neighbors_share_num(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        qid1 = Graph.q2id[q1]
-        qid2 = Graph.q2id[q2]
-
-        l_nb = Graph.G.neighbors(qid1)
-        r_nb = Graph.G.neighbors(qid2)
-
-        fs = list()
-
-        fs.append(len(list((set(l_nb).union(set(r_nb))) ^ (set(l_nb) ^ set(r_nb)))))
-
-        return fs
-
     @staticmethod
     def extractor_node_neighbors_share_num(cf, argv):
         # 抽取特征的数据集名称
@@ -3594,12 +3141,7 @@ class Graph(object):
         # 设置参数
         feature_name = 'node_neighbors_share_num'
 
-        Graph.init_graph(cf, argv[3:])
-
-        # 加载数据文件
-        data = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), dataset_name)).fillna(value="")
-        begin_id = int(1. * len(data) / part_num * part_id)
-        end_id = int(1. * len(data) / part_num * (part_id + 1))
+        graph = Graph.load_graph(cf)
 
         # 存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
@@ -3609,11 +3151,72 @@ class Graph(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id:end_id].apply(Graph.extractor_row_node_neighbors_share_num, axis=1, raw=True)
+        pairs = Graph.part_pairs(cf, dataset_name, part_num, part_id)
+        features = graph.common_neighbors(pairs[:, 0], pairs[:, 1]).reshape(-1, 1)
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
+    @staticmethod
+    def extract_graph_bundle(cf, argv):
+        """
+        构建一次问题图，按依赖顺序计算连通分量、极大团、PageRank、HITS、邻居权重统计及最短路径，
+        抽取全部图特征（train 与 test）
+        :param cf:
+        :param argv: weight_feature_name, weight_feature_id, [reverse], [alpha], [pagerank_max_iter],
+                     [hits_max_iter], [n_jobs]
+        :return:
+        """
+        # 设置参数
+        weight_feature_name = argv[0]
+        weight_feature_id = int(argv[1])
+        reverse = argv[2] if len(argv) > 2 else 'False'
+        alpha = float(argv[3]) if len(argv) > 3 else 0.85
+        pagerank_max_iter = int(argv[4]) if len(argv) > 4 else 100
+        hits_max_iter = int(argv[5]) if len(argv) > 5 else 100
+        n_jobs = int(argv[6]) if len(argv) > 6 else 1
+
+        # 共享的中间结果
+        graph = Graph.load_graph(cf)
+        nostrip_graph = Graph.load_graph(cf, 'nostrip')
+        Graph.load_clique_stats(cf)
+        nostrip_clique_stats = Graph.load_clique_stats(cf, 'nostrip')
+        pr = Graph.load_pagerank(cf, alpha, pagerank_max_iter)
+        weight_pr = Graph.load_pagerank(cf, alpha, pagerank_max_iter, weight_feature_name, weight_feature_id)
+        hits = Graph.load_hits(cf, hits_max_iter)
+        weights = Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id)
+        path_weights = Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id, reverse)
+        e3_other_edge = graph.triangle_weights(weights)
+
+        # 特征存储路径
+        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
+
+        for rawset_name in ['train', 'test']:
+            pairs = Graph.part_pairs(cf, rawset_name, 1, 0)
+            pair_edges = np.asarray(graph.pair_edges(rawset_name))
+
+            features = Graph.pair_local_features(graph, pairs, pair_edges)
+            features['graph_edge_max_clique_size_nostrip'] = \
+                nostrip_clique_stats['edge_max'][nostrip_graph.pair_edges(rawset_name)].reshape(-1, 1)
+            features['graph_pagerank_symm_%.2f_%d' % (alpha, pagerank_max_iter)] = \
+                Graph.pair_pagerank_features(pr, pairs)
+            features['graph_pagerank_symm_%s_%d_%.2f_%d' % (
+                weight_feature_name, weight_feature_id, alpha, pagerank_max_iter)] = \
+                Graph.pair_pagerank_features(weight_pr, pairs)
+            features['graph_hits_symm_%d' % hits_max_iter] = Graph.pair_hits_features(hits, pairs)
+            features['graph_clique_size_e3_other_edge_%s' % weight_feature_name] = e3_other_edge[pair_edges]
+            features['graph_node_neighbors_%s_%03d' % (weight_feature_name, weight_feature_id)] = np.hstack(
+                [graph.neighbor_weight_stats(pairs[:, 0], pairs[:, 1], weights),
+                 graph.neighbor_weight_stats(pairs[:, 1], pairs[:, 0], weights)])
+            features['graph_shortest_path_%s_%s' % (weight_feature_name, reverse)] = \
+                graph.shortest_paths(pairs[:, 0], pairs[:, 1], path_weights, n_jobs).reshape(-1, 1)
+
+            for feature_name in sorted(features):
+                LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+                Feature.save_dataframe(features[feature_name],
+                                       '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+                LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
+
     @staticmethod
     def run(cf, argv):
         cmd = argv[0]
@@ -3621,7 +3224,7 @@ class Graph(object):
         if 'extract_graph_edge_max_clique_size' == cmd:
             Graph.extract_graph_edge_max_clique_size(cf, argv[1:])
         elif 'extract_graph_edge_max_clique_size_nostrip' == cmd:
-                Graph.extract_graph_edge_max_clique_size_nostrip(cf, argv[1:])
+            Graph.extract_graph_edge_max_clique_size_nostrip(cf, argv[1:])
         elif 'extract_graph_num_clique' == cmd:
             Graph.extract_graph_num_clique(cf, argv[1:])
         elif 'extract_graph_edge_min_clique_size' == cmd:
@@ -3648,6 +3251,10 @@ class Graph(object):
             Graph.extractor_node_neighbors(cf, argv[1:])
         elif 'extractor_node_neighbors_share_num' == cmd:
             Graph.extractor_node_neighbors_share_num(cf, argv[1:])
+        elif 'extract_graph_structure' == cmd:
+            Graph.extract_graph_structure(cf, argv[1:])
+        elif 'extract_graph_bundle' == cmd:
+            Graph.extract_graph_bundle(cf, argv[1:])
         elif 'extract_graph_pagerank_symm_with_weight' == cmd:
             Graph.extract_graph_pagerank_symm_with_weight(cf, argv[1:])
         else:
@@ -3655,55 +3262,58 @@ class Graph(object):
 
 
 class Count(object):
+    # 字符表：每一列为若干个不相交的 unicode 码位区间
+    alphabets = {
+        'eng': [[(ord(c), ord(c))] for c in string.ascii_lowercase],
+        'digit': [[(ord(c), ord(c))] for c in string.digits],
+        'punct': [[(ord(c), ord(c))] for c in string.punctuation],
+        'space': [[(ord(c), ord(c)) for c in string.whitespace]],
+        'cjk': [[(0x4e00, 0x9fff), (0x3400, 0x4dbf)]],
+        'latin1': [[(0xc0, 0x24f)]],
+    }
 
     def __init__(self):
         pass
 
     @staticmethod
-    def extract_row_eng_char_count(row):
-        s = 'abcdefghijklmnopqrstuvwxyz'
-
-        q1 = str(row['question1']).strip().lower()
-        q2 = str(row['question2']).strip().lower()
-
-        fs1 = [0] * 26
-        fs2 = [0] * 26
-
-        for index in range(len(q1)):
-            c = q1[index]
-            if 0 <= s.find(c):
-                fs1[s.find(c)] += 1
-        for index in range(len(q2)):
-            c = q2[index]
-            if 0 <= s.find(c):
-                fs2[s.find(c)] += 1
-
-        return fs1 + fs2 + list(abs(np.array(fs1) - np.array(fs2)))
+    def extract_char_count_features(data, alphabet_names):
+        """
+        统计 Q1/Q2 在给定字符表上的字符数
+        :param data: 含 question1, question2 列的数据
+        :param alphabet_names: 字符表名字列表，见 Count.alphabets
+        :return: [fs1, fs2, |fs1 - fs2|] 特征矩阵
+        """
+        columns = [col for name in alphabet_names for col in Count.alphabets[name]]
+        docs, ind1, ind2 = sparse_utils._unique_docs(data['question1'].tolist(), data['question2'].tolist())
+        # 先按字节转小写，与逐字节统计保持一致
+        docs = [str(doc).strip().lower().decode('utf-8', 'ignore') for doc in docs]
+        counts = np_utils._char_counts(docs, columns)
+        fs1 = counts[ind1]
+        fs2 = counts[ind2]
+        return np.hstack([fs1, fs2, np.abs(fs1.astype(np.int32) - fs2)])
 
     @staticmethod
-    def extract_eng_char_count(cf, argv):
-        # 设置参数
-        feature_name = 'eng_char_count'
-
-        # 加载数据文件
-        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
-        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+    def extract_char_count(cf, argv):
+        """
+        抽取特征：字符数
+        :param cf:
+        :param argv: [特征名字, 以逗号分隔的字符表名字，如 eng,digit,punct]
+        :return:
+        """
+        feature_name = argv[0]
+        alphabet_names = argv[1].split(',')
 
-        # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
-        train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
-        test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
-
-        # 抽取特征：train.csv
-        train_features = train_data.apply(Count.extract_row_eng_char_count, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
-        Feature.save_dataframe(train_features, train_feature_fp)
-        LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
+        for rawset_name in ['train', 'test']:
+            data = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), rawset_name)).fillna(value="")
+            features = Count.extract_char_count_features(data, alphabet_names)
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
 
-        test_features = test_data.apply(Count.extract_row_eng_char_count, axis=1, raw=True)
-        LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
-        Feature.save_dataframe(test_features, test_feature_fp)
-        LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
+    @staticmethod
+    def extract_eng_char_count(cf, argv):
+        Count.extract_char_count(cf, ['eng_char_count', 'eng'])
 
     @staticmethod
     def run(cf, argv):
@@ -3711,6 +3321,8 @@ class Count(object):
 
         if 'extract_eng_char_count' == cmd:
             Count.extract_eng_char_count(cf, argv[1:])
+        elif 'extract_char_count' == cmd:
+            Count.extract_char_count(cf, argv[1:])
         else:
             LogUtil.log('WARNING', 'NO CMD')
 
@@ -3719,25 +3331,97 @@ class Distance(object):
     snowball_stemmer = SnowballStemmer('english')
     cn_idf = {}
     counter = 0
+    # 问题 -> (词干化文本, 压缩长度, 词干化文本压缩长度)
+    compression_len = {}
+    # 中文问题的 jieba 分词缓存
+    cn_segments = None
 
     def __init__(self):
         pass
 
     @staticmethod
-    def extract_row_jaccard_coef_ngram(row):
-        q1_words = [Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question1']).decode('utf-8')))]
-        q2_words = [Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))]
+    def stem_words(question):
+        return [Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
+                nltk.word_tokenize(Preprocessor.clean_text(str(question).decode('utf-8')))]
 
-        fs = []
-        for n in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n)
-            fs.append(dist_utils._jaccard_coef(q1_ngrams, q2_ngrams))
+    @staticmethod
+    def cn_segments_fp(cf):
+        return '%s/cn_baidu_nmt.segment.npz' % cf.get('DEFAULT', 'devel_pt')
 
-        return fs
+    @staticmethod
+    def segment_cn(cf, argv):
+        """
+        对 cn_baidu_nmt 中每个不同的问题做一次 jieba 分词（cut 与 cut_for_search），存储为词 ID 数组
+        :param cf:
+        :param argv: [进程数]
+        :return:
+        """
+        n_jobs = int(argv[0]) if len(argv) > 0 else 1
+
+        questions = set()
+        for rawset_name in ['train', 'test']:
+            data = pd.read_csv('%s/cn_baidu_nmt.%s.csv' % (cf.get('DEFAULT', 'devel_pt'), rawset_name)).fillna(value="")
+            questions.update([str(q).strip() for q in data['question1'].tolist() + data['question2'].tolist()])
+        LogUtil.log('INFO', 'load questions done, len(questions)=%d' % len(questions))
+
+        segment_utils._save(Distance.cn_segments_fp(cf), sorted(questions), n_jobs)
+        LogUtil.log('INFO', 'save segments done (%s)' % Distance.cn_segments_fp(cf))
+
+    @staticmethod
+    def init_cn_segments(cf):
+        if Distance.cn_segments is None and isfile(Distance.cn_segments_fp(cf)):
+            Distance.cn_segments = segment_utils.Segments(Distance.cn_segments_fp(cf))
+            LogUtil.log('INFO', 'load segments done, len(questions)=%d' % len(Distance.cn_segments))
 
+    @staticmethod
+    def cn_cut(question):
+        question = str(question).strip()
+        if Distance.cn_segments is not None and question in Distance.cn_segments:
+            return Distance.cn_segments.cut(question)
+        return list(jieba.cut(question))
+
+    @staticmethod
+    def cn_cut_for_search(question):
+        question = str(question).strip()
+        if Distance.cn_segments is not None and question in Distance.cn_segments:
+            return Distance.cn_segments.cut_for_search(question)
+        return list(jieba.cut_for_search(question))
+
+    @staticmethod
+    def cn_words(question):
+        return [word for word in Distance.cn_cut(question) if len(word) > 1]
+
+    @staticmethod
+    def cn_chars(question):
+        return list(str(question).strip())
+
+    @staticmethod
+    def ngram_set_dis(data, tokenizer, dis_func, block_size=100000):
+        """
+        计算 1-3 gram 集合距离（Jaccard/Dice），n-gram 集合以有序哈希数组表示
+        :param data: 含 question1, question2 列的数据
+        :param tokenizer: 问题 -> 词列表
+        :param dis_func: 一组问题对的哈希数组 -> 距离，如 dist_utils._jaccard_coefs
+        :param block_size: 分块大小，即 dis_func 每次处理的问题对数
+        :return: (len(data), 3) 特征矩阵
+        """
+        # 问题按文本编号，哈希按编号跨块缓存，每个问题只分词、计算哈希一次
+        qids, questions = pd.factorize(pd.concat([data['question1'], data['question2']], ignore_index=True))
+        qids1 = qids[:len(data)]
+        qids2 = qids[len(data):]
+        ngram_hashes = [None] * len(questions)
+        features = np.zeros((len(data), 3))
+        for begin in range(0, len(data), block_size):
+            end = min(begin + block_size, len(data))
+            for qid in np.concatenate([qids1[begin:end], qids2[begin:end]]):
+                if ngram_hashes[qid] is None:
+                    words = tokenizer(questions[qid])
+                    word_hashes = ngram_utils._word_hashes(words)
+                    ngram_hashes[qid] = [ngram_utils._ngram_hashes(words, n, word_hashes) for n in range(1, 4)]
+            for n in range(3):
+                features[begin:end, n] = dis_func([ngram_hashes[qid][n] for qid in qids1[begin:end]],
+                                                  [ngram_hashes[qid][n] for qid in qids2[begin:end]])
+        return features
 
     @staticmethod
     def extract_jaccard_coef_ngram(cf, argv):
@@ -3754,33 +3438,16 @@ class Distance(object):
         test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
         # 抽取特征：train.csv
-        train_features = train_data.apply(Distance.extract_row_jaccard_coef_ngram, axis=1, raw=True)
+        train_features = Distance.ngram_set_dis(train_data, Distance.stem_words, dist_utils._jaccard_coefs)
         LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
         Feature.save_dataframe(train_features, train_feature_fp)
         LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
 
-        test_features = test_data.apply(Distance.extract_row_jaccard_coef_ngram, axis=1, raw=True)
+        test_features = Distance.ngram_set_dis(test_data, Distance.stem_words, dist_utils._jaccard_coefs)
         LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
         Feature.save_dataframe(test_features, test_feature_fp)
         LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
 
-    @staticmethod
-    def extract_row_cn_word_jaccard_coef_ngram(row):
-
-        q1_words = list(jieba.cut(str(row['question1']).strip()))
-        q2_words = list(jieba.cut(str(row['question2']).strip()))
-
-        q1_words = [word for word in q1_words if len(word) > 1]
-        q2_words = [word for word in q2_words if len(word) > 1]
-
-        fs = []
-        for n in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n)
-            fs.append(dist_utils._jaccard_coef(q1_ngrams, q2_ngrams))
-
-        return fs
-
     @staticmethod
     def extractor_cn_word_jaccard_coef_ngram(cf, argv):
         # 抽取特征的数据集名称
@@ -3792,6 +3459,9 @@ class Distance(object):
         # 设置参数
         feature_name = 'cn_word_jaccard_coef_ngram'
 
+        # 加载分词缓存
+        Distance.init_cn_segments(cf)
+
         # 加载数据文件
         data = pd.read_csv('%s/cn_baidu_nmt.%s.csv' % (cf.get('DEFAULT', 'devel_pt'), dataset_name)).fillna(value="")
         begin_id = int(1. * len(data) / part_num * part_id)
@@ -3806,28 +3476,11 @@ class Distance(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id: end_id].apply(Distance.extract_row_cn_word_jaccard_coef_ngram, axis=1,
-                                                raw=True)
+        features = Distance.ngram_set_dis(data[begin_id: end_id], Distance.cn_words, dist_utils._jaccard_coefs)
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
-    @staticmethod
-    def extract_row_cn_ch_jaccard_coef_ngram(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        q1_words = list(q1)
-        q2_words = list(q2)
-
-        fs = []
-        for n in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n)
-            fs.append(dist_utils._jaccard_coef(q1_ngrams, q2_ngrams))
-
-        return fs
-
     @staticmethod
     def extract_cn_ch_jaccard_coef_ngram(cf, argv):
         # 抽取特征的数据集名称
@@ -3853,27 +3506,11 @@ class Distance(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id: end_id].apply(Distance.extract_row_cn_ch_jaccard_coef_ngram, axis=1,
-                                                raw=True)
+        features = Distance.ngram_set_dis(data[begin_id: end_id], Distance.cn_chars, dist_utils._jaccard_coefs)
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
-    @staticmethod
-    def extract_row_dice_dis_ngram(row):
-        q1_words = [Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question1']).decode('utf-8')))]
-        q2_words = [Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
-                    nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))]
-
-        fs = []
-        for n in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n)
-            fs.append(dist_utils._dice_dist(q1_ngrams, q2_ngrams))
-
-        return fs
-
     @staticmethod
     def extract_dice_dis_ngram(cf, argv):
         # 设置参数
@@ -3889,32 +3526,16 @@ class Distance(object):
         test_feature_fp = '%s/%s.test.smat' % (feature_pt, feature_name)
 
         # 抽取特征：train.csv
-        train_features = train_data.apply(Distance.extract_row_dice_dis_ngram, axis=1, raw=True)
+        train_features = Distance.ngram_set_dis(train_data, Distance.stem_words, dist_utils._dice_dists)
         LogUtil.log('INFO', 'extract train features (%s) done' % feature_name)
         Feature.save_dataframe(train_features, train_feature_fp)
         LogUtil.log('INFO', 'save train features (%s) done' % feature_name)
 
-        test_features = test_data.apply(Distance.extract_row_dice_dis_ngram, axis=1, raw=True)
+        test_features = Distance.ngram_set_dis(test_data, Distance.stem_words, dist_utils._dice_dists)
         LogUtil.log('INFO', 'extract test features (%s) done' % feature_name)
         Feature.save_dataframe(test_features, test_feature_fp)
         LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
 
-    @staticmethod
-    def extract_row_cn_ch_dice_dis_ngram(row):
-        q1 = str(row['question1']).strip()
-        q2 = str(row['question2']).strip()
-
-        q1_words = list(q1)
-        q2_words = list(q2)
-
-        fs = []
-        for n in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n)
-            fs.append(dist_utils._dice_dist(q1_ngrams, q2_ngrams))
-
-        return fs
-
     @staticmethod
     def extract_cn_ch_dice_dis_ngram(cf, argv):
         # 抽取特征的数据集名称
@@ -3940,28 +3561,11 @@ class Distance(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id: end_id].apply(Distance.extract_row_cn_ch_dice_dis_ngram, axis=1,
-                                                raw=True)
+        features = Distance.ngram_set_dis(data[begin_id: end_id], Distance.cn_chars, dist_utils._dice_dists)
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
 
-    @staticmethod
-    def extract_row_cn_word_dice_dis_ngram(row):
-        q1_words = list(jieba.cut(str(row['question1']).strip()))
-        q2_words = list(jieba.cut(str(row['question2']).strip()))
-
-        q1_words = [word for word in q1_words if len(word) > 1]
-        q2_words = [word for word in q2_words if len(word) > 1]
-
-        fs = []
-        for n in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n)
-            fs.append(dist_utils._dice_dist(q1_ngrams, q2_ngrams))
-
-        return fs
-
     @staticmethod
     def extract_cn_word_dice_dis_ngram(cf, argv):
         # 抽取特征的数据集名称
@@ -3973,6 +3577,9 @@ class Distance(object):
         # 设置参数
         feature_name = 'cn_word_dice_dis_ngram'
 
+        # 加载分词缓存
+        Distance.init_cn_segments(cf)
+
         # 加载数据文件
         data = pd.read_csv('%s/cn_baidu_nmt.%s.csv' % (cf.get('DEFAULT', 'devel_pt'), dataset_name)).fillna(value="")
         begin_id = int(1. * len(data) / part_num * part_id)
@@ -3987,8 +3594,7 @@ class Distance(object):
             data_feature_fp = '%s/%s.%s.smat.%03d' % (feature_pt, feature_name, dataset_name, part_id)
 
         # 抽取特征
-        features = data[begin_id: end_id].apply(Distance.extract_row_cn_word_dice_dis_ngram, axis=1,
-                                                raw=True)
+        features = Distance.ngram_set_dis(data[begin_id: end_id], Distance.cn_words, dist_utils._dice_dists)
         Feature.save_dataframe(features, data_feature_fp)
         LogUtil.log('INFO',
                     'save train features (%s, %s, %d, %d) done' % (feature_name, dataset_name, part_num, part_id))
@@ -4034,57 +3640,10 @@ class Distance(object):
 
     @staticmethod
     def extract_row_cn_edit_dis_word_ngram(row):
-        q1_words = list(jieba.cut(str(row['question1']).strip()))
-        q2_words = list(jieba.cut(str(row['question2']).strip()))
-
-        q1_words = [word for word in q1_words if len(word) > 1]
-        q2_words = [word for word in q2_words if len(word) > 1]
-
-        fs = []
-        aggregation_mode_prev = ["mean", "max", "min", "median"]
-        aggregation_mode = ["mean", "std", "max", "min", "median"]
-
-        aggregation_mode, aggregator = Distance._check_aggregation_mode(aggregation_mode)
-        aggregation_mode_prev, aggregator_prev = Distance._check_aggregation_mode(aggregation_mode_prev)
-
-        for n_ngram in range(1, 4):
-            q1_ngrams = ngram_utils._ngrams(q1_words, n_ngram)
-            q2_ngrams = ngram_utils._ngrams(q2_words, n_ngram)
-
-            val_list = []
-            for w1 in q1_ngrams:
-                _val_list = []
-                for w2 in q2_ngrams:
-                    s = dist_utils._edit_dist(w1, w2)
-                    _val_list.append(s)
-                if len(_val_list) == 0:
-                    _val_list = [config.MISSING_VALUE_NUMERIC]
-                val_list.append(_val_list)
-            if len(val_list) == 0:
-                val_list = [[config.MISSING_VALUE_NUMERIC]]
-
-            res = np.zeros(len(aggregator_prev) * len(aggregator), dtype=float)
-            for m, aggregator_prev_i in enumerate(aggregator_prev):
-                for n, aggregator_i in enumerate(aggregator):
-                    idx = m * len(aggregator) + n
-                    try:
-                        tmp = []
-                        for l in val_list:
-                            try:
-                                s = aggregator_prev_i(l)
-                            except:
-                                s = config.MISSING_VALUE_NUMERIC
-                            tmp.append(s)
-                    except:
-                        tmp = [config.MISSING_VALUE_NUMERIC]
-                    try:
-                        s = aggregator_i(tmp)
-                    except:
-                        s = config.MISSING_VALUE_NUMERIC
-                    res[idx] = s
+        q1_words = Distance.cn_words(row['question1'])
+        q2_words = Distance.cn_words(row['question2'])
 
-            fs.extend(res)
-        return fs
+        return Distance.edit_dis_ngram(q1_words, q2_words)
 
     @staticmethod
     def extract_cn_edit_dis_word_ngram(cf, argv):
@@ -4097,6 +3656,9 @@ class Distance(object):
         # 设置参数
         feature_name = 'cn_edit_dis_word_ngram'
 
+        # 加载分词缓存
+        Distance.init_cn_segments(cf)
+
         # 加载数据文件
         data = pd.read_csv('%s/cn_baidu_nmt.%s.csv' % (cf.get('DEFAULT', 'devel_pt'), dataset_name)).fillna(value="")
         begin_id = int(1. * len(data) / part_num * part_id)
@@ -4167,50 +3729,42 @@ class Distance(object):
         q2_words = [Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
                     nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))]
 
-        fs = []
-        aggregation_mode_prev = ["mean", "max", "min", "median"]
-        aggregation_mode = ["mean", "std", "max", "min", "median"]
+        return Distance.edit_dis_ngram(q1_words, q2_words)
 
-        aggregation_mode, aggregator = Distance._check_aggregation_mode(aggregation_mode)
-        aggregation_mode_prev, aggregator_prev = Distance._check_aggregation_mode(aggregation_mode_prev)
+    @staticmethod
+    def _aggregate_dist_matrix(val_matrix):
+        """
+        对距离矩阵先按行做 mean/max/min/median，再对结果做 mean/std/max/min/median
+        :param val_matrix: (n1, n2) 距离矩阵, n1 与 n2 均不为 0
+        :return: 长度为 4 * 5 的特征，第 m * 5 + n 个为第 n 种聚合作用于第 m 种行聚合
+        """
+        aggregation_prev = np.vstack([np.mean(val_matrix, axis=1), np.max(val_matrix, axis=1),
+                                      np.min(val_matrix, axis=1), np.median(val_matrix, axis=1)])
+        return np.column_stack([np.mean(aggregation_prev, axis=1), np.std(aggregation_prev, axis=1),
+                                np.max(aggregation_prev, axis=1), np.min(aggregation_prev, axis=1),
+                                np.median(aggregation_prev, axis=1)]).ravel()
 
+    @staticmethod
+    def edit_dis_ngram(q1_words, q2_words):
+        """
+        计算 1-3 gram 间两两编辑距离的聚合特征
+        :param q1_words: Q1 的词列表
+        :param q2_words: Q2 的词列表
+        :return: 长度为 3 * 20 的特征
+        """
+        fs = []
         for n_ngram in range(1, 4):
             q1_ngrams = ngram_utils._ngrams(q1_words, n_ngram)
             q2_ngrams = ngram_utils._ngrams(q2_words, n_ngram)
 
-            val_list = []
-            for w1 in q1_ngrams:
-                _val_list = []
-                for w2 in q2_ngrams:
-                    s = dist_utils._edit_dist(w1, w2)
-                    _val_list.append(s)
-                if len(_val_list) == 0:
-                    _val_list = [config.MISSING_VALUE_NUMERIC]
-                val_list.append(_val_list)
-            if len(val_list) == 0:
-                val_list = [[config.MISSING_VALUE_NUMERIC]]
-
-            res = np.zeros(len(aggregator_prev) * len(aggregator), dtype=float)
-            for m, aggregator_prev_i in enumerate(aggregator_prev):
-                for n, aggregator_i in enumerate(aggregator):
-                    idx = m * len(aggregator) + n
-                    try:
-                        tmp = []
-                        for l in val_list:
-                            try:
-                                s = aggregator_prev_i(l)
-                            except:
-                                s = config.MISSING_VALUE_NUMERIC
-                            tmp.append(s)
-                    except:
-                        tmp = [config.MISSING_VALUE_NUMERIC]
-                    try:
-                        s = aggregator_i(tmp)
-                    except:
-                        s = config.MISSING_VALUE_NUMERIC
-                    res[idx] = s
+            if 0 == len(q1_ngrams):
+                val_matrix = np.array([[config.MISSING_VALUE_NUMERIC]])
+            elif 0 == len(q2_ngrams):
+                val_matrix = np.full((len(q1_ngrams), 1), config.MISSING_VALUE_NUMERIC)
+            else:
+                val_matrix = dist_utils._edit_dist_matrix(q1_ngrams, q2_ngrams)
 
-            fs.extend(res)
+            fs.extend(Distance._aggregate_dist_matrix(val_matrix))
         return fs
 
     @staticmethod
@@ -4253,14 +3807,52 @@ class Distance(object):
         Feature.save_dataframe(test_features, test_feature_fp)
         LogUtil.log('INFO', 'save test features (%s) done' % feature_name)
 
+    @staticmethod
+    def stem_text(text):
+        return ' '.join(Distance.stem_words(text))
+
+    @staticmethod
+    def init_compression_len(cf, questions, n_jobs):
+        """
+        加载/更新问题的压缩长度缓存，缓存包含原文与词干化文本两种形式
+        :param cf: 配置
+        :param questions: 需要缓存的问题列表
+        :param n_jobs: 词干化与压缩使用的进程数
+        :return: none
+        """
+        cache_fp = '%s/compression_len.csv' % cf.get('DEFAULT', 'feature_stat_pt')
+        if isfile(cache_fp):
+            cache = pd.read_csv(cache_fp, dtype={'question': str, 'stem': str}, keep_default_na=False)
+            Distance.compression_len = dict(zip(cache['question'], zip(cache['stem'], cache['len'], cache['stem_len'])))
+        LogUtil.log('INFO', 'load compression len cache done, len(cache)=%d' % len(Distance.compression_len))
+
+        questions = list(set([str(q).strip() for q in questions]) - set(Distance.compression_len.keys()))
+        if 0 == len(questions):
+            return
+        # 词干化与压缩在同一进程池中完成，结果为 (词干化文本, 原文压缩长度, 词干化文本压缩长度)
+        lens = dist_utils._compressed_lens(questions, n_jobs, _stem_compressed_lens)
+        Distance.compression_len.update(zip(questions, lens))
+        LogUtil.log('INFO', 'compress %d new questions done' % len(questions))
+
+        questions = Distance.compression_len.keys()
+        cache = pd.DataFrame({'question': questions,
+                              'stem': [Distance.compression_len[q][0] for q in questions],
+                              'len': [Distance.compression_len[q][1] for q in questions],
+                              'stem_len': [Distance.compression_len[q][2] for q in questions]})
+        cache.to_csv(cache_fp, index=False, columns=['question', 'stem', 'len', 'stem_len'])
+        LogUtil.log('INFO', 'save compression len cache done, len(cache)=%d' % len(cache))
+
     @staticmethod
     def extract_row_compression_dis(row):
         q1 = str(row['question1']).strip()
         q2 = str(row['question2']).strip()
-        q1_stem = ' '.join([Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
-                            nltk.word_tokenize(Preprocessor.clean_text(str(row['question1']).decode('utf-8')))])
-        q2_stem = ' '.join([Distance.snowball_stemmer.stem(word).encode('utf-8') for word in
-                            nltk.word_tokenize(Preprocessor.clean_text(str(row['question2']).decode('utf-8')))])
+        if q1 in Distance.compression_len and q2 in Distance.compression_len:
+            q1_stem, l_q1, l_q1_stem = Distance.compression_len[q1]
+            q2_stem, l_q2, l_q2_stem = Distance.compression_len[q2]
+            return [dist_utils._compression_dist(q1, q2, l_q1, l_q2),
+                    dist_utils._compression_dist(q1_stem, q2_stem, l_q1_stem, l_q2_stem)]
+        q1_stem = Distance.stem_text(row['question1'])
+        q2_stem = Distance.stem_text(row['question2'])
 
         return [dist_utils._compression_dist(q1, q2), dist_utils._compression_dist(q1_stem, q2_stem)]
 
@@ -4268,11 +3860,16 @@ class Distance(object):
     def extract_compression_dis(cf, argv):
         # 设置参数
         feature_name = 'cmpression_dis'
+        n_jobs = int(argv[0]) if len(argv) > 0 else 1
 
         # 加载数据文件
         train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
         test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
 
+        # 每个问题只压缩一次
+        Distance.init_compression_len(cf, train_data['question1'].tolist() + train_data['question2'].tolist() +
+                                      test_data['question1'].tolist() + test_data['question2'].tolist(), n_jobs)
+
         # 特征存储路径
         feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
         train_feature_fp = '%s/%s.train.smat' % (feature_pt, feature_name)
@@ -4397,7 +3994,7 @@ class Distance(object):
         questions = set(questions)
 
         for q in questions:
-            words = list(jieba.cut_for_search(q))
+            words = Distance.cn_cut_for_search(q)
             # words = [ word for word in words if len(word) > 1]
             # print ' '.join(words)
             for word in words:
@@ -4414,8 +4011,8 @@ class Distance(object):
     def extract_row_cn_baidu_my_tfidf_word_match_share(row):
         fs = []
 
-        q1_cut_words = list(jieba.cut_for_search(str(row['question1']).strip()))
-        q2_cut_words = list(jieba.cut_for_search(str(row['question2']).strip()))
+        q1_cut_words = Distance.cn_cut_for_search(row['question1'])
+        q2_cut_words = Distance.cn_cut_for_search(row['question2'])
         # print ' '.join(q1_cut_words)
         # print ' '.join(q2_cut_words)
 
@@ -4471,6 +4068,9 @@ class Distance(object):
         # 设置参数
         feature_name = 'cn_baidu_my_all_tfidf_word_match_share'
 
+        # 加载分词缓存
+        Distance.init_cn_segments(cf)
+
         # 加载IDF训练文件
         train_data = pd.read_csv('%s/cn_baidu_nmt.train.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
         test_data = pd.read_csv('%s/cn_baidu_nmt.test.csv' % cf.get('DEFAULT', 'devel_pt')).fillna(value="")
@@ -4603,6 +4203,8 @@ class Distance(object):
             Distance.extract_compression_dis(cf, argv[1:])
         elif 'extract_compression_dis_ngram' == cmd:
             Distance.extract_compression_dis_ngram(cf, argv[1:])
+        elif 'segment_cn' == cmd:
+            Distance.segment_cn(cf, argv[1:])
         elif 'extract_cn_baidu_my_tfidf_word_match_share' == cmd:
             Distance.extract_cn_baidu_my_tfidf_word_match_share(cf, argv[1:])
         elif 'extract_cn_ch_jaccard_coef_ngram' == cmd:
@@ -4623,6 +4225,129 @@ class Distance(object):
             LogUtil.log('WARNING', 'NO CMD')
 
 
+def _stem_compressed_lens(question):
+    """
+    词干化问题并计算原文与词干化文本的压缩长度，供 Distance.init_compression_len 的进程池使用
+    :param question: 问题文本
+    :return: (词干化文本, 原文压缩长度, 词干化文本压缩长度)
+    """
+    stem = Distance.stem_text(question)
+    return stem, dist_utils._compressed_len(question), dist_utils._compressed_len(stem)
+
+
+class MinHash(object):
+    """
+    基于 MinHash 签名的近似 n-gram Jaccard 特征，以及 LSH 近似重复问题查询
+    """
+
+    @staticmethod
+    def signatures_fp(cf, rawset_name):
+        return '%s/minhash.%s.npz' % (cf.get('DEFAULT', 'feature_stat_pt'), rawset_name)
+
+    @staticmethod
+    def init_signatures(docs, num_perm):
+        """
+        计算问题的 1-3 gram MinHash 签名
+        :param docs: 问题列表
+        :param num_perm: 签名长度
+        :return: 3 个 (len(docs), num_perm) 签名矩阵
+        """
+        words = [Distance.stem_words(doc) for doc in docs]
+        word_hashes = [ngram_utils._word_hashes(w) for w in words]
+        return [minhash_utils._minhash_signatures(
+            [ngram_utils._ngram_hashes(w, n, h) for w, h in zip(words, word_hashes)], num_perm) for n in range(1, 4)]
+
+    @staticmethod
+    def load_signatures(cf, rawset_name):
+        """
+        加载签名文件
+        :return: (问题列表, 3 个签名矩阵)
+        """
+        sigs = np.load(MinHash.signatures_fp(cf, rawset_name), allow_pickle=True)
+        return sigs['docs'].tolist(), [sigs['n%d' % n] for n in range(1, 4)]
+
+    @staticmethod
+    def extract(cf, argv):
+        """
+        抽取特征：1-3 gram 的近似 Jaccard 系数，并存储每个问题的签名
+        :param cf:
+        :param argv: [特征名字, 签名长度]
+        :return:
+        """
+        feature_name = argv[0]
+        num_perm = int(argv[1])
+
+        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
+        for rawset_name in ['train', 'test']:
+            data = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), rawset_name)).fillna(value="")
+            docs, ind1, ind2 = sparse_utils._unique_docs(data['question1'].tolist(), data['question2'].tolist())
+            sigs = MinHash.init_signatures(docs, num_perm)
+            np.savez(MinHash.signatures_fp(cf, rawset_name), docs=np.array(docs, dtype=object),
+                     n1=sigs[0], n2=sigs[1], n3=sigs[2])
+            LogUtil.log('INFO', 'save %s signatures done, len(docs)=%d' % (rawset_name, len(docs)))
+
+            features = np.column_stack([minhash_utils._approx_jaccards(sig[ind1], sig[ind2]) for sig in sigs])
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            Feature.save_dataframe(features, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name))
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
+
+    @staticmethod
+    def search(cf, argv):
+        """
+        查询与给定问题近似重复的问题
+        :param cf:
+        :param argv: [数据集名字, n-gram 的 n, band 数目, 近似 Jaccard 阈值, 问题]
+        :return:
+        """
+        rawset_name = argv[0]
+        n = int(argv[1])
+        bands = int(argv[2])
+        threshold = float(argv[3])
+        question = argv[4]
+
+        docs, sigs = MinHash.load_signatures(cf, rawset_name)
+        index = minhash_utils.LSHIndex(sigs[n - 1], bands)
+        sig = MinHash.init_signatures([question], sigs[n - 1].shape[1])[n - 1][0]
+        for row, sim in sorted(index.query(sig, threshold), key=lambda x: -x[1]):
+            LogUtil.log('INFO', '%f\t%s' % (sim, docs[row]))
+
+    @staticmethod
+    def generate_candidates(cf, argv):
+        """
+        生成近似重复的问题对，存储为 question1,question2,approx_jaccard
+        :param cf:
+        :param argv: [数据集名字, n-gram 的 n, band 数目, 近似 Jaccard 阈值]
+        :return:
+        """
+        rawset_name = argv[0]
+        n = int(argv[1])
+        bands = int(argv[2])
+        threshold = float(argv[3])
+
+        docs, sigs = MinHash.load_signatures(cf, rawset_name)
+        rows1, rows2, sims = minhash_utils.LSHIndex(sigs[n - 1], bands).candidate_pairs(threshold)
+        candidates_fp = '%s/minhash.%s.n%d.b%d.candidates.csv' % (cf.get('DEFAULT', 'feature_stat_pt'),
+                                                                  rawset_name, n, bands)
+        pd.DataFrame({'question1': [docs[row] for row in rows1],
+                      'question2': [docs[row] for row in rows2],
+                      'approx_jaccard': sims}).to_csv(candidates_fp, index=False,
+                                                      columns=['question1', 'question2', 'approx_jaccard'])
+        LogUtil.log('INFO', 'save candidates done, len(candidates)=%d' % len(sims))
+
+    @staticmethod
+    def run(cf, argv):
+        cmd = argv[0]
+
+        if 'extract' == cmd:
+            MinHash.extract(cf, argv[1:])
+        elif 'search' == cmd:
+            MinHash.search(cf, argv[1:])
+        elif 'generate_candidates' == cmd:
+            MinHash.generate_candidates(cf, argv[1:])
+        else:
+            LogUtil.log('WARNING', 'NO CMD')
+
+
 class Predict(object):
     def __init__(self):
         pass
@@ -5135,19 +4860,466 @@ class NLP(object):
             LogUtil.log('WARNING', 'NO CMD')
 
 
+class Incremental(object):
+    """
+    增量抽取特征：仅针对train.csv/test.csv中新追加的<Q1,Q2>抽取特征，并追加到已有特征文件中
+    特征文件<feature_fp>.manifest记录已抽取行的ID，<feature_fp>.offset记录特征依赖的统计量版本
+    IDF 按已处理的行数增量更新；id、dul_num、dul_num_ratio 由增量更新的问题表计算，见 extract_pairs
+    问题表与问题图按其中已有的 <Q1,Q2> 数增量更新，见 update_graph
+    """
+
+    # 支持增量抽取的特征：特征名 -> (依赖的统计量, 按行抽取函数)
+    extractors = {
+        'word_match_share': (None, WordMatchShare.word_match_share),
+        'my_word_match_share': (None, MyWordMatchShare.word_match_share),
+        'my_tfidf_word_match_share': ('idf', MyTFIDFWordMatchShare.tfidf_word_match_share),
+    }
+
+    # 由问题表按 <qid1, qid2> 批量抽取的特征：特征名 -> (依赖的统计量, 抽取函数 f(统计量, pairs))
+    pair_extractors = {
+        'dul_num': ('dul_num', DulNum.pair_dul_num),
+        'dul_num_ratio': ('dul_num', DulNum.pair_dul_num_ratio),
+        'id': (None, lambda stat, pairs: ID.pair_id(pairs)),
+    }
+
+    # 随问题图增量更新的局部图特征，见 Graph.pair_local_features
+    graph_features = ['graph_edge_cc_size', 'graph_node_degree', 'node_neighbors_share_num',
+                      'graph_edge_max_clique_size', 'graph_edge_min_clique_size', 'graph_num_clique',
+                      'graph_node_max_clique_size', 'graph_mc_cc_rate']
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def get_id_name(rawset_name):
+        """
+        获取数据集中行ID的列名
+        :param rawset_name: train/test
+        :return: 列名
+        """
+        return 'id' if 'train' == rawset_name else 'test_id'
+
+    @staticmethod
+    def load_data(cf):
+        """
+        加载train.csv和test.csv
+        :param cf: 配置
+        :return: train_data, test_data
+        """
+        train_data = pd.read_csv('%s/train.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+        test_data = pd.read_csv('%s/test.csv' % cf.get('DEFAULT', 'origin_pt')).fillna(value="")
+        return train_data, test_data
+
+    @staticmethod
+    def load_offset(fp):
+        """
+        加载统计量已处理的行数
+        :param fp: 文件路径
+        :return: [n_train, n_test]，文件不存在时为[0, 0]
+        """
+        if not isfile(fp):
+            return [0, 0]
+        f = open(fp)
+        offset = [int(x) for x in f.readline().split()]
+        f.close()
+        return offset
+
+    @staticmethod
+    def save_offset(fp, offset):
+        f = open(fp, 'w')
+        f.write('%d %d\n' % (offset[0], offset[1]))
+        f.close()
+
+    @staticmethod
+    def load_stat(fp):
+        """
+        加载统计量文件，格式：首行为已处理的行数，其余每行为<key,value>
+        :param fp: 文件路径
+        :return: offset, 统计量字典
+        """
+        stat = {}
+        if not isfile(fp):
+            return [0, 0], stat
+        f = open(fp)
+        offset = [int(x) for x in f.readline().split()]
+        for kv in csv.reader(f):
+            stat[kv[0]] = int(kv[1])
+        f.close()
+        LogUtil.log('INFO', 'load stat done (%s), offset=%s, len(stat)=%d' % (fp, str(offset), len(stat)))
+        return offset, stat
+
+    @staticmethod
+    def save_stat(fp, offset, stat):
+        f = open(fp, 'w')
+        f.write('%d %d\n' % (offset[0], offset[1]))
+        fout = csv.writer(f)
+        for k, v in sorted(stat.items(), key=lambda kv: kv[1]):
+            fout.writerow([k, v])
+        f.close()
+        LogUtil.log('INFO', 'save stat done (%s), offset=%s, len(stat)=%d' % (fp, str(offset), len(stat)))
+
+    @staticmethod
+    def update_idf(cf, train_data, test_data):
+        """
+        增量更新MyTFIDFWordMatchShare.idf，文档集合为train.csv中去重的question（按qid去重）
+        """
+        stat_fp = '%s/my_tfidf_word_match_share.idf.stat' % cf.get('DEFAULT', 'feature_stat_pt')
+        qid_fp = '%s/my_tfidf_word_match_share.idf.qid' % cf.get('DEFAULT', 'feature_stat_pt')
+        offset, df = Incremental.load_stat(stat_fp)
+        qids = set(DataUtil.load_vector(qid_fp, False)) if isfile(qid_fp) else set()
+
+        new_qids = []
+        for index, row in train_data[offset[0]:].iterrows():
+            for qid, q in [(str(row['qid1']), row['question1']), (str(row['qid2']), row['question2'])]:
+                if qid in qids:
+                    continue
+                qids.add(qid)
+                new_qids.append(qid)
+                for word in set(str(q).lower().split()):
+                    df[word] = df.get(word, 0) + 1
+        DataUtil.save_vector(qid_fp, new_qids, 'a')
+        Incremental.save_stat(stat_fp, [len(train_data), len(test_data)], df)
+
+        num_docs = len(qids)
+        MyTFIDFWordMatchShare.idf = {}
+        for word in df:
+            MyTFIDFWordMatchShare.idf[word] = math.log(num_docs / (df[word] + 1.)) / math.log(2.)
+        LogUtil.log("INFO", "IDF calculation done, len(idf)=%d" % len(MyTFIDFWordMatchShare.idf))
+
+    @staticmethod
+    def to_csr(features):
+        return sparse.csr_matrix(np.array(features.values.tolist(), dtype=float))
+
+    @staticmethod
+    def load_features(feature_fp, row_ids):
+        """
+        加载已抽取的特征及其行ID
+        :param feature_fp: 特征文件路径
+        :param row_ids: 数据集中的行ID
+        :return: 特征矩阵（不存在时为None）, 与特征矩阵的行一一对应的行ID
+        """
+        manifest_fp = '%s.manifest' % feature_fp
+        features = None
+        if isfile(feature_fp) or isfile('%s.npz' % feature_fp):
+            features = Feature.load(feature_fp)
+            if not isfile(manifest_fp):
+                # 已有特征文件没有记录行ID，则认为其对应数据集的前若干行
+                DataUtil.save_vector(manifest_fp, row_ids[:features.shape[0]], 'w')
+        done_ids = DataUtil.load_vector(manifest_fp, False) if isfile(manifest_fp) else []
+        return features, done_ids
+
+    @staticmethod
+    def update_question_table(cf):
+        """
+        增量更新问题表（不存在时由 train.csv, test.csv 构建）
+        :param cf: 配置
+        :return: 问题表（strip）
+        """
+        table_prefix = '%s/question_table' % cf.get('DEFAULT', 'devel_pt')
+        if isfile(question_table._fp(table_prefix, 'strip', 'questions.offset')):
+            n_questions = question_table._extend({'train': '%s/train.csv' % cf.get('DEFAULT', 'origin_pt'),
+                                                  'test': '%s/test.csv' % cf.get('DEFAULT', 'origin_pt')},
+                                                 table_prefix)
+            LogUtil.log('INFO', 'extend question table done, n_new_questions=%s' % str(n_questions))
+            ID.question_tables = {}
+        return ID.load_question_table(cf)
+
+    @staticmethod
+    def extract(cf, argv):
+        """
+        增量抽取特征
+        :param cf: 配置
+        :param argv: [feature_name, rawset_name]
+        :return: None
+        """
+        # 设置参数
+        feature_name = argv[0]
+        rawset_name = argv[1]
+        if feature_name in Incremental.pair_extractors:
+            Incremental.extract_pairs(cf, feature_name, rawset_name)
+            return
+        stat_name, extract_row = Incremental.extractors[feature_name]
+        id_name = Incremental.get_id_name(rawset_name)
+
+        # 加载数据文件
+        train_data, test_data = Incremental.load_data(cf)
+        data = train_data if 'train' == rawset_name else test_data
+
+        # 特征存储路径
+        feature_fp = '%s/%s.%s.smat' % (cf.get('DEFAULT', 'feature_question_pair_pt'), feature_name, rawset_name)
+        manifest_fp = '%s.manifest' % feature_fp
+        offset_fp = '%s.offset' % feature_fp
+
+        # 加载已抽取的特征及行ID
+        features, done_ids = Incremental.load_features(feature_fp, data[id_name].tolist())
+        new_data = data[~data[id_name].astype(str).isin(done_ids)]
+        LogUtil.log('INFO', 'len(done)=%d, len(new)=%d' % (len(done_ids), len(new_data)))
+
+        # 增量更新统计量
+        if 'idf' == stat_name:
+            Incremental.update_idf(cf, train_data, test_data)
+
+        # 重新抽取受统计量变化影响的已有行
+        dirty_data = None
+        if features is not None:
+            feature_offset = Incremental.load_offset(offset_fp)
+            done_data = data[data[id_name].astype(str).isin(done_ids)]
+            if 'idf' == stat_name and feature_offset[0] != len(train_data):
+                # train.csv新增行改变了文档数，所有词的IDF都会变化
+                dirty_data = done_data
+        if dirty_data is not None:
+            if len(dirty_data):
+                row_indexs = dict((row_id, index) for index, row_id in enumerate(done_ids))
+                dirty_indexs = [row_indexs[row_id] for row_id in dirty_data[id_name].astype(str)]
+                features = features.tolil()
+                features[dirty_indexs, :] = Incremental.to_csr(dirty_data.apply(extract_row, axis=1, raw=True))
+                features = features.tocsr()
+            LogUtil.log('INFO', 'update dirty features (%s) done, len(dirty)=%d' % (feature_name, len(dirty_data)))
+
+        # 抽取新增行的特征
+        if len(new_data):
+            new_features = Incremental.to_csr(new_data.apply(extract_row, axis=1, raw=True))
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            features = new_features if features is None else Feature.merge_row(features, new_features).tocsr()
+
+        # 存储特征及行ID
+        if features is not None:
+            Feature.save_smat(features, feature_fp)
+            Feature.save_npz(features, feature_fp)
+            DataUtil.save_vector(manifest_fp, new_data[id_name].tolist(), 'a')
+            Incremental.save_offset(offset_fp, [len(train_data), len(test_data)])
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
+
+    @staticmethod
+    def extract_pairs(cf, feature_name, rawset_name):
+        """
+        由增量更新的问题表抽取特征：新增行抽取后追加，
+        dul_num 类特征中含出现次数有变化的问题的已有行重新抽取
+        :param cf: 配置
+        :param feature_name: Incremental.pair_extractors 中的特征名
+        :param rawset_name: train/test
+        :return: None
+        """
+        stat_name, extract_pairs = Incremental.pair_extractors[feature_name]
+        id_name = Incremental.get_id_name(rawset_name)
+
+        # 增量更新问题表，<qid1, qid2> 与数据集的行一一对应
+        table = Incremental.update_question_table(cf)
+        pairs = np.asarray(table.pairs(rawset_name))
+        row_ids = pd.read_csv('%s/%s.csv' % (cf.get('DEFAULT', 'origin_pt'), rawset_name),
+                              usecols=[id_name])[id_name].astype(str).tolist()
+
+        # 特征存储路径
+        feature_fp = '%s/%s.%s.smat' % (cf.get('DEFAULT', 'feature_question_pair_pt'), feature_name, rawset_name)
+        manifest_fp = '%s.manifest' % feature_fp
+        offset_fp = '%s.offset' % feature_fp
+
+        # 加载已抽取的特征及行ID，换算为 pairs 中的行号
+        features, done_ids = Incremental.load_features(feature_fp, row_ids)
+        row_indexs = dict((row_id, index) for index, row_id in enumerate(row_ids))
+        done_rows = np.array([row_indexs[row_id] for row_id in done_ids], dtype=np.int64)
+        done_set = set(done_ids)
+        new_rows = np.array([index for index, row_id in enumerate(row_ids) if row_id not in done_set], dtype=np.int64)
+        LogUtil.log('INFO', 'len(done)=%d, len(new)=%d' % (len(done_rows), len(new_rows)))
+
+        # 重新抽取受统计量变化影响的已有行（dirty 为特征矩阵中的行号）
+        stat = None
+        dirty = np.zeros(0, dtype=np.int64)
+        if 'dul_num' == stat_name:
+            stat = DulNum.count_dul_num(table)
+            if features is not None:
+                # 特征抽取之后新增的 <Q1,Q2> 改变了其中问题的出现次数
+                feature_offset = Incremental.load_offset(offset_fp)
+                changed = np.zeros(len(table), dtype=bool)
+                for name, offset in zip(['train', 'test'], feature_offset):
+                    changed[np.asarray(table.pairs(name)[offset:]).ravel()] = True
+                dirty = np.where(changed[pairs[done_rows, 0]] | changed[pairs[done_rows, 1]])[0]
+        if len(dirty):
+            features = features.tolil()
+            features[dirty, :] = sparse.csr_matrix(extract_pairs(stat, pairs[done_rows[dirty]]).astype(float))
+            features = features.tocsr()
+        LogUtil.log('INFO', 'update dirty features (%s) done, len(dirty)=%d' % (feature_name, len(dirty)))
+
+        # 抽取新增行的特征
+        if len(new_rows):
+            new_features = sparse.csr_matrix(extract_pairs(stat, pairs[new_rows]).astype(float))
+            LogUtil.log('INFO', 'extract %s features (%s) done' % (rawset_name, feature_name))
+            features = new_features if features is None else Feature.merge_row(features, new_features).tocsr()
+
+        # 存储特征及行ID
+        if features is not None:
+            Feature.save_smat(features, feature_fp)
+            Feature.save_npz(features, feature_fp)
+            DataUtil.save_vector(manifest_fp, [row_ids[index] for index in new_rows], 'a')
+            Incremental.save_offset(offset_fp, [len(table.pairs('train')), len(table.pairs('test'))])
+            LogUtil.log('INFO', 'save %s features (%s) done' % (rawset_name, feature_name))
+
+    @staticmethod
+    def graph_row_extractors(cf, graph, norm, rawset_name, pairs, pair_edges, e3_weight_ids):
+        """
+        获取已存在的图特征文件，及对给定 <Q1,Q2> 重新抽取这些特征的函数
+        :param pairs: 需要重新抽取的 (n_rows, 2) <qid1, qid2>
+        :param pair_edges: 需要重新抽取的 <Q1,Q2> 对应的边 ID
+        :param e3_weight_ids: graph_clique_size_e3_other_edge_* 的权重特征名 -> 特征第几维
+        :return: [(特征名, 特征文件路径, 由已有特征列数计算特征矩阵的函数)]
+        """
+        feature_pt = cf.get('DEFAULT', 'feature_question_pair_pt')
+        local_features = {}
+
+        def local_feature(feature_name):
+            if not local_features:
+                local_features.update(Graph.pair_local_features(graph, pairs, pair_edges))
+            return local_features[feature_name]
+
+        def node_neighbors(weight_feature_name, weight_feature_id, n_cols):
+            weights = Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id)
+            features = np.hstack([graph.neighbor_weight_stats(pairs[:, 0], pairs[:, 1], weights),
+                                  graph.neighbor_weight_stats(pairs[:, 1], pairs[:, 0], weights)])
+            # 不计数（has_size != True）时没有第 0、6 列
+            return features if 12 == n_cols else features[:, [1, 2, 3, 4, 5, 7, 8, 9, 10, 11]]
+
+        def e3_other_edge(weight_feature_name, weight_feature_id):
+            weights = Graph.load_edge_weights(cf, weight_feature_name, weight_feature_id)
+            return graph.triangle_weights(weights)[pair_edges]
+
+        extractors = []
+        if 'nostrip' == norm:
+            feature_name = 'graph_edge_max_clique_size_nostrip'
+            extractors.append((feature_name,
+                               lambda n_cols: graph.clique_stats()['edge_max'][pair_edges].reshape(-1, 1)))
+        else:
+            for feature_name in Incremental.graph_features:
+                extractors.append((feature_name,
+                                   lambda n_cols, feature_name=feature_name: local_feature(feature_name)))
+            prefix = '%s/graph_node_neighbors_' % feature_pt
+            for feature_fp in sorted(glob.glob('%s*_[0-9][0-9][0-9].%s.smat' % (prefix, rawset_name))):
+                feature_name = feature_fp[len(feature_pt) + 1:-len('.%s.smat' % rawset_name)]
+                weight_feature_name, weight_feature_id = \
+                    feature_fp[len(prefix):-len('.%s.smat' % rawset_name)].rsplit('_', 1)
+                extractors.append((feature_name, lambda n_cols, name=weight_feature_name, col=int(weight_feature_id):
+                                   node_neighbors(name, col, n_cols)))
+            prefix = '%s/graph_clique_size_e3_other_edge_' % feature_pt
+            for feature_fp in sorted(glob.glob('%s*.%s.smat' % (prefix, rawset_name))):
+                feature_name = feature_fp[len(feature_pt) + 1:-len('.%s.smat' % rawset_name)]
+                weight_feature_name = feature_fp[len(prefix):-len('.%s.smat' % rawset_name)]
+                if weight_feature_name not in e3_weight_ids:
+                    LogUtil.log('WARNING', 'skip %s features (%s), weight feature id not given, needs a full run' % (
+                        rawset_name, feature_name))
+                    continue
+                extractors.append((feature_name, lambda n_cols, name=weight_feature_name:
+                                   e3_other_edge(name, e3_weight_ids[name])))
+
+        feature_fps = [(feature_name, '%s/%s.%s.smat' % (feature_pt, feature_name, rawset_name), extract)
+                       for feature_name, extract in extractors]
+        return [(feature_name, feature_fp, extract) for feature_name, feature_fp, extract in feature_fps
+                if isfile(feature_fp) or isfile('%s.npz' % feature_fp)]
+
+    @staticmethod
+    def update_graph(cf, argv):
+        """
+        增量更新问题表与问题图，仅处理 train.csv/test.csv 中新追加的 <Q1,Q2>：
+        连通分量由并查集合并，极大团只在新增边附近重新枚举
+        已有 <Q1,Q2> 中图特征可能改变的行号写入 <devel_pt>/question_graph.<norm>.<rawset>.dirty，
+        已存在的局部图特征、graph_node_neighbors_*、graph_clique_size_e3_other_edge_*（strip）
+        及 graph_edge_max_clique_size_nostrip（nostrip）只重新抽取这些行并追加新增行；
+        带权特征要求权重特征已覆盖新增行，且已有行的权重未变
+        PageRank、HITS、最短路径等依赖全图的特征需重新抽取（Graph extract_graph_bundle）
+        :param cf: 配置
+        :param argv: [norm]，默认 strip；之后为 graph_clique_size_e3_other_edge_* 的 <权重特征名:特征第几维>
+        :return: None
+        """
+        norm = argv[0] if len(argv) > 0 else 'strip'
+        e3_weight_ids = dict((kv.rsplit(':', 1)[0], int(kv.rsplit(':', 1)[1])) for kv in argv[1:])
+        devel_pt = cf.get('DEFAULT', 'devel_pt')
+        train_fp = '%s/train.csv' % cf.get('DEFAULT', 'origin_pt')
+
+        # 增量更新问题表
+        Incremental.update_question_table(cf)
+        table = ID.load_question_table(cf, norm)
+
+        # 问题图不存在时直接构建
+        if not isfile(question_table._fp('%s/question_graph' % devel_pt, norm, 'indptr')):
+            Graph.load_graph(cf, norm)
+            return
+
+        # 增量更新问题图，边权重为 label + 1（train）或 0（test）
+        graph = Graph.load_graph(cf, norm)
+        offsets = [len(graph.pair_edges(rawset_name)) for rawset_name in ['train', 'test']]
+        new_pairs = [(rawset_name, np.asarray(table.pairs(rawset_name)[offset:]))
+                     for rawset_name, offset in zip(['train', 'test'], offsets)]
+        fin = csv.reader(open(train_fp))
+        fin.next()
+        train_weights = np.array([int(p[5]) + 1 for p in itertools.islice(fin, offsets[0], None)], dtype=np.float32)
+        test_weights = np.zeros(len(new_pairs[1][1]), dtype=np.float32)
+        graph, dirty = graph_utils._extend(graph, new_pairs, [train_weights, test_weights], len(table))
+        Graph.graphs[norm] = graph
+        Graph.edge_weights = {}
+        LogUtil.log('INFO', 'update question graph (%s) done, n_edges=%d, n_dirty_nodes=%d' % (
+            norm, graph.n_edges, np.count_nonzero(dirty)))
+
+        for (rawset_name, new_rawset_pairs), offset in zip(new_pairs, offsets):
+            pairs = np.asarray(table.pairs(rawset_name))
+            dirty_rows = np.where(dirty[pairs[:offset, 0]] | dirty[pairs[:offset, 1]])[0]
+            DataUtil.save_vector('%s/question_graph.%s.%s.dirty' % (devel_pt, norm, rawset_name),
+                                 dirty_rows.tolist(), 'w')
+            LogUtil.log('INFO', 'len(dirty)=%d, len(new)=%d (%s)' % (len(dirty_rows), len(new_rawset_pairs),
+                                                                    rawset_name))
+
+            # 更新已存在的图特征文件
+            rows = np.concatenate([dirty_rows, np.arange(offset, len(pairs))])
+            extractors = Incremental.graph_row_extractors(cf, graph, norm, rawset_name, pairs[rows],
+                                                          np.asarray(graph.pair_edges(rawset_name))[rows],
+                                                          e3_weight_ids)
+            for feature_name, feature_fp, extract in extractors:
+                features = Feature.load(feature_fp)
+                if features.shape[0] != offset:
+                    LogUtil.log('WARNING', 'skip %s features (%s), %d rows but %d pairs in graph' % (
+                        rawset_name, feature_name, features.shape[0], offset))
+                    continue
+                try:
+                    row_features = extract(features.shape[1])
+                except ValueError as e:
+                    LogUtil.log('WARNING', 'skip %s features (%s), %s' % (rawset_name, feature_name, str(e)))
+                    continue
+                if len(dirty_rows):
+                    features = features.tolil()
+                    features[dirty_rows, :] = sparse.csr_matrix(row_features[:len(dirty_rows)])
+                    features = features.tocsr()
+                if len(new_rawset_pairs):
+                    features = Feature.merge_row(features, sparse.csr_matrix(row_features[len(dirty_rows):])).tocsr()
+                Feature.save_smat(features, feature_fp)
+                Feature.save_npz(features, feature_fp)
+                LogUtil.log('INFO', 'update %s features (%s) done' % (rawset_name, feature_name))
+
+    @staticmethod
+    def run(cf, argv):
+        cmd = argv[0]
+
+        if 'extract' == cmd:
+            Incremental.extract(cf, argv[1:])
+        elif 'update_graph' == cmd:
+            Incremental.update_graph(cf, argv[1:])
+        else:
+            LogUtil.log('WARNING', 'NO CMD')
+
+
 def print_help():
     print 'extractor <conf_file_fp> -->'
     print '\tword_embedding'
+    print '\tSparseWordMatchShare'
     print '\tid'
     print '\tpostag'
     print '\tdul_num'
     print '\tmath_tag'
     print '\tbtm_vec_cos_sim_dis'
+    print '\tPowerfulWord'
     print '\tPowerfulWordV2'
     print '\tGraph'
     print '\tCount'
     print '\tDistance'
+    print '\tMinHash'
     print '\tCorr'
+    print '\tIncremental'
 
 if __name__ == "__main__":
 
@@ -5172,19 +5344,27 @@ if __name__ == "__main__":
         MathTag.run(sys.argv[3:])
     elif 'BTMVecCosSimDis' == cmd:
         BTMVecCosSimDis.run(sys.argv[3:])
+    elif 'PowerfulWord' == cmd:
+        PowerfulWord.run(cf, sys.argv[3:])
     elif 'PowerfulWordV2' == cmd:
         PowerfulWordV2.run(cf, sys.argv[3:])
+    elif 'SparseWordMatchShare' == cmd:
+        SparseWordMatchShare.run(cf, sys.argv[3:])
     elif 'Graph' == cmd:
         Graph.run(cf, sys.argv[3:])
     elif 'Count' == cmd:
         Count.run(cf, sys.argv[3:])
     elif 'Distance' == cmd:
         Distance.run(cf, sys.argv[3:])
+    elif 'MinHash' == cmd:
+        MinHash.run(cf, sys.argv[3:])
     elif 'Predict' == cmd:
         Predict.run(cf, sys.argv[3:])
     elif 'Corr' == cmd:
         Corr.run(cf, sys.argv[3:])
     elif 'NLP' == cmd:
         NLP.run(cf, sys.argv[3:])
+    elif 'Incremental' == cmd:
+        Incremental.run(cf, sys.argv[3:])
     else:
         print_help()
@@ -108,6 +108,36 @@ class Feature(object):
             Feature.save_npz(features, ft_fp)
         return features
 
+    @staticmethod
+    def load_column(ft_fp, col_index, dtype=np.float32):
+        """
+        只加载特征文件的某一列（不构造整个特征矩阵），缺失值为0
+        :param ft_fp: 特征文件路径
+        :param col_index: 列号
+        :param dtype: 返回的数据类型
+        :return: 长度为行数的向量
+        """
+        if isfile('%s.npz' % ft_fp):
+            loader = np.load('%s.npz' % ft_fp)
+            indptr = loader['indptr']
+            in_col = loader['indices'] == col_index
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))[in_col]
+            column = np.zeros(len(indptr) - 1, dtype=dtype)
+            column[rows] = loader['data'][in_col]
+        else:
+            f = open(ft_fp)
+            row_num = int(f.readline().split()[0])
+            column = np.zeros(row_num, dtype=dtype)
+            prefix = '%d:' % col_index
+            for index, line in enumerate(f):
+                for sub in line.split():
+                    if sub.startswith(prefix):
+                        column[index] = float(sub[len(prefix):])
+                        break
+            f.close()
+        LogUtil.log("INFO", "load column %d of feature file done (%s)" % (col_index, ft_fp))
+        return column
+
     @staticmethod
     def split_feature(ft_fp, n_line):
         features = Feature.load('%s' % ft_fp)
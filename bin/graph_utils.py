@@ -0,0 +1,757 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: CSR adjacency engine of the question graph
+
+Nodes are the question ids of question_table, edges the distinct unordered pairs of
+train.csv and test.csv (a pair of identical questions is a self-loop). Files written
+under a prefix (e.g. <devel_pt>/question_graph), all npy and memory-mapped on load:
+    <prefix>.<norm>.indptr              : int64, (n_nodes + 1) row offsets of the adjacency
+    <prefix>.<norm>.indices             : int32, neighbors of each node, sorted by id
+    <prefix>.<norm>.edge_ids            : int32, edge id of each adjacency entry
+    <prefix>.<norm>.edges               : int32, (n_edges, 2) end nodes (u <= v) of each edge
+    <prefix>.<norm>.label_weight        : float32, weight of each edge, label + 1 for train, 0 for test
+    <prefix>.<norm>.<rawset>.pair_edges : int32, edge id of each pair of the rawset
+Edge ids map to end nodes through edges and end nodes to edge ids through edge_index(), so
+per-edge values (weights, features) are plain arrays indexed by edge id.
+Components and maximal cliques are computed on demand and saved as:
+    <prefix>.<norm>.cc_labels           : int32, component label of each node
+    <prefix>.<norm>.clique_indptr       : int64, (n_cliques + 1) offsets of the cliques
+    <prefix>.<norm>.clique_nodes        : int32, nodes of each clique
+Pairs appended to the rawsets are added by _extend: existing edges keep their ids, components and
+cliques are updated around the new edges only, and node scores (PageRank, HITS) are dropped.
+
+"""
+
+import os
+import glob
+import heapq
+from multiprocessing import Pool
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from question_table import _fp, _replace
+
+
+def _last_values(pair_edges, values, n_edges):
+    """
+        Input: edge id of each pair, value of each pair, number of edges
+        Output: value of each edge taken from the last pair on it
+    """
+    pair_edges = np.asarray(pair_edges)
+    _, first = np.unique(pair_edges[::-1], return_index=True)
+    edge_values = np.zeros(n_edges, dtype=np.asarray(values).dtype)
+    edge_values[pair_edges[::-1][first]] = np.asarray(values)[::-1][first]
+    return edge_values
+
+
+def _rowwise_dots(adj, us, vs, block_size=100000):
+    """
+        Input: sparse matrix, aligned row ids
+        Output: adj[u] . adj[v] of each (u, v), computed in blocks of pairs
+    """
+    us = np.asarray(us)
+    vs = np.asarray(vs)
+    dots = np.zeros(len(us), dtype=adj.dtype)
+    for begin in range(0, len(us), block_size):
+        end = begin + block_size
+        dots[begin:end] = np.asarray(adj[us[begin:end]].multiply(adj[vs[begin:end]]).sum(axis=1)).ravel()
+    return dots
+
+
+def _group_stats(groups, values, n_groups):
+    """
+        Input: group id of each value, values, number of groups
+        Output: (count, mean, std, max, min) of each group, 0 for empty groups
+    """
+    order = np.argsort(groups, kind='mergesort')
+    groups = np.asarray(groups)[order]
+    values = np.asarray(values, dtype=np.float64)[order]
+    count = np.bincount(groups, minlength=n_groups)
+    mean = np.bincount(groups, weights=values, minlength=n_groups) / np.maximum(count, 1)
+    std = np.sqrt(np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=n_groups) /
+                  np.maximum(count, 1))
+    max_v = np.zeros(n_groups)
+    min_v = np.zeros(n_groups)
+    if len(values) > 0:
+        starts = np.concatenate([[0], np.where(np.diff(groups) != 0)[0] + 1])
+        max_v[groups[starts]] = np.maximum.reduceat(values, starts)
+        min_v[groups[starts]] = np.minimum.reduceat(values, starts)
+    return count, mean, std, max_v, min_v
+
+
+def _degeneracy_order(nbrs):
+    """
+        Input: {node: set of neighbors}
+        Output: nodes in smallest-last order, each node has at most degeneracy later neighbors
+    """
+    degree = dict((u, len(vs)) for u, vs in nbrs.items())
+    buckets = [set() for _ in range(max(degree.values()) + 1 if degree else 0)]
+    for u, d in degree.items():
+        buckets[d].add(u)
+    order = []
+    done = set()
+    d = 0
+    for _ in range(len(degree)):
+        # removing a node lowers the degrees of its neighbors by one
+        d = max(d - 1, 0)
+        while not buckets[d]:
+            d += 1
+        u = buckets[d].pop()
+        order.append(u)
+        done.add(u)
+        for v in nbrs[u]:
+            if v not in done:
+                buckets[degree[v]].remove(v)
+                degree[v] -= 1
+                buckets[degree[v]].add(v)
+    return order
+
+
+def _bron_kerbosch(nbrs, r, p, x, cliques):
+    if not p and not x:
+        cliques.append(r)
+        return
+    pivot = max(p | x, key=lambda u: len(p & nbrs[u]))
+    for v in list(p - nbrs[pivot]):
+        _bron_kerbosch(nbrs, r + [v], p & nbrs[v], x & nbrs[v], cliques)
+        p.remove(v)
+        x.add(v)
+
+
+def _maximal_cliques(graph):
+    """
+        Input: QuestionGraph
+        Output: (clique_indptr, clique_nodes) of all maximal cliques, self-loops ignored (as networkx)
+        An edge in no triangle is a maximal clique by itself and a node without other neighbors
+        is a clique of size 1. Larger cliques only use edges in triangles, so they are enumerated
+        by Bron-Kerbosch with pivoting on that sparse subgraph, in degeneracy order.
+    """
+    edges = np.asarray(graph.edges)
+    loops = edges[:, 0] == edges[:, 1]
+    adj = graph.adjacency()
+    adj = (adj - sparse.diags(adj.diagonal())).tocsr()
+    adj.eliminate_zeros()
+    triangles = np.zeros(len(edges), dtype=np.int64)
+    triangles[~loops] = _rowwise_dots(adj, edges[~loops, 0], edges[~loops, 1])
+
+    nbrs = {}
+    for u, v in edges[triangles > 0].tolist():
+        nbrs.setdefault(u, set()).add(v)
+        nbrs.setdefault(v, set()).add(u)
+    order = _degeneracy_order(nbrs)
+    position = dict((u, index) for index, u in enumerate(order))
+    cliques = []
+    for u in order:
+        later = set(v for v in nbrs[u] if position[v] > position[u])
+        _bron_kerbosch(nbrs, [u], later, nbrs[u] - later, cliques)
+
+    cliques.extend(edges[(triangles == 0) & ~loops].tolist())
+    cliques.extend([[u] for u in np.where(np.diff(adj.indptr) == 0)[0].tolist()])
+    indptr = np.zeros(len(cliques) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(clique) for clique in cliques])
+    nodes = np.array([u for clique in cliques for u in clique], dtype=np.int32)
+    return indptr, nodes
+
+
+def _bidirectional_dijkstra(indptr, indices, edge_ids, edge_weights, source, target, masked_edge):
+    """
+        Input: CSR arrays, weight of each edge, end nodes, id of the edge that must not be used
+        Output: length of the shortest path between source and target, -1 if there is none
+        Searches grow from both ends and stop once the two smallest frontier distances add up
+        to the best path found.
+    """
+    if source == target:
+        return 0.
+    dists = [{source: 0.}, {target: 0.}]
+    done = [set(), set()]
+    heaps = [[(0., source)], [(0., target)]]
+    best = None
+    while heaps[0] and heaps[1]:
+        if best is not None and heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        d, u = heapq.heappop(heaps[side])
+        if u in done[side] or d > dists[side][u]:
+            continue
+        done[side].add(u)
+        begin, end = indptr[u], indptr[u + 1]
+        eids = edge_ids[begin:end]
+        for v, e, w in zip(indices[begin:end].tolist(), eids.tolist(), edge_weights[eids].tolist()):
+            if e == masked_edge or v in done[side]:
+                continue
+            nd = d + w
+            if v not in dists[side] or nd < dists[side][v]:
+                dists[side][v] = nd
+                heapq.heappush(heaps[side], (nd, v))
+            if v in dists[1 - side]:
+                if best is None or nd + dists[1 - side][v] < best:
+                    best = nd + dists[1 - side][v]
+    return -1 if best is None else best
+
+
+def _hop_bounded_dists(indptr, indices, edge_ids, edge_weights, source, masked_edge, max_hops):
+    """
+        Input: CSR arrays, weight of each edge, start node, id of the edge that must not be used,
+               maximal number of edges of a path
+        Output: {node: length of the shortest path from source with at most max_hops edges}
+        Bellman-Ford in layers: layer i only relaxes the nodes improved by layer i - 1, from their
+        distances of layer i - 1, so the distances of layer i use at most i edges.
+    """
+    dists = {source: 0.}
+    frontier = [source]
+    for _ in range(max_hops):
+        last = dict((u, dists[u]) for u in frontier)
+        improved = set()
+        for u in frontier:
+            begin, end = indptr[u], indptr[u + 1]
+            eids = edge_ids[begin:end]
+            for v, e, w in zip(indices[begin:end].tolist(), eids.tolist(), edge_weights[eids].tolist()):
+                if e == masked_edge:
+                    continue
+                nd = last[u] + w
+                if v not in dists or nd < dists[v]:
+                    dists[v] = nd
+                    improved.add(v)
+        if not improved:
+            break
+        frontier = list(improved)
+    return dists
+
+
+def _hop_bounded_path(indptr, indices, edge_ids, edge_weights, source, target, masked_edge, max_hops):
+    """
+        Input: CSR arrays, weight of each edge, end nodes, id of the edge that must not be used,
+               maximal number of edges of a path
+        Output: length of the shortest path between source and target with at most max_hops edges, -1 if none
+        A path of at most max_hops edges splits at some node into at most ceil(max_hops / 2) edges
+        from source and at most floor(max_hops / 2) edges from target.
+    """
+    if source == target:
+        return 0.
+    dists = _hop_bounded_dists(indptr, indices, edge_ids, edge_weights, source, masked_edge, (max_hops + 1) // 2)
+    back_dists = _hop_bounded_dists(indptr, indices, edge_ids, edge_weights, target, masked_edge, max_hops // 2)
+    lengths = [d + back_dists[u] for u, d in dists.items() if u in back_dists]
+    return min(lengths) if lengths else -1
+
+
+# graph of the shortest path workers, set by _init_shortest_paths
+_sp_args = None
+
+
+def _init_shortest_paths(prefix, norm, edge_weights, max_hops):
+    global _sp_args
+    graph = QuestionGraph(prefix, norm)
+    _sp_args = (graph.indptr, graph.indices, graph.edge_ids, np.asarray(edge_weights, dtype=np.float64), max_hops)
+
+
+def _shortest_paths_block(block):
+    indptr, indices, edge_ids, edge_weights, max_hops = _sp_args
+    if max_hops > 0:
+        return [_hop_bounded_path(indptr, indices, edge_ids, edge_weights, u, v, e, max_hops) for u, v, e in block]
+    return [_bidirectional_dijkstra(indptr, indices, edge_ids, edge_weights, u, v, e) for u, v, e in block]
+
+
+def _save_adjacency(edges, n_nodes, prefix, norm):
+    """
+        Input: (n_edges, 2) end nodes (u <= v) of each edge by id, number of nodes, prefix of the graph files,
+               norm of the question table
+        Output: None, writes indptr, indices, edge_ids and edges
+    """
+    # every edge appears twice in the adjacency, a self-loop once
+    loops = edges[:, 0] == edges[:, 1]
+    eids = np.arange(len(edges), dtype=np.int32)
+    rows = np.concatenate([edges[:, 0], edges[~loops, 1]])
+    cols = np.concatenate([edges[:, 1], edges[~loops, 0]])
+    eids = np.concatenate([eids, eids[~loops]])
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=n_nodes))
+
+    _replace(_fp(prefix, norm, 'indptr'), indptr)
+    _replace(_fp(prefix, norm, 'indices'), cols[order].astype(np.int32))
+    _replace(_fp(prefix, norm, 'edge_ids'), eids[order])
+    _replace(_fp(prefix, norm, 'edges'), edges.astype(np.int32))
+
+
+def _build(pairs, pair_weights, n_nodes, prefix, norm):
+    """
+        Input: [(rawset name, (n_pairs, 2) ids of questions)], [weight of each pair] aligned with them,
+               number of nodes, prefix of the graph files, norm of the question table
+        Output: number of edges
+    """
+    all_pairs = np.vstack([p for _, p in pairs]).astype(np.int64)
+    lo = np.minimum(all_pairs[:, 0], all_pairs[:, 1])
+    hi = np.maximum(all_pairs[:, 0], all_pairs[:, 1])
+    keys, pair_edges = np.unique(lo * n_nodes + hi, return_inverse=True)
+    edges = np.column_stack([keys // n_nodes, keys % n_nodes]).astype(np.int32)
+    n_edges = len(edges)
+
+    _save_adjacency(edges, n_nodes, prefix, norm)
+    np.save(open(_fp(prefix, norm, 'label_weight'), 'wb'),
+            _last_values(pair_edges, np.concatenate(pair_weights).astype(np.float32), n_edges))
+    begin = 0
+    for rawset_name, p in pairs:
+        np.save(open(_fp(prefix, norm, '%s.pair_edges' % rawset_name), 'wb'),
+                pair_edges[begin:begin + len(p)].astype(np.int32))
+        begin += len(p)
+    return n_edges
+
+
+def _merge_components(labels, n_nodes, edges):
+    """
+        Input: component label of each old node, number of nodes, (n, 2) new edges
+        Output: component label of each node with the new edges added, new nodes start alone
+        Union-find over the labels met by the new edges; labels are not renumbered, so some are unused.
+    """
+    n_labels = int(labels.max()) + 1 if len(labels) else 0
+    node_labels = np.concatenate([labels, n_labels + np.arange(n_nodes - len(labels))])
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for u, v in np.asarray(edges).tolist():
+        ru = find(int(node_labels[u]))
+        rv = find(int(node_labels[v]))
+        if ru != rv:
+            parent[max(ru, rv)] = min(ru, rv)
+    roots = np.arange(n_labels + n_nodes - len(labels))
+    for x in list(parent.keys()):
+        roots[x] = find(x)
+    return roots[node_labels].astype(np.int32)
+
+
+def _update_cliques(graph, indptr, nodes, new_edges, n_old_nodes):
+    """
+        Input: QuestionGraph with the new edges, (clique_indptr, clique_nodes) of the maximal cliques before them,
+               (n, 2) new edges, number of nodes before them
+        Output: (clique_indptr, clique_nodes) of the maximal cliques now, nodes of the cliques added or removed
+        A maximal clique containing a new edge (u, v) lies in {u, v} and their common neighbors, so it is
+        enumerated by Bron-Kerbosch there. An old maximal clique is no longer maximal only if it is inside one
+        of those; the other old cliques are kept.
+    """
+    new_edges = np.asarray(new_edges)
+    new_edges = new_edges[new_edges[:, 0] != new_edges[:, 1]]
+    found = set()
+    for u, v in new_edges.tolist():
+        p = set(graph.neighbors(u).tolist()) & set(graph.neighbors(v).tolist())
+        p -= set([u, v])
+        nbrs = dict((w, (set(graph.neighbors(w).tolist()) & p) - set([w])) for w in p)
+        cliques = []
+        _bron_kerbosch(nbrs, [u, v], p, set(), cliques)
+        found.update(tuple(sorted(clique)) for clique in cliques)
+    found = sorted(found)
+
+    # new nodes with no other neighbors than themselves are cliques of size 1
+    edges = np.asarray(graph.edges)
+    loops = edges[:, 0] == edges[:, 1]
+    degree = graph.degree() - np.bincount(edges[loops, 0], minlength=graph.n_nodes)
+    found.extend((u,) for u in (n_old_nodes + np.where(degree[n_old_nodes:] == 0)[0]).tolist())
+
+    by_node = {}
+    for clique in found:
+        for u in clique:
+            by_node.setdefault(u, []).append(set(clique))
+    sizes = np.diff(indptr)
+    owners = np.repeat(np.arange(len(sizes)), sizes)
+    keep = np.ones(len(sizes), dtype=bool)
+    for index in np.unique(owners[np.in1d(nodes, list(by_node))]).tolist():
+        clique = set(nodes[indptr[index]:indptr[index + 1]].tolist())
+        if any(clique <= c for c in by_node.get(min(clique), [])):
+            keep[index] = False
+
+    changed = np.unique(np.concatenate([np.array(list(by_node), dtype=np.int64),
+                                        np.asarray(nodes)[~keep[owners]].astype(np.int64)]))
+    new_indptr = np.zeros(keep.sum() + len(found) + 1, dtype=np.int64)
+    new_indptr[1:] = np.cumsum(np.concatenate([sizes[keep], [len(clique) for clique in found]]))
+    new_nodes = np.concatenate([np.asarray(nodes)[keep[owners]],
+                                np.array([u for clique in found for u in clique], dtype=np.int32)])
+    return new_indptr, new_nodes.astype(np.int32), changed
+
+
+def _extend(graph, pairs, pair_weights, n_nodes):
+    """
+        Input: QuestionGraph, [(rawset name, (n_pairs, 2) ids of questions)] appended to the rawsets,
+               [weight of each new pair] aligned with them, number of nodes now
+        Output: (updated QuestionGraph, mask of the nodes whose component, edges or cliques changed)
+        Existing edges keep their ids and new edges take the next ones; the last pair on an edge gives its
+        label weight. Saved components are merged by union-find and saved cliques only re-enumerated around
+        the new edges. Saved node scores depend on the whole graph and are removed.
+    """
+    prefix, norm = graph.prefix, graph.norm
+    n_old_nodes = graph.n_nodes
+    old_edges = np.array(graph.edges, dtype=np.int64)
+    labels, old_sizes = graph.components()
+    has_cliques = os.path.isfile(_fp(prefix, norm, 'clique_indptr'))
+    if has_cliques:
+        clique_indptr, clique_nodes = [np.array(a) for a in graph.cliques()]
+
+    all_pairs = np.vstack([p for _, p in pairs]).astype(np.int64)
+    lo = np.minimum(all_pairs[:, 0], all_pairs[:, 1])
+    hi = np.maximum(all_pairs[:, 0], all_pairs[:, 1])
+    keys = lo * n_nodes + hi
+    old_keys = old_edges[:, 0] * n_nodes + old_edges[:, 1]
+    order = np.argsort(old_keys)
+    pos = np.minimum(np.searchsorted(old_keys[order], keys), max(len(order) - 1, 0))
+    known = old_keys[order][pos] == keys if len(order) else np.zeros(len(keys), dtype=bool)
+    pair_edges = np.zeros(len(keys), dtype=np.int64)
+    pair_edges[known] = order[pos[known]]
+    new_keys, inverse = np.unique(keys[~known], return_inverse=True)
+    pair_edges[~known] = len(old_edges) + inverse
+    new_edges = np.column_stack([new_keys // n_nodes, new_keys % n_nodes])
+    edges = np.vstack([old_edges, new_edges])
+
+    _save_adjacency(edges, n_nodes, prefix, norm)
+    # as in _build, the last pair wins with the rawsets in the given order, so a new pair does not
+    # override the old pairs of a later rawset
+    touched = np.unique(pair_edges)
+    label_weight = np.concatenate([graph.label_weight, np.zeros(len(new_edges), dtype=np.float32)])
+    begin = 0
+    for index, (rawset_name, p) in enumerate(pairs):
+        eids = pair_edges[begin:begin + len(p)]
+        later = np.zeros(len(edges), dtype=bool)
+        for later_rawset_name, _ in pairs[index + 1:]:
+            later[graph.pair_edges(later_rawset_name)] = True
+        targets = np.unique(eids)
+        targets = targets[~later[targets]]
+        label_weight[targets] = _last_values(eids, np.asarray(pair_weights[index], dtype=np.float32),
+                                             len(edges))[targets]
+        begin += len(p)
+    _replace(_fp(prefix, norm, 'label_weight'), label_weight)
+    begin = 0
+    for rawset_name, p in pairs:
+        _replace(_fp(prefix, norm, '%s.pair_edges' % rawset_name),
+                 np.concatenate([graph.pair_edges(rawset_name), pair_edges[begin:begin + len(p)]]).astype(np.int32))
+        begin += len(p)
+    for fp in glob.glob(_fp(prefix, norm, 'scores.*')):
+        os.remove(fp)
+
+    new_labels = _merge_components(labels, n_nodes, new_edges)
+    _replace(_fp(prefix, norm, 'cc_labels'), new_labels)
+    new_sizes = np.bincount(new_labels)
+    dirty = np.ones(n_nodes, dtype=bool)
+    dirty[:n_old_nodes] = new_sizes[new_labels[:n_old_nodes]] != old_sizes[labels]
+    dirty[edges[touched].ravel()] = True
+
+    updated = QuestionGraph(prefix, norm)
+    if has_cliques:
+        clique_indptr, clique_nodes, changed = _update_cliques(updated, clique_indptr, clique_nodes,
+                                                               new_edges, n_old_nodes)
+        _replace(_fp(prefix, norm, 'clique_nodes'), clique_nodes)
+        _replace(_fp(prefix, norm, 'clique_indptr'), clique_indptr)
+        dirty[changed] = True
+    return updated, dirty
+
+
+class QuestionGraph(object):
+    """
+    Read-only undirected graph in CSR layout
+    """
+
+    def __init__(self, prefix, norm='strip'):
+        self.prefix = prefix
+        self.norm = norm
+        self.indptr = np.load(_fp(prefix, norm, 'indptr'), mmap_mode='r')
+        self.indices = np.load(_fp(prefix, norm, 'indices'), mmap_mode='r')
+        self.edge_ids = np.load(_fp(prefix, norm, 'edge_ids'), mmap_mode='r')
+        self.edges = np.load(_fp(prefix, norm, 'edges'), mmap_mode='r')
+        self.label_weight = np.load(_fp(prefix, norm, 'label_weight'), mmap_mode='r')
+        self.cc_labels = None
+        self.keys = None
+        self.cliques_stats = None
+
+    @property
+    def n_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self):
+        return len(self.edges)
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def neighbors(self, u):
+        return self.indices[self.indptr[u]:self.indptr[u + 1]]
+
+    def pair_edges(self, rawset_name):
+        """
+            Output: memory-mapped int32 edge id of each pair of the rawset
+        """
+        return np.load(_fp(self.prefix, self.norm, '%s.pair_edges' % rawset_name), mmap_mode='r')
+
+    def edge_values(self, pair_values):
+        """
+            Input: [(rawset name, value of each pair)]
+            Output: value of each edge taken from the last pair on it, rawsets in the given order
+        """
+        for rawset_name, values in pair_values:
+            if len(values) != len(self.pair_edges(rawset_name)):
+                raise ValueError('%d values for %d pairs of %s' % (len(values), len(self.pair_edges(rawset_name)),
+                                                                   rawset_name))
+        pair_edges = np.concatenate([self.pair_edges(rawset_name) for rawset_name, _ in pair_values])
+        return _last_values(pair_edges, np.concatenate([v for _, v in pair_values]), self.n_edges)
+
+    def adjacency(self, edge_weights=None):
+        """
+            Input: weight of each edge, None for unweighted
+            Output: (n_nodes, n_nodes) symmetric scipy CSR adjacency matrix
+        """
+        if edge_weights is None:
+            data = np.ones(len(self.indices), dtype=np.float64)
+        else:
+            data = np.asarray(edge_weights, dtype=np.float64)[self.edge_ids]
+        return sparse.csr_matrix((data, np.asarray(self.indices), np.asarray(self.indptr)),
+                                 shape=(self.n_nodes, self.n_nodes))
+
+    def components(self):
+        """
+            Output: (component label of each node, size of each component), computed once and saved
+        """
+        if self.cc_labels is None:
+            fp = _fp(self.prefix, self.norm, 'cc_labels')
+            if not os.path.isfile(fp):
+                _, labels = csgraph.connected_components(self.adjacency(), directed=False)
+                np.save(open(fp, 'wb'), labels.astype(np.int32))
+            self.cc_labels = np.load(fp)
+        return self.cc_labels, np.bincount(self.cc_labels)
+
+    def common_neighbors(self, us, vs, block_size=100000):
+        """
+            Input: aligned node ids
+            Output: number of common neighbors of each (u, v), row-wise A[u] . A[v] in blocks of pairs
+        """
+        return _rowwise_dots(self.adjacency(), us, vs, block_size).astype(np.int64)
+
+    def entry_index(self, us, vs):
+        """
+            Input: aligned node ids, (u, v) must be edges
+            Output: position of v in the adjacency of u
+        """
+        if self.keys is None:
+            rows = np.repeat(np.arange(self.n_nodes, dtype=np.int64), self.degree())
+            self.keys = rows * self.n_nodes + self.indices
+        return np.searchsorted(self.keys, np.asarray(us, dtype=np.int64) * self.n_nodes + np.asarray(vs))
+
+    def edge_index(self, us, vs):
+        """
+            Input: aligned node ids, (u, v) must be edges
+            Output: edge id of each (u, v)
+        """
+        return np.asarray(self.edge_ids)[self.entry_index(us, vs)]
+
+    def cliques(self):
+        """
+            Output: (clique_indptr, clique_nodes) of all maximal cliques, computed once and saved
+        """
+        indptr_fp = _fp(self.prefix, self.norm, 'clique_indptr')
+        nodes_fp = _fp(self.prefix, self.norm, 'clique_nodes')
+        if not (os.path.isfile(indptr_fp) and os.path.isfile(nodes_fp)):
+            indptr, nodes = _maximal_cliques(self)
+            np.save(open(nodes_fp, 'wb'), nodes)
+            np.save(open(indptr_fp, 'wb'), indptr)
+        return np.load(indptr_fp, mmap_mode='r'), np.load(nodes_fp, mmap_mode='r')
+
+    def clique_groups(self):
+        """
+            Output: [(size, (n_cliques, size) nodes)] of the maximal cliques grouped by size
+        """
+        indptr, nodes = self.cliques()
+        sizes = np.diff(indptr)
+        return [(k, np.asarray(nodes)[indptr[np.where(sizes == k)[0]][:, np.newaxis] + np.arange(k)])
+                for k in np.unique(sizes).tolist()]
+
+    def clique_stats(self):
+        """
+            Output: {node_max, node_min, node_num, edge_max, edge_min, edge_num}, max/min size and number of
+                    the maximal cliques containing each node/edge, computed once
+            A self-loop gets the values of its node, as networkx finds cliques without self-loops.
+        """
+        if self.cliques_stats is None:
+            n_nodes = self.n_nodes
+            n_edges = self.n_edges
+            stats = {
+                'node_max': np.zeros(n_nodes, dtype=np.int64),
+                'node_min': np.zeros(n_nodes, dtype=np.int64),
+                'node_num': np.zeros(n_nodes, dtype=np.int64),
+                'edge_max': np.zeros(n_edges, dtype=np.int64),
+                'edge_min': np.zeros(n_edges, dtype=np.int64),
+                'edge_num': np.zeros(n_edges, dtype=np.int64),
+            }
+            for k, members in reversed(self.clique_groups()):
+                # larger cliques first, so the smallest size is written last
+                counts = {'node': np.bincount(members.ravel(), minlength=n_nodes)}
+                if k > 1:
+                    i, j = np.triu_indices(k, 1)
+                    eids = self.edge_index(members[:, i].ravel(), members[:, j].ravel())
+                    counts['edge'] = np.bincount(eids, minlength=n_edges)
+                for name, count in counts.items():
+                    stats['%s_num' % name] += count
+                    stats['%s_max' % name][(stats['%s_max' % name] == 0) & (count > 0)] = k
+                    stats['%s_min' % name][count > 0] = k
+            loops = np.where(self.edges[:, 0] == self.edges[:, 1])[0]
+            for name in ['max', 'min', 'num']:
+                stats['edge_%s' % name][loops] = stats['node_%s' % name][self.edges[loops, 0]]
+            self.cliques_stats = stats
+        return self.cliques_stats
+
+    def triangle_weights(self, edge_weights):
+        """
+            Input: weight of each edge
+            Output: (n_edges, 9) [number of triangles, mean/std/max/min of |w1 - w2|, mean/std/max/min of w1 + w2]
+                    over the maximal 3-cliques (u, v, w) of each edge (u, v), w1 = weight(u, w), w2 = weight(v, w);
+                    edges in no maximal 3-clique get [0, -1, 0, -1, -1, -1, 0, -1, -1]
+        """
+        edge_weights = np.asarray(edge_weights, dtype=np.float64)
+        members = dict(self.clique_groups()).get(3, np.zeros((0, 3), dtype=np.int32))
+        eids = []
+        w1 = []
+        w2 = []
+        for a, b, c in [(0, 1, 2), (0, 2, 1), (1, 2, 0)]:
+            eids.append(self.edge_index(members[:, a], members[:, b]))
+            w1.append(edge_weights[self.edge_index(members[:, a], members[:, c])])
+            w2.append(edge_weights[self.edge_index(members[:, b], members[:, c])])
+        eids = np.concatenate(eids)
+        w1 = np.concatenate(w1)
+        w2 = np.concatenate(w2)
+        features = np.tile([0., -1., 0., -1., -1., -1., 0., -1., -1.], (self.n_edges, 1))
+        sub = _group_stats(eids, np.abs(w1 - w2), self.n_edges)
+        add = _group_stats(eids, w1 + w2, self.n_edges)
+        valid = (sub[0] > 0) & (self.clique_stats()['edge_max'] == 3)
+        features[valid] = np.column_stack(sub + add[1:])[valid]
+        return features
+
+    def shortest_paths(self, us, vs, edge_weights, n_jobs=1, max_hops=0, chunk_size=1000):
+        """
+            Input: aligned end nodes of edges, weight of each edge, number of processes,
+                   maximal number of edges of a path (0 for no limit)
+            Output: length of the shortest path of each (u, v) without their own edge, -1 if there is none
+            The graph is never modified, the edge is masked by id, so pairs are searched in parallel.
+        """
+        us = np.asarray(us).tolist()
+        vs = np.asarray(vs).tolist()
+        tasks = zip(us, vs, self.edge_index(us, vs).tolist())
+        blocks = [tasks[begin:begin + chunk_size] for begin in range(0, len(tasks), chunk_size)]
+        if 1 >= n_jobs:
+            _init_shortest_paths(self.prefix, self.norm, edge_weights, max_hops)
+            results = [_shortest_paths_block(block) for block in blocks]
+        else:
+            pool = Pool(n_jobs, _init_shortest_paths, (self.prefix, self.norm, edge_weights, max_hops))
+            results = pool.map(_shortest_paths_block, blocks)
+            pool.close()
+            pool.join()
+        return np.array([length for result in results for length in result], dtype=np.float64)
+
+    def pagerank(self, alpha=0.85, max_iter=100, tol=1e-6, edge_weights=None):
+        """
+            Input: damping factor, maximal number of iterations, tolerance, weight of each edge (None for unweighted)
+            Output: PageRank of each node, as networkx.pagerank with a uniform start and personalization
+            Power iteration x <- alpha * (A (x / d) + dangling / n) + (1 - alpha) / n, stopped once the l1 change
+            is below n * tol; the last iterate is returned if max_iter is reached first.
+        """
+        adj = self.adjacency(edge_weights)
+        n = self.n_nodes
+        out_degree = np.asarray(adj.sum(axis=1)).ravel()
+        dangling = out_degree == 0
+        inv_degree = np.where(dangling, 0., 1. / np.where(dangling, 1., out_degree))
+        x = np.full(n, 1. / n)
+        for _ in range(max_iter):
+            x_last = x
+            x = alpha * (adj.T.dot(x_last * inv_degree) + x_last[dangling].sum() / n) + (1. - alpha) / n
+            if np.abs(x - x_last).sum() < n * tol:
+                break
+        return x
+
+    def hits(self, max_iter=100, tol=1e-8):
+        """
+            Input: maximal number of iterations, tolerance
+            Output: (hubs, authorities) of each node, as the power iteration of networkx.hits, both sum to 1
+        """
+        adj = self.adjacency()
+        h = np.full(self.n_nodes, 1. / self.n_nodes)
+        a = h
+        for _ in range(max_iter):
+            h_last = h
+            a = adj.T.dot(h_last)
+            h = adj.dot(a)
+            h /= h.max()
+            a /= a.max()
+            if np.abs(h - h_last).sum() < tol:
+                break
+        return h / h.sum(), a / a.sum()
+
+    def node_scores(self, name, compute):
+        """
+            Input: name of the scores, function computing the (n_nodes,) or (n_nodes, k) scores
+            Output: the scores, computed once and saved as <prefix>.<norm>.scores.<name>
+        """
+        fp = _fp(self.prefix, self.norm, 'scores.%s' % name)
+        if not os.path.isfile(fp):
+            np.save(open(fp, 'wb'), compute())
+        return np.load(fp)
+
+    def remove_scores(self, pattern, keep=None):
+        """
+            Input: glob pattern of score names, name of the scores to keep
+            Output: None, the other saved scores matching the pattern are removed
+        """
+        for fp in glob.glob(_fp(self.prefix, self.norm, 'scores.%s' % pattern)):
+            if fp != _fp(self.prefix, self.norm, 'scores.%s' % keep):
+                os.remove(fp)
+
+    def neighbor_weight_stats(self, us, vs, edge_weights):
+        """
+            Input: aligned node ids, (u, v) must be edges, weight of each edge
+            Output: (n_pairs, 6) [size, mean, std, max, min, median] of the weights of the edges of u,
+                    without self-loops and without the edge (u, v); [0, -1, 0, -1, -1, -1] if none is left
+            Weights of every node are sorted once; a pair only removes its own edge from the per-node
+            sums and shifts the max/min/median positions past its rank.
+        """
+        us = np.asarray(us, dtype=np.int64)
+        vs = np.asarray(vs, dtype=np.int64)
+        rows = np.repeat(np.arange(self.n_nodes, dtype=np.int64), self.degree())
+        weights = np.asarray(edge_weights, dtype=np.float64)[self.edge_ids]
+        valid = np.asarray(self.indices) != rows
+        order = np.lexsort((weights, rows))
+        order = order[valid[order]]
+        sorted_weights = weights[order]
+        counts = np.bincount(rows[order], minlength=self.n_nodes)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        ranks = np.zeros(len(weights), dtype=np.int64)
+        ranks[order] = np.arange(len(order)) - starts[rows[order]]
+        sums = np.bincount(rows[order], weights=sorted_weights, minlength=self.n_nodes)
+        # deviations from the mean of each node keep the variance of the remaining weights accurate
+        devs = sorted_weights - (sums / np.maximum(counts, 1))[rows[order]]
+        dev_sums = np.bincount(rows[order], weights=devs, minlength=self.n_nodes)
+        dev_sqsums = np.bincount(rows[order], weights=devs ** 2, minlength=self.n_nodes)
+
+        pos = self.entry_index(us, vs)
+        excluded = (us != vs).astype(np.int64)
+        w = np.where(excluded > 0, weights[pos], 0.)
+        rank = np.where(excluded > 0, ranks[pos], -1)
+        size = counts[us] - excluded
+        m = np.maximum(size, 1)
+        mean = (sums[us] - w) / m
+        dev = np.where(excluded > 0, w - sums[us] / np.maximum(counts[us], 1), 0.)
+        dev_mean = (dev_sums[us] - dev) / m
+        std = np.sqrt(np.maximum((dev_sqsums[us] - dev ** 2) / m - dev_mean ** 2, 0.))
+
+        def nth(i):
+            # i-th smallest of the remaining weights
+            i = i + ((excluded > 0) & (i >= rank))
+            return sorted_weights[np.minimum(starts[us] + i, max(len(sorted_weights) - 1, 0))]
+
+        max_v = nth(size - 1)
+        min_v = nth(np.zeros_like(size))
+        median = (nth((size - 1) // 2) + nth(size // 2)) / 2.
+        std[max_v == min_v] = 0.
+        features = np.column_stack([size, mean, std, max_v, min_v, median]).astype(np.float64)
+        features[size == 0] = [0., -1., 0., -1., -1., -1.]
+        return features
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: utils for MinHash signatures and LSH banding
+
+A document is a set of int64 hashes (e.g. ngram_utils._ngram_hashes). Its signature
+keeps, for each of num_perm universal hash functions, the minimal 32-bit hash value
+over the set, so the Jaccard coefficient of two sets is estimated in O(num_perm).
+Signatures are split into bands; documents sharing a whole band fall into the same
+bucket and become candidate pairs.
+
+"""
+
+import itertools
+
+import numpy as np
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# signature of an empty set
+_EMPTY_VALUE = np.uint32((1 << 32) - 1)
+
+
+def _hash_funcs(num_perm, seed=1):
+    """
+        Input: number of hash functions and random seed
+        Output: (a, b) of the hash functions (a * x + b) % _MERSENNE_PRIME & _MAX_HASH
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 32, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm).astype(np.uint64)
+    return a, b
+
+
+def _minhash_signatures(hash_sets, num_perm=128, seed=1, block_size=200000):
+    """
+        Input: list of int64 hash arrays, one per document
+        Output: (len(hash_sets), num_perm) uint32 signatures, rows of empty sets are all _EMPTY_VALUE
+        Hashes are folded into 32 bits so that a * x + b never overflows uint64.
+        Documents are processed in blocks of about block_size hashes.
+    """
+    a, b = _hash_funcs(num_perm, seed)
+    sigs = np.full((len(hash_sets), num_perm), _EMPTY_VALUE, dtype=np.uint32)
+    lens = np.array([len(h) for h in hash_sets], dtype=np.int64)
+    begin = 0
+    while begin < len(hash_sets):
+        end = begin + 1
+        total = lens[begin]
+        while end < len(hash_sets) and total + lens[end] <= block_size:
+            total += lens[end]
+            end += 1
+        docs = np.where(lens[begin:end] > 0)[0] + begin
+        if len(docs) > 0:
+            vals = np.concatenate([hash_sets[doc] for doc in docs]).astype(np.int64).view(np.uint64)
+            vals = (vals ^ (vals >> np.uint64(32))) & _MAX_HASH
+            hvs = ((vals[:, np.newaxis] * a + b) % _MERSENNE_PRIME) & _MAX_HASH
+            starts = np.concatenate([[0], np.cumsum(lens[docs])[:-1]])
+            sigs[docs] = np.minimum.reduceat(hvs, starts, axis=0).astype(np.uint32)
+        begin = end
+    return sigs
+
+
+def _is_empty(sigs):
+    return (sigs == _EMPTY_VALUE).all(axis=-1)
+
+
+def _approx_jaccards(sigs1, sigs2):
+    """
+        Input: two aligned arrays of signatures (or two single signatures)
+        Output: estimated Jaccard coefficient of each pair, 0 if either set is empty
+    """
+    sims = (sigs1 == sigs2).mean(axis=-1)
+    return np.where(_is_empty(sigs1) | _is_empty(sigs2), 0., sims)
+
+
+class LSHIndex(object):
+    """
+    Banded LSH index over MinHash signatures, rows of empty sets are not indexed
+    """
+
+    def __init__(self, sigs, bands):
+        assert 0 == sigs.shape[1] % bands, 'num_perm must be a multiple of bands'
+        self.sigs = sigs
+        self.bands = bands
+        self.rows = sigs.shape[1] / bands
+        self.mults = _hash_funcs(self.rows, seed=bands)[0]
+        self.keys = []
+        self.indptr = []
+        self.members = []
+        docs = np.where(~_is_empty(sigs))[0]
+        for band in range(bands):
+            keys, inv = np.unique(self._band_keys(sigs[docs], band), return_inverse=True)
+            self.keys.append(keys)
+            self.indptr.append(np.concatenate([[0], np.cumsum(np.bincount(inv, minlength=len(keys)))]))
+            self.members.append(docs[np.argsort(inv, kind='mergesort')])
+
+    def _band_keys(self, sigs, band):
+        # uint64 arithmetic wraps around, collisions only add false candidates
+        block = sigs[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64)
+        return (block * self.mults).sum(axis=1, dtype=np.uint64)
+
+    def _bucket(self, band, key):
+        pos = np.searchsorted(self.keys[band], key)
+        if pos < len(self.keys[band]) and self.keys[band][pos] == key:
+            return self.members[band][self.indptr[band][pos]:self.indptr[band][pos + 1]]
+        return []
+
+    def query(self, sig, threshold=0.):
+        """
+            Input: signature of a document and the minimal estimated Jaccard coefficient
+            Output: list of (row, estimated Jaccard) of indexed documents sharing a band with it
+        """
+        if _is_empty(sig):
+            return []
+        sig = sig.reshape(1, -1)
+        candidates = set()
+        for band in range(self.bands):
+            candidates.update(self._bucket(band, self._band_keys(sig, band)[0]))
+        candidates = np.array(sorted(candidates), dtype=np.int64)
+        if 0 == len(candidates):
+            return []
+        sims = _approx_jaccards(self.sigs[candidates], sig)
+        return [(row, sim) for row, sim in zip(candidates, sims) if sim >= threshold]
+
+    def candidate_pairs(self, threshold=0.):
+        """
+            Input: the minimal estimated Jaccard coefficient
+            Output: (rows1, rows2, estimated Jaccard) of all document pairs sharing a band, rows1 < rows2
+        """
+        pairs = set()
+        for band in range(self.bands):
+            sizes = np.diff(self.indptr[band])
+            for bucket in np.where(sizes > 1)[0]:
+                members = self.members[band][self.indptr[band][bucket]:self.indptr[band][bucket + 1]]
+                pairs.update(itertools.combinations(sorted(members), 2))
+        pairs = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+        sims = _approx_jaccards(self.sigs[pairs[:, 0]], self.sigs[pairs[:, 1]])
+        valid = sims >= threshold
+        return pairs[valid, 0], pairs[valid, 1], sims[valid]
@@ -5,6 +5,8 @@
 
 """
 
+import numpy as np
+
 
 def _unigrams(words):
     """
@@ -191,6 +193,35 @@ def _nterms(words, nterm, join_string=" "):
         return _fourterms(words, join_string)
 
 
+# multiplier combining the word hashes of an ngram, as in CPython's tuple hash
+_NGRAM_HASH_MULT = 1000003
+
+
+def _word_hashes(words):
+    """
+        Input: a list of words
+        Output: int64 hash of each word
+    """
+    return np.array([hash(w) for w in words], dtype=np.int64)
+
+
+def _ngram_hashes(words, ngram, word_hashes=None):
+    """
+        Input: a list of words, ngram in 1-4, and optionally _word_hashes(words)
+        Output: sorted unique int64 hashes of the ngrams of _ngrams(words, ngram), i.e. lower
+                order ngrams for short lists; each ngram hash is combined from its word hashes
+    """
+    assert ngram in [1, 2, 3, 4]
+    if word_hashes is None:
+        word_hashes = _word_hashes(words)
+    n = min(ngram, len(word_hashes))
+    m = len(word_hashes) - n + 1
+    hashes = word_hashes[:m].copy()
+    for k in range(1, n):
+        hashes = hashes * _NGRAM_HASH_MULT + word_hashes[k:k + m]
+    return np.unique(hashes)
+
+
 if __name__ == "__main__":
 
     text = "I am Denny boy ha"
@@ -205,3 +236,4 @@ if __name__ == "__main__":
     assert _nterms(words, 2) == ["I am", "I Denny", "I boy", "I ha", "am Denny", "am boy", "am ha", "Denny boy", "Denny ha", "boy ha"]
     assert _nterms(words, 3) == ["I am Denny", "I am boy", "I am ha", "I Denny boy", "I Denny ha", "I boy ha", "am Denny boy", "am Denny ha", "am boy ha", "Denny boy ha"]
     assert _nterms(words, 4) == ["I am Denny boy", "I am Denny ha", "I am boy ha", "I Denny boy ha", "am Denny boy ha"]
+
@@ -80,3 +80,31 @@ def _try_divide(x, y, val=0.0):
     if y != 0.0:
         val = float(x) / y
     return val
+
+
+def _char_counts(docs, columns, block_size=100000):
+    """
+        Input: list of unicode docs, columns as lists of disjoint (lo, hi) code point ranges
+        Output: (len(docs), len(columns)) uint16 matrix, counts are clipped at 65535
+        Code points of a block of docs are mapped to columns by a binary search over the ranges
+        and counted by a single np.bincount.
+    """
+    ranges = sorted((lo, hi, col) for col, col_ranges in enumerate(columns) for lo, hi in col_ranges)
+    los = np.array([r[0] for r in ranges], dtype=np.int64)
+    his = np.array([r[1] for r in ranges], dtype=np.int64)
+    cols = np.array([r[2] for r in ranges], dtype=np.int64)
+    assert (los[1:] > his[:-1]).all(), 'code point ranges of columns overlap'
+    n_cols = len(columns)
+
+    counts = np.zeros((len(docs), n_cols), dtype=np.uint16)
+    for begin in range(0, len(docs), block_size):
+        block = docs[begin:begin + block_size]
+        # lengths are taken from the encoded docs, since len() counts surrogates on narrow builds
+        encoded = [doc.encode('utf-32-le') for doc in block]
+        codes = np.frombuffer(b''.join(encoded), dtype='<u4').astype(np.int64)
+        doc_ids = np.repeat(np.arange(len(block)), [len(doc) / 4 for doc in encoded])
+        pos = np.searchsorted(los, codes, side='right') - 1
+        valid = (pos >= 0) & (codes <= his[np.maximum(pos, 0)])
+        block_counts = np.bincount(doc_ids[valid] * n_cols + cols[pos[valid]], minlength=len(block) * n_cols)
+        counts[begin:begin + len(block)] = np.minimum(block_counts, 65535).reshape(len(block), n_cols)
+    return counts
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: interned question table shared by extractors
+
+Questions of train.csv and test.csv get dense int32 ids in order of first appearance
+(train rows then test rows, question1 before question2), for two normalizations:
+    strip   : str(question).strip()
+    nostrip : str(question)
+Files written under a prefix (e.g. <devel_pt>/question_table):
+    <prefix>.<norm>.questions.bin     : utf-8 bytes of all questions, concatenated by id
+    <prefix>.<norm>.questions.offset  : npy, int64 offsets of questions in the .bin file
+    <prefix>.<norm>.<rawset>.pairs    : npy, (n_pairs, 2) int32 ids of (question1, question2)
+Pair arrays and question bytes are memory-mapped when loaded. Rows appended to the csv files
+later are added by _extend: existing ids are kept and new questions get the next ids, in order of
+first appearance in the new train rows then the new test rows.
+
+"""
+
+import os
+import csv
+import itertools
+
+import numpy as np
+
+
+NORMS = {
+    'strip': lambda q: str(q).strip(),
+    'nostrip': lambda q: str(q),
+}
+
+# (rawset name, column of question1, column of question2) in the original csv files
+RAWSETS = [('train', 3, 4), ('test', 1, 2)]
+
+
+def _fp(prefix, norm, name):
+    return '%s.%s.%s' % (prefix, norm, name)
+
+
+def _replace(fp, array):
+    """
+        Input: path of a npy file, array to save
+        The file is written aside and renamed, so memory maps of the old file stay valid.
+    """
+    tmp_fp = '%s.tmp' % fp
+    np.save(open(tmp_fp, 'wb'), array)
+    os.rename(tmp_fp, fp)
+
+
+def _build(csv_fps, prefix):
+    """
+        Input: {rawset name: path of the original csv file}, prefix of the table files
+        Output: {norm: number of questions}
+    """
+    q2id = dict((norm, {}) for norm in NORMS)
+    pairs = dict((norm, {}) for norm in NORMS)
+    for rawset_name, col1, col2 in RAWSETS:
+        for norm in NORMS:
+            pairs[norm][rawset_name] = []
+        fin = csv.reader(open(csv_fps[rawset_name]))
+        fin.next()
+        for p in fin:
+            for norm, normalize in NORMS.items():
+                q1 = normalize(p[col1])
+                q2 = normalize(p[col2])
+                qid1 = q2id[norm].setdefault(q1, len(q2id[norm]))
+                qid2 = q2id[norm].setdefault(q2, len(q2id[norm]))
+                pairs[norm][rawset_name].append((qid1, qid2))
+
+    n_questions = {}
+    for norm in NORMS:
+        questions = [None] * len(q2id[norm])
+        for q, qid in q2id[norm].iteritems():
+            questions[qid] = q
+        offsets = np.zeros(len(questions) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(q) for q in questions])
+        fout = open(_fp(prefix, norm, 'questions.bin'), 'wb')
+        fout.write(''.join(questions))
+        fout.close()
+        np.save(open(_fp(prefix, norm, 'questions.offset'), 'wb'), offsets)
+        for rawset_name in pairs[norm]:
+            np.save(open(_fp(prefix, norm, '%s.pairs' % rawset_name), 'wb'),
+                    np.array(pairs[norm][rawset_name], dtype=np.int32).reshape(-1, 2))
+        n_questions[norm] = len(questions)
+    return n_questions
+
+
+def _extend(csv_fps, prefix):
+    """
+        Input: {rawset name: path of the original csv file}, prefix of existing table files
+        Output: {norm: number of new questions}
+        Only rows after the pairs already in the table are read; their new questions get the next ids.
+    """
+    n_new = {}
+    for norm, normalize in NORMS.items():
+        table = QuestionTable(prefix, norm)
+        q2id = dict((table.question(qid), qid) for qid in range(len(table)))
+        questions = []
+        for rawset_name, col1, col2 in RAWSETS:
+            old_pairs = table.pairs(rawset_name)
+            fin = csv.reader(open(csv_fps[rawset_name]))
+            fin.next()
+            pairs = []
+            for p in itertools.islice(fin, len(old_pairs), None):
+                for q in [normalize(p[col1]), normalize(p[col2])]:
+                    if q not in q2id:
+                        q2id[q] = len(q2id)
+                        questions.append(q)
+                pairs.append((q2id[normalize(p[col1])], q2id[normalize(p[col2])]))
+            _replace(_fp(prefix, norm, '%s.pairs' % rawset_name),
+                     np.vstack([old_pairs, np.array(pairs, dtype=np.int32).reshape(-1, 2)]))
+
+        # the question bytes are only appended, the old file stays valid for readers
+        offsets = np.concatenate([table.offsets, table.offsets[-1] + np.cumsum([len(q) for q in questions])])
+        fout = open(_fp(prefix, norm, 'questions.bin'), 'ab')
+        fout.write(''.join(questions))
+        fout.close()
+        _replace(_fp(prefix, norm, 'questions.offset'), offsets.astype(np.int64))
+        n_new[norm] = len(questions)
+    return n_new
+
+
+class QuestionTable(object):
+    """
+    Read-only view of the interned questions of one normalization
+    """
+
+    def __init__(self, prefix, norm='strip'):
+        self.prefix = prefix
+        self.norm = norm
+        self.offsets = np.load(_fp(prefix, norm, 'questions.offset'))
+        self.data = np.memmap(_fp(prefix, norm, 'questions.bin'), dtype=np.uint8, mode='r') \
+            if self.offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        self.q2id = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def question(self, qid):
+        return self.data[self.offsets[qid]:self.offsets[qid + 1]].tobytes()
+
+    def pairs(self, rawset_name):
+        """
+            Output: (n_pairs, 2) memory-mapped int32 ids of (question1, question2)
+        """
+        return np.load(_fp(self.prefix, self.norm, '%s.pairs' % rawset_name), mmap_mode='r')
+
+    def ids(self, questions):
+        """
+            Input: raw questions (normalized here)
+            Output: int32 ids, -1 for unknown questions
+            The text index is only built on the first call.
+        """
+        if self.q2id is None:
+            self.q2id = dict((self.question(qid), qid) for qid in range(len(self)))
+        normalize = NORMS[self.norm]
+        return np.array([self.q2id.get(normalize(q), -1) for q in questions], dtype=np.int32)
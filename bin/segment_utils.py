@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: utils for cached jieba segmentation
+
+Each unique question is segmented once, in both jieba.cut and jieba.cut_for_search modes,
+and stored as token-id arrays with offsets (CSR layout) in one npz file:
+    questions, vocab           : object arrays
+    cut_ids, cut_indptr        : tokens of jieba.cut
+    search_ids, search_indptr  : tokens of jieba.cut_for_search
+
+"""
+
+from multiprocessing import Pool
+
+import numpy as np
+import jieba
+
+
+def _cut(question):
+    return list(jieba.cut(question)), list(jieba.cut_for_search(question))
+
+
+def _segment(questions, n_jobs=1):
+    """
+        Input: list of questions
+        Output: list of (tokens of jieba.cut, tokens of jieba.cut_for_search), by a process pool when n_jobs > 1
+    """
+    if 1 >= n_jobs:
+        return [_cut(q) for q in questions]
+    pool = Pool(n_jobs)
+    tokens = pool.map(_cut, questions, chunksize=1000)
+    pool.close()
+    pool.join()
+    return tokens
+
+
+def _to_csr(token_lists, word2id):
+    indptr = np.zeros(len(token_lists) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(tokens) for tokens in token_lists])
+    ids = np.array([word2id.setdefault(word, len(word2id)) for tokens in token_lists for word in tokens],
+                   dtype=np.int32)
+    return ids, indptr
+
+
+def _save(fp, questions, n_jobs=1):
+    """
+        Input: path of the npz file, list of unique questions
+        Output: none
+    """
+    tokens = _segment(questions, n_jobs)
+    word2id = {}
+    cut_ids, cut_indptr = _to_csr([t[0] for t in tokens], word2id)
+    search_ids, search_indptr = _to_csr([t[1] for t in tokens], word2id)
+    vocab = [None] * len(word2id)
+    for word, index in word2id.items():
+        vocab[index] = word
+    np.savez(fp, questions=np.array(questions, dtype=object), vocab=np.array(vocab, dtype=object),
+             cut_ids=cut_ids, cut_indptr=cut_indptr, search_ids=search_ids, search_indptr=search_indptr)
+
+
+class Segments(object):
+    """
+    Read-only view (question -> tokens) over a saved segmentation
+    """
+
+    def __init__(self, fp):
+        store = np.load(fp, allow_pickle=True)
+        self.question2row = dict((q, index) for index, q in enumerate(store['questions'].tolist()))
+        self.vocab = store['vocab'].tolist()
+        self.cut_ids = store['cut_ids']
+        self.cut_indptr = store['cut_indptr']
+        self.search_ids = store['search_ids']
+        self.search_indptr = store['search_indptr']
+
+    def __contains__(self, question):
+        return question in self.question2row
+
+    def __len__(self):
+        return len(self.question2row)
+
+    def cut(self, question):
+        row = self.question2row[question]
+        return [self.vocab[i] for i in self.cut_ids[self.cut_indptr[row]:self.cut_indptr[row + 1]]]
+
+    def cut_for_search(self, question):
+        row = self.question2row[question]
+        return [self.vocab[i] for i in self.search_ids[self.search_indptr[row]:self.search_indptr[row + 1]]]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: utils for sparse document-term matrix
+
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+
+def _lower_split(text):
+    """
+        Input: a string, e.g., "How are you"
+        Output: a list of lower-cased words split by whitespace, e.g., ["how", "are", "you"]
+    """
+    return str(text).lower().split()
+
+
+def _count_matrix(docs, vocab, tokenizer=_lower_split, grow=True):
+    """
+        Input: a list of documents and a word->column dict
+        Output: the csr term-count matrix of documents, shape=(len(docs), len(vocab))
+        Unknown words are added to vocab when grow is True, ignored otherwise.
+    """
+    indptr = [0]
+    indices = []
+    for doc in docs:
+        for w in tokenizer(doc):
+            if w in vocab:
+                indices.append(vocab[w])
+            elif grow:
+                vocab[w] = len(vocab)
+                indices.append(vocab[w])
+        indptr.append(len(indices))
+    m = csr_matrix((np.ones(len(indices)), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+                   shape=(len(docs), len(vocab)))
+    m.sum_duplicates()
+    return m
+
+
+def _unique_docs(docs1, docs2):
+    """
+        Input: two aligned lists of documents, e.g., question1 and question2 columns
+        Output: the list of unique documents and the row index of each input in it
+    """
+    doc2id = {}
+    ind1 = np.array([doc2id.setdefault(doc, len(doc2id)) for doc in docs1], dtype=np.int32)
+    ind2 = np.array([doc2id.setdefault(doc, len(doc2id)) for doc in docs2], dtype=np.int32)
+    docs = [None] * len(doc2id)
+    for doc, i in doc2id.iteritems():
+        docs[i] = doc
+    return docs, ind1, ind2
+
+
+def _resize_col(m, n_col):
+    """
+        Input: a csr matrix built before its vocab stopped growing
+        Output: the same csr matrix with n_col columns
+    """
+    return csr_matrix((m.data, m.indices, m.indptr), shape=(m.shape[0], n_col))
+
+
+def _binarize(m):
+    b = m.copy()
+    b.eliminate_zeros()
+    b.data[:] = 1.
+    return b
+
+
+def _mask_col(m, mask):
+    """
+        Input: a csr matrix and a 0/1 vector over columns
+        Output: the csr matrix with columns of mask 0 removed
+    """
+    m = m.dot(diags(np.asarray(mask, dtype=float), 0)).tocsr()
+    m.eliminate_zeros()
+    return m
+
+
+def _row_sum(m, weight=None):
+    """
+        Input: a csr matrix and optional weights over columns
+        Output: a dense vector of (weighted) row sums
+    """
+    if weight is not None:
+        return np.asarray(m.dot(weight)).ravel()
+    return np.asarray(m.sum(axis=1)).ravel()
+
+
+def _row_dot(a, b, weight=None):
+    """
+        Input: two csr matrices of the same shape and optional weights over columns
+        Output: a dense vector of row-wise (weighted) inner products
+    """
+    return _row_sum(a.multiply(b).tocsr(), weight)
+
+
+def _try_divide(x, y, val=0.0):
+    """element-wise version of np_utils._try_divide"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    r = np.full(x.shape, val, dtype=float)
+    nz = (y != 0.0)
+    r[nz] = x[nz] / y[nz]
+    return r
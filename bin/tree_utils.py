@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+@brief: utils for dependency trees of the Stanford parser
+
+Each line of a tree file is "<qid> <json>", the json being a list with at most one
+dict (node id -> {'word': ..., 'head': ...}). Node 0 is the virtual root.
+
+"""
+
+import json
+import itertools
+from multiprocessing import Pool
+
+import numpy as np
+
+
+# n_child, depth, n_root_braches, n_max_braches, ind_multi
+N_TREE_FEATURES = 5
+
+
+def _tree_features(json_s):
+    """
+        Input: json string of a dependency tree
+        Output: [number of leaves, depth, branches of the root, max branches, product of in-degrees]
+        Depth is computed by one breadth-first pass from the nodes attached to the virtual root.
+    """
+    root = -1
+    parent = {}
+    indegree = {}
+    if 0 < len(json_s.strip()):
+        tree_obj = json.loads(json_s)
+        assert len(tree_obj) <= 1
+        tree_obj = tree_obj[0]
+        for k, r in sorted(tree_obj.items(), key=lambda x: int(x[0]))[1:]:
+            if r['word'] is None:
+                continue
+            head = int(r['head'])
+            k = int(k)
+            if 0 == head:
+                root = k
+            parent[k] = head
+            indegree[head] = indegree.get(head, 0) + 1
+
+    n_child = len([k for k in parent if k not in indegree])
+
+    children = {}
+    for k, head in parent.items():
+        children.setdefault(head, []).append(k)
+    # number of steps up to the node attached to the virtual root (an unknown head counts as one step),
+    # propagated from parents to children, the maximum is reached at a leaf
+    queue = [(k, 0 if 0 == head else 1) for k, head in parent.items() if (0 == head) or (head not in parent)]
+    depth = 0
+    while queue:
+        k, d = queue.pop()
+        depth = max(depth, d)
+        queue.extend([(c, d + 1) for c in children.get(k, [])])
+
+    n_root_braches = indegree.get(root, 0)
+    n_max_braches = max(indegree.values()) if 0 < len(indegree) else 0
+    ind_multi = 1.0
+    for id_node in indegree:
+        ind_multi *= indegree[id_node]
+    return [n_child, depth, n_root_braches, n_max_braches, ind_multi]
+
+
+def _parse_lines(lines):
+    qids = []
+    features = []
+    for line in lines:
+        [qid, json_s] = line.split(' ', 1)
+        qids.append(qid)
+        features.append(_tree_features(json_s))
+    return qids, np.array(features, dtype=np.float64).reshape(-1, N_TREE_FEATURES)
+
+
+def _chunks(f, chunk_size):
+    while True:
+        lines = list(itertools.islice(f, chunk_size))
+        if not lines:
+            break
+        yield lines
+
+
+def _parse_tree_file(tree_fp, n_jobs=1, chunk_size=10000):
+    """
+        Input: path of a tree file
+        Output: (qids, (n_questions, N_TREE_FEATURES) features), in file order
+        The file is streamed in chunks of lines, parsed by a process pool when n_jobs > 1.
+    """
+    f = open(tree_fp)
+    if 1 >= n_jobs:
+        results = [_parse_lines(lines) for lines in _chunks(f, chunk_size)]
+    else:
+        pool = Pool(n_jobs)
+        results = list(pool.imap(_parse_lines, _chunks(f, chunk_size)))
+        pool.close()
+        pool.join()
+    f.close()
+    qids = [qid for result in results for qid in result[0]]
+    features = np.vstack([np.zeros((0, N_TREE_FEATURES))] + [result[1] for result in results])
+    return qids, features